@@ -0,0 +1,44 @@
+"""heatmap tile pyramid aggregates
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "004"
+down_revision: Union[str, None] = "003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "heatmap_tile_cells",
+        sa.Column("page_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("kind", sa.String(20), nullable=False),
+        sa.Column("zoom", sa.SmallInteger(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False, index=True),
+        sa.Column("cell_x", sa.Integer(), nullable=False),
+        sa.Column("cell_y", sa.Integer(), nullable=False),
+        sa.Column("event_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("page_id", "kind", "zoom", "day", "cell_x", "cell_y"),
+        sa.ForeignKeyConstraint(["page_id"], ["pages.id"], ondelete="CASCADE"),
+    )
+    op.create_table(
+        "heatmap_tile_rollups",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("rolled_up_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("heatmap_tile_rollups")
+    op.drop_table("heatmap_tile_cells")
@@ -0,0 +1,81 @@
+"""viewport-relative x and breakpoint on click and mouse move events
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19
+
+"""
+
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "005"
+down_revision: Union[str, None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("click_events", "mouse_move_events")
+
+# Rows backfilled per statement, each committed on its own so the backfill
+# holds row locks on one batch at a time and leaves vacuum able to keep up
+BATCH_ROWS = 10000
+
+# app.services.breakpoints.breakpoint_for with HEATMAP_BREAKPOINTS as of
+# this revision (mobile 0, tablet 768, desktop 1024)
+BREAKPOINT_SQL = (
+    "CASE WHEN viewport_width >= 1024 THEN 'desktop' "
+    "WHEN viewport_width >= 768 THEN 'tablet' ELSE 'mobile' END"
+)
+
+NIL_UUID = uuid.UUID(int=0)
+
+
+def _backfill(table: str) -> None:
+    """Set x_ratio and breakpoint in primary key order, one batch per transaction"""
+    bind = op.get_bind()
+    after = NIL_UUID
+    while after is not None:
+        # Last id of the next batch (None for the final, partial one)
+        upper = bind.execute(
+            sa.text(f"SELECT id FROM {table} WHERE id > :after ORDER BY id OFFSET :skip LIMIT 1"),
+            {"after": after, "skip": BATCH_ROWS - 1},
+        ).scalar()
+        bounds = "id > :after" + ("" if upper is None else " AND id <= :upper")
+        bind.execute(
+            sa.text(
+                f"UPDATE {table} SET "
+                f"x_ratio = round(x::numeric / viewport_width, 4), "
+                f"breakpoint = {BREAKPOINT_SQL} "
+                f"WHERE {bounds} AND viewport_width > 0"
+            ),
+            {"after": after, "upper": upper},
+        )
+        after = upper
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column("x_ratio", sa.Float(), nullable=True))
+        op.add_column(table, sa.Column("breakpoint", sa.String(20), nullable=True))
+
+    # Commit the new columns, then backfill and index without long locks
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            _backfill(table)
+            op.create_index(
+                f"ix_{table}_page_breakpoint_timestamp",
+                table,
+                ["page_id", "breakpoint", "timestamp"],
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_page_breakpoint_timestamp", table_name=table)
+        op.drop_column(table, "breakpoint")
+        op.drop_column(table, "x_ratio")
@@ -0,0 +1,92 @@
+"""session segment columns on click and mouse move events
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19
+
+"""
+
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "006"
+down_revision: Union[str, None] = "005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("click_events", "mouse_move_events")
+
+# Rows backfilled per statement, each committed on its own so the backfill
+# holds row locks on one batch at a time and leaves vacuum able to keep up
+BATCH_ROWS = 10000
+
+# Same values app.services.segments.session_segment copies at ingest, for
+# the batch's rows only (sessions s joined on the event's session_id)
+SEGMENT_ASSIGNMENTS = """
+    device_type = nullif(lower(trim(s.device_type)), ''),
+    browser = nullif(lower(trim(s.browser)), ''),
+    is_returning = EXISTS (
+        SELECT 1 FROM sessions p
+        WHERE p.user_id = s.user_id AND p.session_start < s.session_start
+    )
+"""
+
+NIL_UUID = uuid.UUID(int=0)
+
+
+def _backfill(table: str) -> None:
+    """Copy session segments in primary key order, one batch per transaction"""
+    bind = op.get_bind()
+    after = NIL_UUID
+    while after is not None:
+        # Last id of the next batch (None for the final, partial one)
+        upper = bind.execute(
+            sa.text(f"SELECT id FROM {table} WHERE id > :after ORDER BY id OFFSET :skip LIMIT 1"),
+            {"after": after, "skip": BATCH_ROWS - 1},
+        ).scalar()
+        bounds = "e.id > :after" + ("" if upper is None else " AND e.id <= :upper")
+        bind.execute(
+            sa.text(
+                f"UPDATE {table} e SET {SEGMENT_ASSIGNMENTS} FROM sessions s "
+                f"WHERE s.id = e.session_id AND {bounds}"
+            ),
+            {"after": after, "upper": upper},
+        )
+        after = upper
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column("device_type", sa.String(50), nullable=True))
+        op.add_column(table, sa.Column("browser", sa.String(100), nullable=True))
+        op.add_column(table, sa.Column("is_returning", sa.Boolean(), nullable=True))
+
+    # Commit the new columns, then backfill and index without long locks
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            _backfill(table)
+            op.create_index(
+                f"ix_{table}_page_device_browser_timestamp",
+                table,
+                ["page_id", "device_type", "browser", "timestamp"],
+                postgresql_concurrently=True,
+            )
+            op.create_index(
+                f"ix_{table}_page_returning_timestamp",
+                table,
+                ["page_id", "is_returning", "timestamp"],
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_page_returning_timestamp", table_name=table)
+        op.drop_index(f"ix_{table}_page_device_browser_timestamp", table_name=table)
+        op.drop_column(table, "is_returning")
+        op.drop_column(table, "browser")
+        op.drop_column(table, "device_type")
@@ -0,0 +1,43 @@
+"""per-day HyperLogLog sketches of unique users
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "007"
+down_revision: Union[str, None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled by the application (app.services.user_sketches), which also
+    # builds the USER_SKETCH_BACKFILL_DAYS window from the raw events
+    op.create_table(
+        "user_sketches",
+        sa.Column("scope_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("metric", sa.String(20), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("registers", sa.LargeBinary(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("scope_id", "metric", "day"),
+    )
+    op.create_table(
+        "user_sketch_builds",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("built_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_sketch_builds")
+    op.drop_table("user_sketches")
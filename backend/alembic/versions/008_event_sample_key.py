@@ -0,0 +1,70 @@
+"""session sample key on click and mouse move events
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19
+
+"""
+
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "008"
+down_revision: Union[str, None] = "007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("click_events", "mouse_move_events")
+
+# Rows backfilled per statement, each committed on its own so the backfill
+# holds row locks on one batch at a time and leaves vacuum able to keep up
+BATCH_ROWS = 10000
+
+# app.services.sampling.SAMPLE_KEY_SQL as of this revision (SAMPLE_KEYS = 10000)
+SAMPLE_KEY_SQL = "(('x' || substr(md5(session_id::text), 1, 8))::bit(32)::bigint % 10000)"
+
+NIL_UUID = uuid.UUID(int=0)
+
+
+def _backfill(table: str) -> None:
+    """Set sample_key in primary key order, one batch per transaction"""
+    bind = op.get_bind()
+    after = NIL_UUID
+    while after is not None:
+        # Last id of the next batch (None for the final, partial one)
+        upper = bind.execute(
+            sa.text(f"SELECT id FROM {table} WHERE id > :after ORDER BY id OFFSET :skip LIMIT 1"),
+            {"after": after, "skip": BATCH_ROWS - 1},
+        ).scalar()
+        bounds = "id > :after" + ("" if upper is None else " AND id <= :upper")
+        bind.execute(
+            sa.text(f"UPDATE {table} SET sample_key = {SAMPLE_KEY_SQL} WHERE {bounds}"),
+            {"after": after, "upper": upper},
+        )
+        after = upper
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column("sample_key", sa.SmallInteger(), nullable=True))
+
+    # Commit the new columns, then backfill and index without long locks
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            _backfill(table)
+            op.create_index(
+                f"ix_{table}_page_sample_timestamp",
+                table,
+                ["page_id", "sample_key", "timestamp"],
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_page_sample_timestamp", table_name=table)
+        op.drop_column(table, "sample_key")
@@ -0,0 +1,49 @@
+"""page groups of URL patterns
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "009"
+down_revision: Union[str, None] = "008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing page URLs are left as stored; lookups fall back to them when
+    # the normalized URL (app.services.urls) has no page
+    op.create_table(
+        "page_groups",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("pattern", sa.Text(), nullable=False),
+        sa.Column("regex", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_table(
+        "page_group_members",
+        sa.Column("group_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("page_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.ForeignKeyConstraint(["group_id"], ["page_groups.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["page_id"], ["pages.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("group_id", "page_id"),
+    )
+    op.create_index("ix_page_group_members_page_id", "page_group_members", ["page_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_page_group_members_page_id", table_name="page_group_members")
+    op.drop_table("page_group_members")
+    op.drop_table("page_groups")
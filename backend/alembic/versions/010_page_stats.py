@@ -0,0 +1,76 @@
+"""per-page activity counters
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "010"
+down_revision: Union[str, None] = "009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Counters of every existing page; ingest keeps them current from here on
+BACKFILL_SQL = """
+INSERT INTO page_stats
+    (page_id, sessions, clicks, scrolls, scroll_sessions, mouse_moves, last_event_at)
+SELECT
+    p.id,
+    COALESCE(s.n, 0),
+    COALESCE(c.n, 0),
+    COALESCE(sc.n, 0),
+    COALESCE(sc.sessions, 0),
+    COALESCE(m.n, 0),
+    GREATEST(p.created_at, s.last, c.last, sc.last, m.last)
+FROM pages p
+LEFT JOIN (
+    SELECT page_id, count(*) AS n, max(session_start) AS last FROM sessions GROUP BY page_id
+) s ON s.page_id = p.id
+LEFT JOIN (
+    SELECT page_id, count(*) AS n, max(timestamp) AS last FROM click_events GROUP BY page_id
+) c ON c.page_id = p.id
+LEFT JOIN (
+    SELECT page_id, count(*) AS n, count(DISTINCT session_id) AS sessions, max(timestamp) AS last
+    FROM scroll_events GROUP BY page_id
+) sc ON sc.page_id = p.id
+LEFT JOIN (
+    SELECT page_id, count(*) AS n, max(timestamp) AS last FROM mouse_move_events GROUP BY page_id
+) m ON m.page_id = p.id
+ON CONFLICT (page_id) DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "page_stats",
+        sa.Column("page_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("sessions", sa.BigInteger(), nullable=False),
+        sa.Column("clicks", sa.BigInteger(), nullable=False),
+        sa.Column("scrolls", sa.BigInteger(), nullable=False),
+        sa.Column("scroll_sessions", sa.BigInteger(), nullable=False),
+        sa.Column("mouse_moves", sa.BigInteger(), nullable=False),
+        sa.Column("last_event_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["page_id"], ["pages.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("page_id"),
+    )
+    op.execute(BACKFILL_SQL)
+    op.create_index(
+        "ix_page_stats_last_event_at_page_id", "page_stats", ["last_event_at", "page_id"]
+    )
+    op.create_index("ix_page_stats_sessions_page_id", "page_stats", ["sessions", "page_id"])
+    op.create_index("ix_page_stats_clicks_page_id", "page_stats", ["clicks", "page_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_page_stats_clicks_page_id", table_name="page_stats")
+    op.drop_index("ix_page_stats_sessions_page_id", table_name="page_stats")
+    op.drop_index("ix_page_stats_last_event_at_page_id", table_name="page_stats")
+    op.drop_table("page_stats")
@@ -0,0 +1,44 @@
+"""markers of the sessions counted in page_stats.scroll_sessions
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "011"
+down_revision: Union[str, None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Every session already counted; ingest adds the others with their first batch
+BACKFILL_SQL = """
+INSERT INTO page_scroll_sessions (page_id, session_id)
+SELECT DISTINCT page_id, session_id FROM scroll_events
+ON CONFLICT DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "page_scroll_sessions",
+        sa.Column("page_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("session_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.ForeignKeyConstraint(["page_id"], ["pages.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["session_id"], ["sessions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("page_id", "session_id"),
+    )
+    op.create_index("ix_page_scroll_sessions_session_id", "page_scroll_sessions", ["session_id"])
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_page_scroll_sessions_session_id", table_name="page_scroll_sessions")
+    op.drop_table("page_scroll_sessions")
@@ -1,9 +1,36 @@
 """
 Database connection and session management
+
+Each workload has its own connection pool with its own size, checkout
+timeout and statement_timeout (the *_POOL_* settings), so a burst of slow
+queries in one cannot take the connections another needs:
+
+- ingest (engine, AsyncSessionLocal, get_db): tracking endpoints and
+  authentication
+- analytics (analytics_engine, get_read_db): heatmaps, funnel and page
+  stats, behind the admission gate of app.services.admission
+- admin (admin_engine, get_admin_db): management endpoints and background
+  maintenance
+
+Analytics reads can go to a streaming replica (READ_DATABASE_URL) through
+get_read_db / read_target, so dashboard queries do not compete with
+ingest writes on the primary. The replica's lag is measured at most every
+READ_REPLICA_CHECK_INTERVAL_SECONDS; while it is unknown or above
+READ_REPLICA_MAX_LAG_SECONDS, reads fall back to the primary's analytics
+pool.
 """
 
-from typing import AsyncGenerator
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, NamedTuple, Optional
+
+from fastapi import Depends
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     create_async_engine,
     async_sessionmaker,
@@ -11,56 +38,250 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.orm import declarative_base
 
 from app.config import settings
+from app.services.admission import AdmissionSlot, analytics_admission
+from app.services.metrics import register_pool_gauges, register_replica_gauges
+from app.services.query_profiler import install_query_profiler
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSettings(NamedTuple):
+    """Connection pool of one workload"""
+
+    name: str
+    size: int
+    max_overflow: int
+    timeout: float  # Seconds to wait for a connection before failing
+    statement_timeout_ms: int  # 0: no limit
+
 
-# Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    future=True,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+INGEST_POOL = PoolSettings(
+    "ingest",
+    settings.INGEST_POOL_SIZE,
+    settings.INGEST_POOL_MAX_OVERFLOW,
+    settings.INGEST_POOL_TIMEOUT_SECONDS,
+    settings.INGEST_STATEMENT_TIMEOUT_MS,
 )
+ANALYTICS_POOL = PoolSettings(
+    "analytics",
+    settings.ANALYTICS_POOL_SIZE,
+    settings.ANALYTICS_POOL_MAX_OVERFLOW,
+    settings.ANALYTICS_POOL_TIMEOUT_SECONDS,
+    settings.ANALYTICS_STATEMENT_TIMEOUT_MS,
+)
+ADMIN_POOL = PoolSettings(
+    "admin",
+    settings.ADMIN_POOL_SIZE,
+    settings.ADMIN_POOL_MAX_OVERFLOW,
+    settings.ADMIN_POOL_TIMEOUT_SECONDS,
+    settings.ADMIN_STATEMENT_TIMEOUT_MS,
+)
+
+
+def create_pool_engine(url: str, pool: PoolSettings) -> AsyncEngine:
+    """Engine with a workload's pool; its sessions carry the statement_timeout"""
+    server_settings = {"application_name": f"heatmap-api:{pool.name}"}
+    if pool.statement_timeout_ms:
+        server_settings["statement_timeout"] = str(pool.statement_timeout_ms)
+    return create_async_engine(
+        url,
+        echo=settings.SQL_ECHO,
+        future=True,
+        pool_pre_ping=True,
+        pool_size=pool.size,
+        max_overflow=pool.max_overflow,
+        pool_timeout=pool.timeout,
+        connect_args={"server_settings": server_settings},
+    )
+
+
+def create_sessionmaker(bind: AsyncEngine) -> async_sessionmaker:
+    return async_sessionmaker(
+        bind,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+
+
+# Create async engines, one per workload on the primary
+engine = create_pool_engine(settings.DATABASE_URL, INGEST_POOL)
+analytics_engine = create_pool_engine(settings.DATABASE_URL, ANALYTICS_POOL)
+admin_engine = create_pool_engine(settings.DATABASE_URL, ADMIN_POOL)
 
-# Create async session factory
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False,
+# Optional read replica for analytics queries
+read_engine: Optional[AsyncEngine] = (
+    create_pool_engine(settings.READ_DATABASE_URL, ANALYTICS_POOL)
+    if settings.READ_DATABASE_URL
+    else None
 )
 
+ENGINES = [
+    ("ingest", engine),
+    ("analytics", analytics_engine),
+    ("admin", admin_engine),
+] + ([("replica", read_engine)] if read_engine is not None else [])
+
+# Per-request query timing and slow-query log
+if settings.SQL_PROFILING_ENABLED:
+    for _, pool_engine in ENGINES:
+        install_query_profiler(pool_engine.sync_engine)
+
+# Expose pool usage on /metrics
+register_pool_gauges(lambda: [(name, pool_engine.pool) for name, pool_engine in ENGINES])
+
+# Create async session factories
+AsyncSessionLocal = create_sessionmaker(engine)
+AnalyticsSessionLocal = create_sessionmaker(analytics_engine)
+AdminSessionLocal = create_sessionmaker(admin_engine)
+ReadSessionLocal = create_sessionmaker(read_engine) if read_engine is not None else None
+
 # Base class for models
 Base = declarative_base()
 
 
+@asynccontextmanager
+async def session_scope(sessionmaker: async_sessionmaker) -> AsyncGenerator[AsyncSession, None]:
+    """Session committed on success and rolled back on errors"""
+    async with sessionmaker() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
-    Dependency to get database session
+    Dependency to get database session (ingest pool)
 
     Usage:
         @app.get("/users")
         async def get_users(db: AsyncSession = Depends(get_db)):
             ...
     """
-    async with AsyncSessionLocal() as session:
+    async with session_scope(AsyncSessionLocal) as session:
+        yield session
+
+
+async def get_admin_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get a session for management endpoints (admin pool)"""
+    async with session_scope(AdminSessionLocal) as session:
+        yield session
+
+
+# Bound on one lag check, so an unreachable replica costs requests little
+REPLICA_CHECK_TIMEOUT_SECONDS = 1.0
+
+# Lag measured on the replica: 0 when it is not in recovery (e.g. the same
+# server, or a promoted replica) or has replayed all WAL it received, else
+# the age of the last replayed commit
+REPLICA_LAG_SQL = text(
+    """
+    SELECT NOT pg_is_in_recovery()
+               OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AS caught_up,
+           extract(epoch FROM pg_last_xact_replay_timestamp()) AS replayed_at
+    """
+)
+
+
+class ReplicaState:
+    """Last measured lag of the read replica"""
+
+    def __init__(self):
+        self.checked_at = 0.0
+        self.lag: Optional[float] = None  # None: unknown or unreachable
+        # Wall time up to which commits on the primary are visible on the replica
+        self.replayed_through = 0.0
+
+    @property
+    def usable(self) -> bool:
+        return self.lag is not None and self.lag <= settings.READ_REPLICA_MAX_LAG_SECONDS
+
+    async def refresh(self) -> None:
+        """Measure the lag if the last check is older than the check interval"""
+        now = time.time()
+        if now - self.checked_at < settings.READ_REPLICA_CHECK_INTERVAL_SECONDS:
+            return
+        # Claimed before the query, so concurrent requests do not check too
+        self.checked_at = now
+        was_usable = self.usable
         try:
-            yield session
-            await session.commit()
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
+            row = await asyncio.wait_for(self._measure(), REPLICA_CHECK_TIMEOUT_SECONDS)
+        except Exception as exc:
+            row = None
+            if was_usable:
+                logger.warning("Read replica unreachable, reading from the primary: %r", exc)
+
+        if row is None or (not row.caught_up and row.replayed_at is None):
+            self.lag = None
+        elif row.caught_up:
+            self.lag, self.replayed_through = 0.0, now
+        else:
+            self.replayed_through = float(row.replayed_at)
+            self.lag = max(now - self.replayed_through, 0.0)
+
+        if was_usable and row is not None and not self.usable:
+            logger.warning("Read replica lagging (%s s), reading from the primary", self.lag)
+        elif self.usable and not was_usable:
+            logger.info("Reading analytics from the replica (lag %.3f s)", self.lag)
+
+    @staticmethod
+    async def _measure():
+        async with read_engine.connect() as conn:
+            return (await conn.execute(REPLICA_LAG_SQL)).one()
+
+
+# Global instance
+replica = ReplicaState()
+register_replica_gauges(lambda: replica.lag if read_engine is not None else None)
+
+
+class ReadTarget(NamedTuple):
+    """Where an analytics read goes"""
+
+    sessionmaker: async_sessionmaker
+    # Commits on the primary up to this wall time are visible (inf on the primary)
+    replayed_through: float
+
+
+async def read_target() -> ReadTarget:
+    """The replica while it is configured and keeps up, else the primary (analytics pools)"""
+    if ReadSessionLocal is not None:
+        await replica.refresh()
+        if replica.usable:
+            return ReadTarget(ReadSessionLocal, replica.replayed_through)
+    return ReadTarget(AnalyticsSessionLocal, math.inf)
+
+
+async def get_read_db(
+    _admitted: AdmissionSlot = Depends(analytics_admission),
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency to get a session for analytics reads
+
+    Like get_db, but admitted through the analytics gate (503 when its
+    queue is full) and on the analytics pool: of the read replica when one
+    is configured and within READ_REPLICA_MAX_LAG_SECONDS of the primary
+    (so recent writes may be missing), else of the primary. Routes that
+    write, or must see their own writes, use get_db or get_admin_db.
+    """
+    target = await read_target()
+    async with session_scope(target.sessionmaker) as session:
+        yield session
 
 
 async def init_db() -> None:
     """Initialize database - create all tables"""
-    async with engine.begin() as conn:
+    async with admin_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
 
 async def close_db() -> None:
-    """Close database connection"""
-    await engine.dispose()
+    """Close database connections"""
+    for _, pool_engine in ENGINES:
+        await pool_engine.dispose()
@@ -2,15 +2,26 @@
 FastAPI application entry point
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 
 from app.config import settings
 from app.database import init_db, close_db
 from app.middlewares.auth import AuthMiddleware
+from app.middlewares.metrics import MetricsMiddleware
+from app.middlewares.profiling import ProfilingMiddleware
+from app.middlewares.query_profiler import QueryProfilingMiddleware
 from app.middlewares.rate_limit import RateLimitMiddleware
+from app.services.heatmap_cache import ingest_watermarks
+from app.services.heatmap_render import shutdown_render_pool
+from app.services.heatmap_tiles import run_tile_rollups
+from app.services.metrics import registry
+from app.services.page_stats import run_page_stats
+from app.services.shared_cache import shared_cache
+from app.services.user_sketches import run_user_sketches
 
 
 @asynccontextmanager
@@ -18,8 +29,21 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     await init_db()
+    if shared_cache is not None:
+        await shared_cache.start(ingest_watermarks.observe, ingest_watermarks.resync)
+    tasks = [asyncio.create_task(run_page_stats())]
+    if settings.TILE_ROLLUP_ENABLED:
+        tasks.append(asyncio.create_task(run_tile_rollups()))
+    if settings.USER_SKETCHES_ENABLED:
+        tasks.append(asyncio.create_task(run_user_sketches()))
     yield
-    # Shutdown
+    # Shutdown (the page stats and sketch tasks flush their buffers on cancellation)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if shared_cache is not None:
+        await shared_cache.stop()
+    shutdown_render_pool()
     await close_db()
 
 
@@ -30,6 +54,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan,
 )
 
@@ -43,8 +68,13 @@ app.add_middleware(
 )
 
 # Custom middlewares
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)  # Inside auth: needs request.state.is_admin
 app.add_middleware(RateLimitMiddleware)
 app.add_middleware(AuthMiddleware)
+if settings.SQL_PROFILING_ENABLED:
+    app.add_middleware(QueryProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 # Health check endpoint (no auth required)
@@ -57,6 +87,16 @@ async def health_check():
     }
 
 
+# Prometheus metrics endpoint (no auth required)
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of in-process metrics"""
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 # API routes
 from app.routes import (
     users,
@@ -68,6 +108,9 @@ from app.routes import (
     api_keys,
     webhook_configs,
     connected_one,
+    profiles,
+    page_groups,
+    pages,
 )
 
 app.include_router(users.router, prefix=settings.API_V1_PREFIX, tags=["Users"])
@@ -83,13 +126,16 @@ app.include_router(
 app.include_router(
     connected_one.router, prefix=settings.API_V1_PREFIX, tags=["Connected One"]
 )
+app.include_router(profiles.router, prefix=settings.API_V1_PREFIX, tags=["Profiles"])
+app.include_router(page_groups.router, prefix=settings.API_V1_PREFIX, tags=["Page Groups"])
+app.include_router(pages.router, prefix=settings.API_V1_PREFIX, tags=["Pages"])
 
 
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Handle all unhandled exceptions"""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": {
@@ -3,6 +3,15 @@ Middleware components
 """
 
 from app.middlewares.auth import AuthMiddleware
+from app.middlewares.metrics import MetricsMiddleware
+from app.middlewares.profiling import ProfilingMiddleware
+from app.middlewares.query_profiler import QueryProfilingMiddleware
 from app.middlewares.rate_limit import RateLimitMiddleware
 
-__all__ = ["AuthMiddleware", "RateLimitMiddleware"]
+__all__ = [
+    "AuthMiddleware",
+    "MetricsMiddleware",
+    "ProfilingMiddleware",
+    "QueryProfilingMiddleware",
+    "RateLimitMiddleware",
+]
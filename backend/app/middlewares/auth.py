@@ -24,6 +24,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
     # Paths that don't require authentication
     EXCLUDED_PATHS = [
         "/health",
+        "/metrics",
         "/docs",
         "/redoc",
         "/openapi.json",
@@ -94,6 +95,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
                 # Store user_id in request state for later use
                 request.state.user_id = api_key.user_id
                 request.state.api_key_id = api_key.id
+                request.state.is_admin = api_key.is_admin
 
             except Exception as e:
                 return JSONResponse(
@@ -0,0 +1,48 @@
+"""
+Metrics middleware - Request latency recording
+"""
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import http_request_duration
+
+
+class MetricsMiddleware:
+    """
+    Records request latency per route template and status
+
+    Implemented as a plain ASGI middleware (not BaseHTTPMiddleware) so the
+    per-request cost is one perf_counter pair and a histogram increment.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the (shared) scope dict
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                route_path,
+                str(status_code),
+            )
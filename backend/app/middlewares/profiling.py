@@ -0,0 +1,75 @@
+"""
+Profiling middleware - Opt-in sampling profiler for single requests
+"""
+
+import threading
+from urllib.parse import parse_qs
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.services.sampling_profiler import (
+    SamplingProfiler,
+    new_profile_id,
+    verify_profile_request,
+)
+
+PROFILE_HEADER = b"x-profile-request"
+PROFILE_QUERY_FLAG = b"_profile="
+
+
+class ProfilingMiddleware:
+    """
+    Runs a sampling profiler around requests that ask for it
+
+    A request is profiled when it is made with an admin API key and either
+    carries a valid signed `X-Profile-Request` header or the `_profile=1`
+    query flag. The folded-stack profile is stored in PROFILING_OUTPUT_DIR
+    and its ID is returned in the `X-Profile-Id` response header.
+
+    Must be added inside AuthMiddleware so `request.state.is_admin` is set.
+    Requests that don't ask for profiling only pay for the trigger check.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    def _requested(self, scope: Scope) -> bool:
+        """Check the query flag and the signed header"""
+        query_string = scope.get("query_string", b"")
+        if PROFILE_QUERY_FLAG in query_string:
+            values = parse_qs(query_string.decode("latin-1")).get("_profile", [])
+            if any(value in ("1", "true") for value in values):
+                return True
+
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return verify_profile_request(value.decode("latin-1"), scope["path"])
+
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # Profiling is restricted to authenticated admin keys
+        if not scope.get("state", {}).get("is_admin"):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = new_profile_id(scope["method"], scope["path"])
+        profiler = SamplingProfiler(threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            await profiler.save(profile_id)
@@ -0,0 +1,53 @@
+"""
+Query profiling middleware - Server-Timing headers and N+1 warnings
+"""
+
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.services.query_profiler import end_profile, start_profile
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfilingMiddleware:
+    """
+    Collects per-request SQL statistics
+
+    - Adds `Server-Timing: db;dur=<ms>;desc="<n> queries"` to every response
+    - Warns when one request runs the same statement shape more than
+      SQL_REPEATED_QUERY_THRESHOLD times
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile, token = start_profile()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", profile.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_profile(token)
+            repeated = profile.repeated_statements(settings.SQL_REPEATED_QUERY_THRESHOLD)
+            for shape, count in repeated.items():
+                logger.warning(
+                    "Possible N+1: %s %s ran the same statement %d times: %s",
+                    scope["method"],
+                    scope["path"],
+                    count,
+                    shape,
+                )
@@ -10,6 +10,7 @@ from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.config import settings
+from app.services.metrics import rate_limit_rejections
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
@@ -31,13 +32,24 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         )
         self.window_size = 60  # 1 minute in seconds
 
-    def _get_rate_limit(self, path: str, method: str) -> int:
-        """Get rate limit for specific endpoint"""
+    def _get_limit_group(self, path: str, method: str) -> str:
+        """Get rate limit group for specific endpoint"""
         if path.startswith("/api/v1/events"):
-            return settings.RATE_LIMIT_EVENTS
+            return "events"
         elif path.startswith("/api/v1/heatmaps"):
-            return settings.RATE_LIMIT_HEATMAPS
+            return "heatmaps"
         elif path.startswith("/api/v1/funnels") and method in ["POST", "PUT", "DELETE"]:
+            return "funnels"
+        else:
+            return "general"
+
+    def _get_rate_limit(self, group: str) -> int:
+        """Get rate limit for an endpoint group"""
+        if group == "events":
+            return settings.RATE_LIMIT_EVENTS
+        elif group == "heatmaps":
+            return settings.RATE_LIMIT_HEATMAPS
+        elif group == "funnels":
             return settings.RATE_LIMIT_FUNNELS
         else:
             return settings.RATE_LIMIT_GENERAL
@@ -65,8 +77,8 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     ) -> Response:
         """Process request and check rate limits"""
 
-        # Skip rate limiting for health check
-        if request.url.path == "/health":
+        # Skip rate limiting for health check and metrics scrapes
+        if request.url.path in ("/health", "/metrics"):
             return await call_next(request)
 
         # Get client IP
@@ -79,13 +91,15 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         self._clean_old_requests(client_ip, endpoint_key)
 
         # Get rate limit for this endpoint
-        rate_limit = self._get_rate_limit(request.url.path, request.method)
+        limit_group = self._get_limit_group(request.url.path, request.method)
+        rate_limit = self._get_rate_limit(limit_group)
 
         # Get current request count
         current_count = self._get_request_count(client_ip, endpoint_key)
 
         # Check if rate limit exceeded
         if current_count >= rate_limit:
+            rate_limit_rejections.inc(limit_group)
             remaining = 0
             reset_at = time.time() + self.window_size
 
@@ -14,6 +14,11 @@ from app.models.funnel_event import FunnelEvent
 from app.models.webhook_log import WebhookLog
 from app.models.api_key import APIKey
 from app.models.webhook_config import WebhookConfig
+from app.models.result_cache_entry import ResultCacheEntry
+from app.models.heatmap_tile import HeatmapTileCell, HeatmapTileRollup
+from app.models.user_sketch import UserSketch, UserSketchBuild
+from app.models.page_group import PageGroup, PageGroupMember
+from app.models.page_stats import PageScrollSession, PageStats
 
 __all__ = [
     "User",
@@ -28,4 +33,13 @@ __all__ = [
     "WebhookLog",
     "APIKey",
     "WebhookConfig",
+    "ResultCacheEntry",
+    "HeatmapTileCell",
+    "HeatmapTileRollup",
+    "UserSketch",
+    "UserSketchBuild",
+    "PageGroup",
+    "PageGroupMember",
+    "PageStats",
+    "PageScrollSession",
 ]
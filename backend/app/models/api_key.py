@@ -38,6 +38,9 @@ class APIKey(Base):
     # Key status
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
 
+    # Admin keys may use operational features (e.g. request profiling)
+    is_admin: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+
     # Usage tracking
     last_used_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
@@ -4,7 +4,17 @@ Click Event model - Click tracking
 
 from datetime import datetime
 from uuid import uuid4
-from sqlalchemy import String, Integer, Text, DateTime, ForeignKey
+from sqlalchemy import (
+    String,
+    Integer,
+    SmallInteger,
+    Float,
+    Boolean,
+    Text,
+    DateTime,
+    ForeignKey,
+    Index,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -15,6 +25,21 @@ class ClickEvent(Base):
     """Click event model for tracking user clicks"""
 
     __tablename__ = "click_events"
+    __table_args__ = (
+        # Per-device heatmaps: page and breakpoint equality, then time range
+        Index("ix_click_events_page_breakpoint_timestamp", "page_id", "breakpoint", "timestamp"),
+        # Segment filters answered without joining sessions
+        Index(
+            "ix_click_events_page_device_browser_timestamp",
+            "page_id",
+            "device_type",
+            "browser",
+            "timestamp",
+        ),
+        Index("ix_click_events_page_returning_timestamp", "page_id", "is_returning", "timestamp"),
+        # Sampled heatmaps read only the sessions with sample_key below a threshold
+        Index("ix_click_events_page_sample_timestamp", "page_id", "sample_key", "timestamp"),
+    )
 
     # Primary key
     id: Mapped[UUID] = mapped_column(
@@ -43,6 +68,18 @@ class ClickEvent(Base):
     viewport_width: Mapped[int] = mapped_column(Integer, nullable=False)
     viewport_height: Mapped[int] = mapped_column(Integer, nullable=False)
 
+    # Derived at ingest: x / viewport_width and the viewport's breakpoint
+    x_ratio: Mapped[float | None] = mapped_column(Float, nullable=True)
+    breakpoint: Mapped[str | None] = mapped_column(String(20), nullable=True)
+
+    # Copied from the session at ingest (app.services.segments)
+    device_type: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    browser: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    is_returning: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
+
+    # Hash of session_id into [0, SAMPLE_KEYS) (app.services.sampling)
+    sample_key: Mapped[int | None] = mapped_column(SmallInteger, nullable=True)
+
     # Element information
     element_tag: Mapped[str | None] = mapped_column(String(50), nullable=True)
     element_id: Mapped[str | None] = mapped_column(String(255), nullable=True)
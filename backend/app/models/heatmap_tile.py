@@ -0,0 +1,56 @@
+"""
+Heatmap Tile models - Precomputed per-zoom cell aggregates for the tile pyramid
+"""
+
+from datetime import date, datetime
+from uuid import UUID as PyUUID
+from sqlalchemy import String, Integer, SmallInteger, Date, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+
+
+class HeatmapTileCell(Base):
+    """
+    Event count of one cell of one zoom level for one page and day
+
+    Cell size at zoom z is TILE_MIN_CELL_PX * 2 ** (TILE_MAX_ZOOM - z);
+    cell_x / cell_y are page pixel coordinates divided by that size.
+    """
+
+    __tablename__ = "heatmap_tile_cells"
+
+    # Primary key (also the lookup order: page, kind, zoom, day, cell range)
+    page_id: Mapped[PyUUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("pages.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    zoom: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True, index=True)  # Rollup rebuilds
+    cell_x: Mapped[int] = mapped_column(Integer, primary_key=True)
+    cell_y: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    event_count: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    def __repr__(self) -> str:
+        return (
+            f"<HeatmapTileCell(page_id={self.page_id}, kind={self.kind}, zoom={self.zoom}, "
+            f"day={self.day}, cell=({self.cell_x}, {self.cell_y}))>"
+        )
+
+
+class HeatmapTileRollup(Base):
+    """Days whose events have been aggregated into heatmap_tile_cells"""
+
+    __tablename__ = "heatmap_tile_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    rolled_up_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<HeatmapTileRollup(day={self.day})>"
@@ -0,0 +1,56 @@
+"""
+Page Group models - URL patterns grouping pages for aggregated heatmaps
+"""
+
+from datetime import datetime
+from uuid import uuid4, UUID as PyUUID
+from sqlalchemy import String, Text, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+
+
+class PageGroup(Base):
+    """
+    Named URL pattern, e.g. https://shop.example.com/product/*
+
+    regex is the pattern compiled for Postgres (see app.services.page_groups);
+    the matching pages are listed in page_group_members.
+    """
+
+    __tablename__ = "page_groups"
+
+    # Primary key
+    id: Mapped[PyUUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    pattern: Mapped[str] = mapped_column(Text, nullable=False)
+    regex: Mapped[str] = mapped_column(Text, nullable=False)
+
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<PageGroup(id={self.id}, name={self.name}, pattern={self.pattern})>"
+
+
+class PageGroupMember(Base):
+    """Page matching a group's pattern"""
+
+    __tablename__ = "page_group_members"
+
+    group_id: Mapped[PyUUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("page_groups.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    page_id: Mapped[PyUUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("pages.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+
+    def __repr__(self) -> str:
+        return f"<PageGroupMember(group_id={self.group_id}, page_id={self.page_id})>"
@@ -0,0 +1,72 @@
+"""
+Page Stats models - Per-page activity counters
+"""
+
+from datetime import datetime
+from uuid import UUID as PyUUID
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+
+
+class PageStats(Base):
+    """
+    Running totals of a page's sessions and events
+
+    Maintained incrementally by ingest (see app.services.page_stats); the
+    (counter, page_id) indexes serve the keyset-paginated page lists.
+    """
+
+    __tablename__ = "page_stats"
+    __table_args__ = (
+        Index("ix_page_stats_last_event_at_page_id", "last_event_at", "page_id"),
+        Index("ix_page_stats_sessions_page_id", "sessions", "page_id"),
+        Index("ix_page_stats_clicks_page_id", "clicks", "page_id"),
+    )
+
+    page_id: Mapped[PyUUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("pages.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    sessions: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    clicks: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    scrolls: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    scroll_sessions: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    mouse_moves: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+
+    # Latest session start or event (the page's creation until then)
+    last_event_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<PageStats(page_id={self.page_id}, sessions={self.sessions})>"
+
+
+class PageScrollSession(Base):
+    """
+    Session with at least one scroll event on a page
+
+    The scroll endpoint inserts the marker with ON CONFLICT DO NOTHING, so
+    the batch that creates it is the one that counts the session in
+    PageStats.scroll_sessions, even when batches arrive concurrently.
+    """
+
+    __tablename__ = "page_scroll_sessions"
+
+    page_id: Mapped[PyUUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("pages.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    session_id: Mapped[PyUUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("sessions.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+
+    def __repr__(self) -> str:
+        return f"<PageScrollSession(page_id={self.page_id}, session_id={self.session_id})>"
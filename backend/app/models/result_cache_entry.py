@@ -0,0 +1,28 @@
+"""
+Result Cache Entry model - Shared second-level cache storage
+"""
+
+from datetime import datetime
+from sqlalchemy import Text, LargeBinary, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class ResultCacheEntry(Base):
+    """
+    Serialized aggregate result shared between instances
+
+    UNLOGGED: not WAL-logged (cheap writes, not replicated, emptied after a
+    crash), which is acceptable for cache contents.
+    """
+
+    __tablename__ = "result_cache"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key: Mapped[str] = mapped_column(Text, primary_key=True)
+    value: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<ResultCacheEntry(key={self.key}, expires_at={self.expires_at})>"
@@ -0,0 +1,45 @@
+"""
+User Sketch models - Per-day HyperLogLog sketches of unique users
+"""
+
+from datetime import date, datetime
+from uuid import UUID as PyUUID
+from sqlalchemy import String, Date, DateTime, LargeBinary
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+
+
+class UserSketch(Base):
+    """
+    HyperLogLog registers of the users behind one metric of one scope and day
+
+    Scopes are pages (metrics "scroll:<min depth>") and funnel steps
+    (metrics "entered" and "completed"); see app.services.user_sketches.
+    """
+
+    __tablename__ = "user_sketches"
+
+    # Primary key (also the lookup order: scope, metric, day range)
+    scope_id: Mapped[PyUUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    metric: Mapped[str] = mapped_column(String(20), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    registers: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<UserSketch(scope_id={self.scope_id}, metric={self.metric}, day={self.day})>"
+
+
+class UserSketchBuild(Base):
+    """Days whose sketches have been built from the raw events"""
+
+    __tablename__ = "user_sketch_builds"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    built_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<UserSketchBuild(day={self.day})>"
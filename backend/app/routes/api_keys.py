@@ -8,7 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_admin_db
 from app.models.api_key import APIKey
 from app.schemas.api_key import (
     APIKeyCreate,
@@ -25,7 +25,7 @@ router = APIRouter()
 async def create_api_key(
     request: Request,
     api_key_data: APIKeyCreate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Create a new API key for the authenticated user
@@ -55,7 +55,7 @@ async def list_api_keys(
     request: Request,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     List all API keys for the authenticated user
@@ -88,7 +88,7 @@ async def list_api_keys(
 async def get_api_key(
     request: Request,
     api_key_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Get details of a specific API key
@@ -124,7 +124,7 @@ async def update_api_key(
     request: Request,
     api_key_id: UUID,
     api_key_data: APIKeyUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Update an API key
@@ -173,7 +173,7 @@ async def update_api_key(
 async def delete_api_key(
     request: Request,
     api_key_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Delete an API key
@@ -7,7 +7,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 
-from app.database import get_db
+from app.database import get_admin_db
 from app.services.connected_one_service import ConnectedOneService
 from app.services.webhook_service import WebhookService
 from app.schemas.connected_one import (
@@ -24,7 +24,7 @@ async def get_funnels(
     request: Request,
     project_id: str,
     connected_one_api_key: str = Header(..., alias="X-Connected-One-API-Key"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Get funnel information from Connected One
@@ -66,7 +66,7 @@ async def get_project_settings(
     request: Request,
     project_id: str,
     connected_one_api_key: str = Header(..., alias="X-Connected-One-API-Key"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Get project settings from Connected One
@@ -109,7 +109,7 @@ async def send_heatmap_event(
     event_data: HeatmapEventPayload,
     connected_one_api_key: str = Header(..., alias="X-Connected-One-API-Key"),
     webhook_signature: str = Header(..., alias="X-Webhook-Signature"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Send heatmap event to Connected One webhook
@@ -4,6 +4,7 @@ Event recording API endpoints
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
@@ -11,19 +12,35 @@ from app.models.page import Page
 from app.models.click_event import ClickEvent
 from app.models.scroll_event import ScrollEvent
 from app.models.mouse_move_event import MouseMoveEvent
+from app.models.page_stats import PageScrollSession
 from app.schemas.event import (
     ClickEventBatch,
     ScrollEventBatch,
     MouseMoveEventBatch,
     EventBatchResponse,
 )
+from app.services.breakpoints import breakpoint_for, x_ratio
+from app.services.fast_json import fast_response
+from app.services.heatmap_cache import ingest_watermarks
+from app.services.metrics import events_ingested
+from app.services.page_stats import record_page_activity
+from app.services.sampling import sample_key
+from app.services.segments import session_segment
+from app.services.urls import normalize_url
+from app.services.user_sketches import record_scroll_events
 
 router = APIRouter()
 
 
 async def get_page_by_url(db: AsyncSession, url: str) -> Page:
     """Get page by URL"""
-    stmt = select(Page).where(Page.url == url)
+    normalized = normalize_url(url)
+    stmt = (
+        select(Page)
+        .where(Page.url.in_({url, normalized}))
+        .order_by(Page.url != normalized)  # Pages created before normalization match as sent
+        .limit(1)
+    )
     result = await db.execute(stmt)
     page = result.scalar_one_or_none()
 
@@ -58,8 +75,10 @@ async def create_click_events(
     - **events**: List of click events (required, max 100)
     """
 
-    # Get page
+    # Get page and the session's segment (copied onto every event)
     page = await get_page_by_url(db, batch.page_url)
+    segment = await session_segment(db, batch.session_id)
+    session_sample_key = sample_key(batch.session_id)
 
     # Create click events
     click_events = [
@@ -70,6 +89,12 @@ async def create_click_events(
             y=event.y,
             viewport_width=event.viewport_width,
             viewport_height=event.viewport_height,
+            x_ratio=x_ratio(event.x, event.viewport_width),
+            breakpoint=breakpoint_for(event.viewport_width),
+            device_type=segment.device_type,
+            browser=segment.browser,
+            is_returning=segment.is_returning,
+            sample_key=session_sample_key,
             element_tag=event.element.tag,
             element_id=event.element.id,
             element_class=event.element.class_,
@@ -81,10 +106,13 @@ async def create_click_events(
 
     db.add_all(click_events)
     await db.commit()
+    record_page_activity(page.id, max(e.timestamp for e in batch.events), clicks=len(click_events))
+    ingest_watermarks.bump(page.id)
+    events_ingested.inc("click", amount=len(click_events))
 
-    return EventBatchResponse(
-        inserted=len(click_events),
-        message="Click events recorded successfully",
+    return fast_response(
+        {"inserted": len(click_events), "message": "Click events recorded successfully"},
+        status.HTTP_201_CREATED,
     )
 
 
@@ -105,8 +133,20 @@ async def create_scroll_events(
     - **events**: List of scroll events (required, max 100)
     """
 
-    # Get page
+    # Get page and the session's user (for the unique-user sketches)
     page = await get_page_by_url(db, batch.page_url)
+    segment = await session_segment(db, batch.session_id)
+    # The first batch of the session on this page creates its marker; a
+    # concurrent one waits for it to commit and then inserts nothing
+    first_scrolls = (
+        await db.scalar(
+            insert(PageScrollSession)
+            .values(page_id=page.id, session_id=batch.session_id)
+            .on_conflict_do_nothing()
+            .returning(PageScrollSession.page_id)
+        )
+        is not None
+    )
 
     # Create scroll events
     scroll_events = [
@@ -123,10 +163,21 @@ async def create_scroll_events(
 
     db.add_all(scroll_events)
     await db.commit()
+    record_page_activity(
+        page.id,
+        max(e.timestamp for e in batch.events),
+        scrolls=len(scroll_events),
+        scroll_sessions=int(first_scrolls),
+    )
+    record_scroll_events(
+        page.id, segment.user_id, ((e.depth_percent, e.timestamp) for e in batch.events)
+    )
+    ingest_watermarks.bump(page.id)
+    events_ingested.inc("scroll", amount=len(scroll_events))
 
-    return EventBatchResponse(
-        inserted=len(scroll_events),
-        message="Scroll events recorded successfully",
+    return fast_response(
+        {"inserted": len(scroll_events), "message": "Scroll events recorded successfully"},
+        status.HTTP_201_CREATED,
     )
 
 
@@ -147,8 +198,10 @@ async def create_mouse_move_events(
     - **events**: List of mouse move events (required, max 100)
     """
 
-    # Get page
+    # Get page and the session's segment (copied onto every event)
     page = await get_page_by_url(db, batch.page_url)
+    segment = await session_segment(db, batch.session_id)
+    session_sample_key = sample_key(batch.session_id)
 
     # Create mouse move events
     mouse_move_events = [
@@ -159,6 +212,12 @@ async def create_mouse_move_events(
             y=event.y,
             viewport_width=event.viewport_width,
             viewport_height=event.viewport_height,
+            x_ratio=x_ratio(event.x, event.viewport_width),
+            breakpoint=breakpoint_for(event.viewport_width),
+            device_type=segment.device_type,
+            browser=segment.browser,
+            is_returning=segment.is_returning,
+            sample_key=session_sample_key,
             timestamp=event.timestamp,
         )
         for event in batch.events
@@ -166,8 +225,13 @@ async def create_mouse_move_events(
 
     db.add_all(mouse_move_events)
     await db.commit()
+    record_page_activity(
+        page.id, max(e.timestamp for e in batch.events), mouse_moves=len(mouse_move_events)
+    )
+    ingest_watermarks.bump(page.id)
+    events_ingested.inc("mouse_move", amount=len(mouse_move_events))
 
-    return EventBatchResponse(
-        inserted=len(mouse_move_events),
-        message="Mouse move events recorded successfully",
+    return fast_response(
+        {"inserted": len(mouse_move_events), "message": "Mouse move events recorded successfully"},
+        status.HTTP_201_CREATED,
     )
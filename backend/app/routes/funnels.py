@@ -3,14 +3,15 @@ Funnel management API endpoints
 """
 
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy import select, func, distinct, case
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_admin_db, get_db, get_read_db
 from app.models.funnel import Funnel
 from app.models.funnel_step import FunnelStep
 from app.models.funnel_event import FunnelEvent
@@ -23,6 +24,16 @@ from app.schemas.funnel import (
     FunnelInfo,
     DateRange,
 )
+from app.services.fast_json import fast_response
+from app.services.heatmap_cache import cache_key, cached_response, ingest_watermarks
+from app.services.metrics import events_ingested
+from app.services.user_sketches import (
+    COMPLETED,
+    ENTERED,
+    error_bound,
+    record_funnel_event,
+    unique_users,
+)
 
 router = APIRouter()
 
@@ -30,7 +41,7 @@ router = APIRouter()
 @router.post("/funnels", response_model=FunnelResponse, status_code=status.HTTP_201_CREATED)
 async def create_funnel(
     funnel_data: FunnelCreate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Create a new funnel with steps
@@ -75,7 +86,7 @@ async def create_funnel(
 @router.get("/funnels", response_model=List[FunnelResponse], status_code=status.HTTP_200_OK)
 async def get_funnels(
     project_id: Optional[str] = Query(None, description="Connected One project ID"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Get list of funnels, optionally filtered by project ID
@@ -101,7 +112,7 @@ async def get_funnels(
 )
 async def get_funnel(
     funnel_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Get funnel details by ID
@@ -176,8 +187,16 @@ async def create_funnel_event(
 
     db.add(event)
     await db.commit()
+    record_funnel_event(
+        event_data.funnel_step_id, event_data.user_id, event_data.completed, event_data.timestamp
+    )
+    ingest_watermarks.bump(funnel_id)
+    events_ingested.inc("funnel")
 
-    return {"status": "success", "message": "Funnel event recorded"}
+    return fast_response(
+        {"status": "success", "message": "Funnel event recorded"},
+        status.HTTP_201_CREATED,
+    )
 
 
 @router.get(
@@ -186,17 +205,22 @@ async def create_funnel_event(
     status_code=status.HTTP_200_OK,
 )
 async def get_funnel_stats(
+    request: Request,
     funnel_id: UUID,
     start_date: Optional[datetime] = Query(None, description="Start date (ISO8601)"),
     end_date: Optional[datetime] = Query(None, description="End date (ISO8601)"),
-    db: AsyncSession = Depends(get_db),
-):
+    approx: bool = Query(False, description="Estimate unique users from per-day sketches"),
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
     """
     Get funnel statistics (conversion rates, drop-off rates)
 
     - **funnel_id**: Funnel UUID (required)
     - **start_date**: Start date filter (optional)
     - **end_date**: End date filter (optional)
+    - **approx**: Count users by merging per-day HyperLogLog sketches of
+      each step instead of COUNT(DISTINCT) queries; the range is widened
+      to whole days and error_bound reports the relative standard error
     """
 
     # Get funnel with steps
@@ -217,39 +241,44 @@ async def get_funnel_stats(
             },
         )
 
-    # Calculate stats for each step
-    stats = []
-    first_step_users = 0
-
-    for step in sorted(funnel.steps, key=lambda s: s.step_order):
-        # Count unique users who entered this step
-        entered_query = (
-            select(func.count(distinct(FunnelEvent.user_id)))
-            .where(FunnelEvent.funnel_step_id == step.id)
-        )
+    approx = approx and settings.USER_SKETCHES_ENABLED
+    key = cache_key(
+        "funnel-stats", funnel.id, start_date, end_date, **({"approx": True} if approx else {})
+    )
+    return await cached_response(
+        request,
+        key,
+        lambda session: build_funnel_stats(session, funnel, key.start, key.end, approx),
+        db=db,
+    )
 
-        if start_date:
-            entered_query = entered_query.where(FunnelEvent.timestamp >= start_date)
-        if end_date:
-            entered_query = entered_query.where(FunnelEvent.timestamp <= end_date)
 
-        entered_result = await db.execute(entered_query)
-        users_entered = entered_result.scalar() or 0
+async def build_funnel_stats(
+    db: AsyncSession,
+    funnel: Funnel,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    approx: bool = False,
+) -> FunnelStatsResponse:
+    """Per-step entered/completed users and overall conversion of a funnel"""
 
-        # Count unique users who completed this step
-        completed_query = (
-            select(func.count(distinct(FunnelEvent.user_id)))
-            .where(FunnelEvent.funnel_step_id == step.id)
-            .where(FunnelEvent.completed == True)
+    steps = sorted(funnel.steps, key=lambda s: s.step_order)
+    if approx:
+        estimates = await unique_users(
+            db, [step.id for step in steps], [ENTERED, COMPLETED], start_date, end_date
         )
 
-        if start_date:
-            completed_query = completed_query.where(FunnelEvent.timestamp >= start_date)
-        if end_date:
-            completed_query = completed_query.where(FunnelEvent.timestamp <= end_date)
+    # Calculate stats for each step
+    stats = []
+    first_step_users = 0
 
-        completed_result = await db.execute(completed_query)
-        users_completed = completed_result.scalar() or 0
+    for step in steps:
+        if approx:
+            users_entered = estimates[(step.id, ENTERED)]
+            # Completers are a subset of the step's users; estimates may cross
+            users_completed = min(estimates[(step.id, COMPLETED)], users_entered)
+        else:
+            users_entered, users_completed = await count_step_users(db, step, start_date, end_date)
 
         # Calculate rates
         completion_rate = (
@@ -275,7 +304,7 @@ async def get_funnel_stats(
     # Calculate overall conversion rate (first step to last step)
     last_step_completed = stats[-1].users_completed if stats else 0
     overall_conversion = (
-        (last_step_completed / first_step_users * 100) if first_step_users > 0 else 0.0
+        min(last_step_completed / first_step_users * 100, 100.0) if first_step_users > 0 else 0.0
     )
 
     return FunnelStatsResponse(
@@ -286,4 +315,45 @@ async def get_funnel_stats(
             start=start_date or datetime.min,
             end=end_date or datetime.utcnow(),
         ),
+        approximate=approx,
+        error_bound=error_bound() if approx else None,
+    )
+
+
+async def count_step_users(
+    db: AsyncSession,
+    step: FunnelStep,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+) -> Tuple[int, int]:
+    """Exact unique users who entered and who completed a step"""
+
+    # Count unique users who entered this step
+    entered_query = select(func.count(distinct(FunnelEvent.user_id))).where(
+        FunnelEvent.funnel_step_id == step.id
     )
+
+    if start_date:
+        entered_query = entered_query.where(FunnelEvent.timestamp >= start_date)
+    if end_date:
+        entered_query = entered_query.where(FunnelEvent.timestamp <= end_date)
+
+    entered_result = await db.execute(entered_query)
+    users_entered = entered_result.scalar() or 0
+
+    # Count unique users who completed this step
+    completed_query = (
+        select(func.count(distinct(FunnelEvent.user_id)))
+        .where(FunnelEvent.funnel_step_id == step.id)
+        .where(FunnelEvent.completed == True)
+    )
+
+    if start_date:
+        completed_query = completed_query.where(FunnelEvent.timestamp >= start_date)
+    if end_date:
+        completed_query = completed_query.where(FunnelEvent.timestamp <= end_date)
+
+    completed_result = await db.execute(completed_query)
+    users_completed = completed_result.scalar() or 0
+
+    return users_entered, users_completed
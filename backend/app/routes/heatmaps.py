@@ -2,13 +2,31 @@
 Heatmap data retrieval API endpoints
 """
 
-from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import select, func, distinct
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+    get_args,
+)
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Integer, Select, and_, cast, or_, select, func, distinct, true, tuple_
+from pydantic import BaseModel
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_read_db, read_target
 from app.models.page import Page
 from app.models.click_event import ClickEvent
 from app.models.scroll_event import ScrollEvent
@@ -18,14 +36,107 @@ from app.schemas.heatmap import (
     ClickHeatmapResponse,
     ScrollHeatmapResponse,
     MouseMoveHeatmapResponse,
+    HeatmapTileResponse,
+    HeatmapDiffResponse,
+    HeatmapBatchItem,
+    HeatmapBatchRequest,
+    HeatmapBatchResponse,
+    HeatmapFramesResponse,
     PageInfo,
     DateRange,
-    ClickHeatmapPoint,
     ScrollDepthData,
-    MouseMoveHeatmapPoint,
 )
+from app.services.admission import (
+    AdmissionSlot,
+    admitted_stream,
+    analytics_admission,
+    analytics_gate,
+)
+from app.services.heatmap_cache import (
+    HeatmapCacheKey,
+    cache_key,
+    cached_body,
+    cached_response,
+    etag_matches,
+    to_utc_naive,
+    validator_headers,
+)
+from app.services.heatmap_formats import (
+    FORMAT_MEDIA_TYPES,
+    ClickHeatmapFormat,
+    HeatmapFormat,
+    encode_columns,
+    int_column,
+    negotiate_format,
+)
+from app.services.fast_json import dumps
+from app.services.heatmap_render import MEDIA_TYPES, render_in_pool
+from app.services.heatmap_tiles import (
+    POINT_SOURCES,
+    cell_size,
+    default_day_range,
+    fetch_tile_cells,
+)
+from app.services.page_groups import PageScope, page_group_scope
+from app.services.sampling import sample_threshold
+from app.services.segments import (
+    NO_FILTERS,
+    EventFilters,
+    event_filters,
+    prefixed_event_filters,
+)
+from app.services.urls import normalize_url
+from app.services.user_sketches import SCROLL_DEPTHS, error_bound, scroll_metric, unique_users
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+Compute = Callable[[AsyncSession], Awaitable[Union[BaseModel, bytes]]]
+
+
+async def get_page_by_url(db: AsyncSession, url: str) -> Page:
+    """Get page by URL"""
+    normalized = normalize_url(url)
+    stmt = (
+        select(Page)
+        .where(Page.url.in_({url, normalized}))
+        .order_by(Page.url != normalized)  # Pages created before normalization match as sent
+        .limit(1)
+    )
+    result = await db.execute(stmt)
+    page = result.scalar_one_or_none()
+
+    if not page:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": {
+                    "code": "NOT_FOUND",
+                    "message": f"Page not found: {url}",
+                }
+            },
+        )
+
+    return page
+
+
+async def get_page_scope(
+    db: AsyncSession, page_url: Optional[str], page_group: Optional[str]
+) -> PageScope:
+    """The page or page group a heatmap request names (exactly one of them)"""
+    if (page_url is None) == (page_group is None):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": "Pass exactly one of page_url and page_group",
+                }
+            },
+        )
+    if page_group is not None:
+        return await page_group_scope(db, page_group)
+    return PageScope.of_page(await get_page_by_url(db, page_url))
 
 
 @router.get(
@@ -34,48 +145,144 @@ router = APIRouter()
     status_code=status.HTTP_200_OK,
 )
 async def get_click_heatmap(
-    page_url: str = Query(..., description="Page URL"),
+    request: Request,
+    page_url: Optional[str] = Query(None, description="Page URL"),
+    page_group: Optional[str] = Query(None, description="Page group name (instead of page_url)"),
     start_date: Optional[datetime] = Query(None, description="Start date (ISO8601)"),
     end_date: Optional[datetime] = Query(None, description="End date (ISO8601)"),
-    db: AsyncSession = Depends(get_db),
-):
+    output_format: Optional[ClickHeatmapFormat] = Query(
+        None,
+        alias="format",
+        description="json, columnar, binary, arrow or ndjson (default: Accept)",
+    ),
+    stream: bool = Query(False, description="Stream points as they are read (json or ndjson)"),
+    grid_size: Optional[int] = Query(
+        None, description="Bin clicks into square cells of this many pixels", ge=2, le=200
+    ),
+    top_n: int = Query(
+        20,
+        description="Most clicked elements to return with grid_size",
+        ge=0,
+        le=settings.CLICK_TOP_ELEMENTS_MAX,
+    ),
+    filters: EventFilters = Depends(event_filters),
+    db: AsyncSession = Depends(get_read_db),
+    admission: AdmissionSlot = Depends(analytics_admission),
+) -> Response:
     """
     Get click heatmap data for a specific page
 
-    - **page_url**: Page URL (required)
+    - **page_url** / **page_group**: Page URL, or the name of a page group to
+      aggregate over all its pages (exactly one is required)
     - **start_date**: Start date filter (optional)
     - **end_date**: End date filter (optional)
-    """
+    - **format**: Overrides the Accept header; columnar, binary and arrow
+      return columns x, y, count, element_tag and element_text (layouts in
+      app.services.heatmap_formats); ndjson streams one point per line
+    - **stream**: Read points through a server-side cursor and send them
+      as they arrive, bypassing the response cache (memory stays flat for
+      any number of points); json keeps the regular response shape with
+      page last
+    - **grid_size**: Return click counts per grid cell (x/y are the cell's
+      top-left corner) instead of per exact position and element, capped to
+      the CLICK_HEATMAP_MAX_CELLS densest cells (truncated is set when
+      cells were dropped), together with the top_n most clicked elements
+      by (tag, id, class); columnar formats return columns x, y and count
+    - **breakpoint**: Only clicks whose viewport fell into this breakpoint
+      (a HEATMAP_BREAKPOINTS name, e.g. mobile, tablet or desktop)
+    - **device_type** / **browser** / **returning**: Only clicks from
+      sessions in this segment (answered from the click rows, no join)
+    - **accuracy**: Read only this fraction of sessions (a uniform sample
+      fixed at ingest, served by a (page_id, sample_key, timestamp) index)
+      and scale counts back up; sampling_rate reports the fraction used.
+      0.01 gives a quick preview of a large page, 1 (default) is exact
 
-    # Get page
-    stmt = select(Page).where(Page.url == page_url)
-    result = await db.execute(stmt)
-    page = result.scalar_one_or_none()
-
-    if not page:
+    Responses carry an ETag; send it back in If-None-Match to get a 304
+    while no new events have been recorded for the page.
+    """
+    output_format = negotiate_format(request, output_format, get_args(ClickHeatmapFormat))
+    stream = stream or output_format == "ndjson"
+    if stream and (grid_size or output_format not in ("json", "ndjson")):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail={
                 "error": {
-                    "code": "NOT_FOUND",
-                    "message": f"Page not found: {page_url}",
+                    "code": "VALIDATION_ERROR",
+                    "message": "Only exact json or ndjson click heatmaps can be streamed",
                 }
             },
         )
 
+    page = await get_page_scope(db, page_url, page_group)
+    params = {"format": output_format}
+    if grid_size:
+        params["top_n"] = top_n
+    params.update(filters.cache_params())
+    key = cache_key("clicks", page.id, start_date, end_date, grid_size, **params)
+    if stream:
+        headers = {**validator_headers(key), "Vary": "Accept"}
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        # Release the request's connection: the stream reads on its own session
+        await db.commit()
+        # The stream keeps the request's admission slot until it ends
+        return StreamingResponse(
+            await admitted_stream(
+                admission, stream_click_heatmap(page, key.start, key.end, output_format, filters)
+            ),
+            media_type=FORMAT_MEDIA_TYPES[output_format],
+            headers=headers,
+        )
+
+    def compute(session: AsyncSession) -> Awaitable[Union[BaseModel, bytes]]:
+        if grid_size:
+            return build_click_grid_heatmap(
+                session, page, key.start, key.end, grid_size, top_n, output_format, filters
+            )
+        if output_format == "json":
+            return build_click_heatmap(session, page, key.start, key.end, filters)
+        return build_click_heatmap_columns(
+            session, page, key.start, key.end, output_format, filters
+        )
+
+    return await cached_response(
+        request,
+        key,
+        compute,
+        db=db,
+        media_type=FORMAT_MEDIA_TYPES[output_format],
+        headers={"Vary": "Accept"},
+    )
+
+
+def rows_as_dicts(rows: list) -> list:
+    """Result rows as plain dicts (several times faster than Row._asdict)"""
+    fields = rows[0]._fields if rows else ()
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def click_heatmap_query(
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    filters: EventFilters = NO_FILTERS,
+) -> Select:
+    """Click counts per (x, y, element)"""
+
     # Build query with date filters
     query = select(
         ClickEvent.x,
         ClickEvent.y,
-        func.count(ClickEvent.id).label("click_count"),
+        filters.scaled(func.count(ClickEvent.id)).label("click_count"),
         ClickEvent.element_tag,
         ClickEvent.element_text,
-    ).where(ClickEvent.page_id == page.id)
+    ).where(page.condition(ClickEvent.page_id))
 
     if start_date:
         query = query.where(ClickEvent.timestamp >= start_date)
     if end_date:
         query = query.where(ClickEvent.timestamp <= end_date)
+    query = filters.apply(query, ClickEvent)
 
     query = query.group_by(
         ClickEvent.x,
@@ -83,14 +290,23 @@ async def get_click_heatmap(
         ClickEvent.element_tag,
         ClickEvent.element_text,
     )
+    return query
 
-    # Execute query
-    result = await db.execute(query)
+
+async def fetch_click_heatmap(
+    db: AsyncSession,
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    filters: EventFilters = NO_FILTERS,
+) -> Tuple[list, int]:
+    """Click counts per (x, y, element) and the total click count"""
+    result = await db.execute(click_heatmap_query(page, start_date, end_date, filters))
     rows = result.all()
 
     # Get total clicks count
-    total_clicks_query = select(func.count(ClickEvent.id)).where(
-        ClickEvent.page_id == page.id
+    total_clicks_query = select(filters.scaled(func.count(ClickEvent.id))).where(
+        page.condition(ClickEvent.page_id)
     )
     if start_date:
         total_clicks_query = total_clicks_query.where(
@@ -98,30 +314,249 @@ async def get_click_heatmap(
         )
     if end_date:
         total_clicks_query = total_clicks_query.where(ClickEvent.timestamp <= end_date)
+    total_clicks_query = filters.apply(total_clicks_query, ClickEvent)
 
     total_clicks_result = await db.execute(total_clicks_query)
     total_clicks = total_clicks_result.scalar()
 
-    # Build response
-    heatmap_data = [
-        ClickHeatmapPoint(
-            x=row.x,
-            y=row.y,
-            click_count=row.click_count,
-            element_tag=row.element_tag,
-            element_text=row.element_text,
+    return rows, total_clicks
+
+
+async def build_click_heatmap(
+    db: AsyncSession,
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    filters: EventFilters = NO_FILTERS,
+) -> bytes:
+    """Aggregate click events of a page into a click heatmap"""
+    rows, total_clicks = await fetch_click_heatmap(db, page, start_date, end_date, filters)
+    return encode_click_heatmap(
+        page, rows, total_clicks, start_date, end_date, filters.sampling_rate
+    )
+
+
+def encode_click_heatmap(
+    page: PageScope,
+    rows: list,
+    total_clicks: int,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    sampling_rate: float = 1.0,
+) -> bytes:
+    """ClickHeatmapResponse body; query rows already have the point fields"""
+    return dumps(
+        {
+            "page": PageInfo(url=page.url, title=page.title, total_clicks=total_clicks),
+            "heatmap_data": rows_as_dicts(rows),
+            "date_range": DateRange(
+                start=start_date or datetime.min,
+                end=end_date or datetime.utcnow(),
+            ),
+            "grid_size": None,
+            "top_elements": None,
+            "truncated": False,
+            "sampling_rate": sampling_rate,
+        }
+    )
+
+
+async def build_click_heatmap_columns(
+    db: AsyncSession,
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    output_format: str,
+    filters: EventFilters = NO_FILTERS,
+) -> bytes:
+    """Click heatmap encoded column-wise, without per-point models"""
+    rows, total_clicks = await fetch_click_heatmap(db, page, start_date, end_date, filters)
+    xs, ys, counts, tags, texts = zip(*rows) if rows else ((),) * 5
+    meta = {
+        "page": {"url": page.url, "title": page.title, "total_clicks": total_clicks},
+        "date_range": {
+            "start": start_date or datetime.min,
+            "end": end_date or datetime.utcnow(),
+        },
+        "sampling_rate": filters.sampling_rate,
+    }
+    columns = {
+        "x": int_column(xs),
+        "y": int_column(ys),
+        "count": int_column(counts, "<u4"),
+        "element_tag": list(tags),
+        "element_text": list(texts),
+    }
+    return encode_columns(output_format, meta, columns)
+
+
+async def stream_click_heatmap(
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    output_format: str,
+    filters: EventFilters = NO_FILTERS,
+) -> AsyncIterator[bytes]:
+    """
+    Encode click heatmap points chunk by chunk from a server-side cursor
+
+    json yields the ClickHeatmapResponse shape with heatmap_data first, so
+    total_clicks (the sum of the streamed counts) can follow it; ndjson
+    yields one point object per line.
+    """
+    query = click_heatmap_query(page, start_date, end_date, filters).execution_options(
+        yield_per=settings.HEATMAP_STREAM_CHUNK_ROWS
+    )
+    total_clicks = 0
+    separator = b""
+    # Own session: the request's session is closed before the body is sent
+    target = await read_target()
+    async with target.sessionmaker() as session:
+        result = await session.stream(query)
+        if output_format == "json":
+            yield b'{"heatmap_data":['
+        async for rows in result.partitions():
+            points = rows_as_dicts(rows)
+            total_clicks += sum(point["click_count"] for point in points)
+            if output_format == "ndjson":
+                yield b"".join(dumps(point) + b"\n" for point in points)
+            else:
+                yield separator + dumps(points)[1:-1]
+                separator = b","
+
+    if output_format == "json":
+        page_info = PageInfo(url=page.url, title=page.title, total_clicks=total_clicks)
+        date_range = DateRange(
+            start=start_date or datetime.min,
+            end=end_date or datetime.utcnow(),
         )
-        for row in rows
-    ]
+        yield (
+            f'],"page":{page_info.model_dump_json()},'
+            f'"date_range":{date_range.model_dump_json()},'
+            '"grid_size":null,"top_elements":null,"truncated":false,'
+            f'"sampling_rate":{filters.sampling_rate}}}'
+        ).encode()
 
-    return ClickHeatmapResponse(
-        page=PageInfo(url=page.url, title=page.title, total_clicks=total_clicks),
-        heatmap_data=heatmap_data,
-        date_range=DateRange(
+
+async def fetch_click_grid(
+    db: AsyncSession,
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    grid_size: int,
+    top_n: int,
+    filters: EventFilters = NO_FILTERS,
+) -> Tuple[list, list, int, bool]:
+    """
+    Grid cell counts and top elements from a single scan (GROUPING SETS)
+
+    Window functions rank both grouping sets in the same statement, so only
+    the CLICK_HEATMAP_MAX_CELLS densest cells and the top_n elements leave
+    the database.
+
+    Returns:
+        (cells, elements, total_clicks, truncated): cells are
+        (x, y, click_count) rows, elements (element_tag, element_id,
+        element_class, click_count) rows, both by descending count
+    """
+    cell_x = ClickEvent.x // grid_size * grid_size
+    cell_y = ClickEvent.y // grid_size * grid_size
+    element = (ClickEvent.element_tag, ClickEvent.element_id, ClickEvent.element_class)
+
+    grouped = select(
+        cell_x.label("x"),
+        cell_y.label("y"),
+        *element,
+        func.grouping(ClickEvent.element_tag).label("is_cell"),
+        filters.scaled(func.count()).label("click_count"),
+    ).where(page.condition(ClickEvent.page_id))
+    if start_date:
+        grouped = grouped.where(ClickEvent.timestamp >= start_date)
+    if end_date:
+        grouped = grouped.where(ClickEvent.timestamp <= end_date)
+    grouped = filters.apply(grouped, ClickEvent)
+    grouped = grouped.group_by(
+        func.grouping_sets(tuple_(cell_x, cell_y), tuple_(*element))
+    ).subquery()
+
+    ranked = select(
+        grouped,
+        func.row_number()
+        .over(partition_by=grouped.c.is_cell, order_by=grouped.c.click_count.desc())
+        .label("rank"),
+        func.count().over(partition_by=grouped.c.is_cell).label("groups"),
+        func.sum(grouped.c.click_count).over(partition_by=grouped.c.is_cell).label("total"),
+    ).subquery()
+    query = (
+        select(ranked)
+        .where(
+            or_(
+                and_(ranked.c.is_cell == 1, ranked.c.rank <= settings.CLICK_HEATMAP_MAX_CELLS),
+                and_(ranked.c.is_cell == 0, ranked.c.rank <= top_n),
+            )
+        )
+        .order_by(ranked.c.is_cell, ranked.c.rank)
+    )
+    result = await db.execute(query)
+
+    cells, elements = [], []
+    total_clicks, truncated = 0, False
+    for row in result:
+        total_clicks = int(row.total)
+        if row.is_cell:
+            cells.append((row.x, row.y, row.click_count))
+            truncated = row.groups > settings.CLICK_HEATMAP_MAX_CELLS
+        else:
+            elements.append((row.element_tag, row.element_id, row.element_class, row.click_count))
+    return cells, elements, total_clicks, truncated
+
+
+async def build_click_grid_heatmap(
+    db: AsyncSession,
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    grid_size: int,
+    top_n: int,
+    output_format: str,
+    filters: EventFilters = NO_FILTERS,
+) -> bytes:
+    """Grid-binned click heatmap with top elements, in any output format"""
+    cells, elements, total_clicks, truncated = await fetch_click_grid(
+        db, page, start_date, end_date, grid_size, top_n, filters
+    )
+    top_elements = [
+        {
+            "element_tag": tag,
+            "element_id": element_id,
+            "element_class": element_class,
+            "click_count": count,
+            "share": round(count / total_clicks, 4),
+        }
+        for tag, element_id, element_class, count in elements
+    ]
+    meta = {
+        "page": PageInfo(url=page.url, title=page.title, total_clicks=total_clicks),
+        "date_range": DateRange(
             start=start_date or datetime.min,
             end=end_date or datetime.utcnow(),
         ),
-    )
+        "grid_size": grid_size,
+        "top_elements": top_elements,
+        "truncated": truncated,
+        "sampling_rate": filters.sampling_rate,
+    }
+
+    if output_format == "json":
+        heatmap_data = [
+            {"x": x, "y": y, "click_count": count, "element_tag": None, "element_text": None}
+            for x, y, count in cells
+        ]
+        return dumps({**meta, "heatmap_data": heatmap_data})
+
+    xs, ys, counts = zip(*cells) if cells else ((),) * 3
+    columns = {"x": int_column(xs), "y": int_column(ys), "count": int_column(counts, "<u4")}
+    return encode_columns(output_format, meta, columns)
 
 
 @router.get(
@@ -130,72 +565,85 @@ async def get_click_heatmap(
     status_code=status.HTTP_200_OK,
 )
 async def get_scroll_heatmap(
-    page_url: str = Query(..., description="Page URL"),
+    request: Request,
+    page_url: Optional[str] = Query(None, description="Page URL"),
+    page_group: Optional[str] = Query(None, description="Page group name (instead of page_url)"),
     start_date: Optional[datetime] = Query(None, description="Start date (ISO8601)"),
     end_date: Optional[datetime] = Query(None, description="End date (ISO8601)"),
-    db: AsyncSession = Depends(get_db),
-):
+    approx: bool = Query(False, description="Estimate unique users from per-day sketches"),
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
     """
     Get scroll depth data for a specific page
 
-    - **page_url**: Page URL (required)
+    - **page_url** / **page_group**: Page URL, or the name of a page group to
+      aggregate over all its pages (exactly one is required)
     - **start_date**: Start date filter (optional)
     - **end_date**: End date filter (optional)
+    - **approx**: Count users by merging per-day HyperLogLog sketches
+      instead of a COUNT(DISTINCT) over the events; the range is widened
+      to whole days and error_bound reports the relative standard error
     """
+    page = await get_page_scope(db, page_url, page_group)
+    approx = approx and settings.USER_SKETCHES_ENABLED
+    key = cache_key(
+        "scrolls", page.id, start_date, end_date, **({"approx": True} if approx else {})
+    )
+    return await cached_response(
+        request,
+        key,
+        lambda session: build_scroll_heatmap(session, page, key.start, key.end, approx),
+        db=db,
+    )
 
-    # Get page
-    stmt = select(Page).where(Page.url == page_url)
-    result = await db.execute(stmt)
-    page = result.scalar_one_or_none()
 
-    if not page:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={
-                "error": {
-                    "code": "NOT_FOUND",
-                    "message": f"Page not found: {page_url}",
-                }
-            },
+async def build_scroll_heatmap(
+    db: AsyncSession,
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    approx: bool = False,
+) -> ScrollHeatmapResponse:
+    """Aggregate scroll events of a page into depth reach rates"""
+
+    if approx:
+        metrics = [scroll_metric(depth) for depth in SCROLL_DEPTHS]
+        estimates = await unique_users(
+            db, page.page_ids, metrics, start_date, end_date, merge_as=page.id
         )
+        # Estimates of nested user sets can cross; keep them non-increasing
+        reached = {}
+        previous = None
+        for depth, metric in zip(SCROLL_DEPTHS, metrics):
+            count = estimates[(page.id, metric)]
+            previous = reached[depth] = count if previous is None else min(count, previous)
+    else:
+        reached = {}
+        for depth in SCROLL_DEPTHS:
+            users_query = (
+                select(func.count(distinct(Session.user_id)))
+                .select_from(ScrollEvent)
+                .join(Session, ScrollEvent.session_id == Session.id)
+                .where(page.condition(ScrollEvent.page_id))
+                .where(ScrollEvent.depth_percent >= depth)
+            )
 
-    # Get total unique users
-    total_users_query = (
-        select(func.count(distinct(Session.user_id)))
-        .select_from(ScrollEvent)
-        .join(Session, ScrollEvent.session_id == Session.id)
-        .where(ScrollEvent.page_id == page.id)
-    )
+            if start_date:
+                users_query = users_query.where(ScrollEvent.timestamp >= start_date)
+            if end_date:
+                users_query = users_query.where(ScrollEvent.timestamp <= end_date)
 
-    if start_date:
-        total_users_query = total_users_query.where(ScrollEvent.timestamp >= start_date)
-    if end_date:
-        total_users_query = total_users_query.where(ScrollEvent.timestamp <= end_date)
+            users_result = await db.execute(users_query)
+            reached[depth] = users_result.scalar() or 0
 
-    total_users_result = await db.execute(total_users_query)
-    total_users = total_users_result.scalar() or 1  # Avoid division by zero
+    # Everyone who scrolled reached depth 0
+    total_users = reached[0] or 1  # Avoid division by zero
 
     # Get scroll depth statistics
-    depth_thresholds = [0, 25, 50, 75, 100]
     scroll_data = []
 
-    for depth in depth_thresholds:
-        users_query = (
-            select(func.count(distinct(Session.user_id)))
-            .select_from(ScrollEvent)
-            .join(Session, ScrollEvent.session_id == Session.id)
-            .where(ScrollEvent.page_id == page.id)
-            .where(ScrollEvent.depth_percent >= depth)
-        )
-
-        if start_date:
-            users_query = users_query.where(ScrollEvent.timestamp >= start_date)
-        if end_date:
-            users_query = users_query.where(ScrollEvent.timestamp <= end_date)
-
-        users_result = await db.execute(users_query)
-        users_reached = users_result.scalar() or 0
-
+    for depth in SCROLL_DEPTHS:
+        users_reached = reached[depth]
         reach_rate = (users_reached / total_users) * 100 if total_users > 0 else 0.0
 
         scroll_data.append(
@@ -208,7 +656,7 @@ async def get_scroll_heatmap(
 
     # Get average page height
     avg_height_query = select(func.avg(ScrollEvent.page_height)).where(
-        ScrollEvent.page_id == page.id
+        page.condition(ScrollEvent.page_id)
     )
     if start_date:
         avg_height_query = avg_height_query.where(ScrollEvent.timestamp >= start_date)
@@ -227,6 +675,8 @@ async def get_scroll_heatmap(
             start=start_date or datetime.min,
             end=end_date or datetime.utcnow(),
         ),
+        approximate=approx,
+        error_bound=error_bound() if approx else None,
     )
 
 
@@ -236,37 +686,66 @@ async def get_scroll_heatmap(
     status_code=status.HTTP_200_OK,
 )
 async def get_mouse_move_heatmap(
-    page_url: str = Query(..., description="Page URL"),
+    request: Request,
+    page_url: Optional[str] = Query(None, description="Page URL"),
+    page_group: Optional[str] = Query(None, description="Page group name (instead of page_url)"),
     start_date: Optional[datetime] = Query(None, description="Start date (ISO8601)"),
     end_date: Optional[datetime] = Query(None, description="End date (ISO8601)"),
     grid_size: int = Query(10, description="Grid bucket size in pixels", ge=5, le=50),
-    db: AsyncSession = Depends(get_db),
-):
+    output_format: Optional[HeatmapFormat] = Query(
+        None, alias="format", description="json, columnar, binary or arrow (default: Accept)"
+    ),
+    filters: EventFilters = Depends(event_filters),
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
     """
     Get mouse movement heatmap data for a specific page (bucketed into grid)
 
-    - **page_url**: Page URL (required)
+    - **page_url** / **page_group**: Page URL, or the name of a page group to
+      aggregate over all its pages (exactly one is required)
     - **start_date**: Start date filter (optional)
     - **end_date**: End date filter (optional)
     - **grid_size**: Grid bucket size in pixels (default: 10, range: 5-50)
+    - **format**: Overrides the Accept header; columnar, binary and arrow
+      return columns x, y (bucket origins) and count
+    - **breakpoint**: Only moves whose viewport fell into this breakpoint
+    - **device_type** / **browser** / **returning**: Only moves from
+      sessions in this segment
+    - **accuracy**: Fraction of sessions to read, as on /heatmaps/clicks
     """
+    output_format = negotiate_format(request, output_format)
+    page = await get_page_scope(db, page_url, page_group)
+    params = {"format": output_format}
+    params.update(filters.cache_params())
+    key = cache_key("mouse-moves", page.id, start_date, end_date, grid_size, **params)
 
-    # Get page
-    stmt = select(Page).where(Page.url == page_url)
-    result = await db.execute(stmt)
-    page = result.scalar_one_or_none()
-
-    if not page:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={
-                "error": {
-                    "code": "NOT_FOUND",
-                    "message": f"Page not found: {page_url}",
-                }
-            },
+    def compute(session: AsyncSession) -> Awaitable[Union[BaseModel, bytes]]:
+        if output_format == "json":
+            return build_mouse_move_heatmap(session, page, key.start, key.end, grid_size, filters)
+        return build_mouse_move_heatmap_columns(
+            session, page, key.start, key.end, grid_size, output_format, filters
         )
 
+    return await cached_response(
+        request,
+        key,
+        compute,
+        db=db,
+        media_type=FORMAT_MEDIA_TYPES[output_format],
+        headers={"Vary": "Accept"},
+    )
+
+
+async def fetch_mouse_move_heatmap(
+    db: AsyncSession,
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    grid_size: int,
+    filters: EventFilters = NO_FILTERS,
+) -> list:
+    """Mouse move counts per grid bucket"""
+
     # Build query with grid bucketing
     x_bucket = (func.round(MouseMoveEvent.x / grid_size) * grid_size).label("x_bucket")
     y_bucket = (func.round(MouseMoveEvent.y / grid_size) * grid_size).label("y_bucket")
@@ -274,40 +753,913 @@ async def get_mouse_move_heatmap(
     query = select(
         x_bucket,
         y_bucket,
-        func.count(MouseMoveEvent.id).label("move_count"),
-    ).where(MouseMoveEvent.page_id == page.id)
+        filters.scaled(func.count(MouseMoveEvent.id)).label("move_count"),
+    ).where(page.condition(MouseMoveEvent.page_id))
 
     if start_date:
         query = query.where(MouseMoveEvent.timestamp >= start_date)
     if end_date:
         query = query.where(MouseMoveEvent.timestamp <= end_date)
+    query = filters.apply(query, MouseMoveEvent)
 
     query = query.group_by(x_bucket, y_bucket)
 
     # Execute query
     result = await db.execute(query)
-    rows = result.all()
+    return result.all()
+
+
+async def build_mouse_move_heatmap(
+    db: AsyncSession,
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    grid_size: int,
+    filters: EventFilters = NO_FILTERS,
+) -> bytes:
+    """Aggregate mouse move events of a page into grid buckets"""
+    rows = await fetch_mouse_move_heatmap(db, page, start_date, end_date, grid_size, filters)
+    return encode_mouse_move_heatmap(
+        page, rows, grid_size, start_date, end_date, filters.sampling_rate
+    )
+
+
+def encode_mouse_move_heatmap(
+    page: PageScope,
+    rows: list,
+    grid_size: int,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    sampling_rate: float = 1.0,
+) -> bytes:
+    """MouseMoveHeatmapResponse body built from plain dicts"""
 
     # Calculate max move count for intensity normalization
     max_move_count = max((row.move_count for row in rows), default=1)
 
-    # Build response
     heatmap_data = [
-        MouseMoveHeatmapPoint(
-            x_bucket=int(row.x_bucket),
-            y_bucket=int(row.y_bucket),
-            move_count=row.move_count,
-            intensity=round(row.move_count / max_move_count, 2),
-        )
+        {
+            "x_bucket": int(row.x_bucket),
+            "y_bucket": int(row.y_bucket),
+            "move_count": row.move_count,
+            "intensity": round(row.move_count / max_move_count, 2),
+        }
         for row in rows
     ]
 
-    return MouseMoveHeatmapResponse(
-        page=PageInfo(url=page.url, title=page.title),
-        heatmap_data=heatmap_data,
-        grid_size=grid_size,
+    return dumps(
+        {
+            "page": PageInfo(url=page.url, title=page.title),
+            "heatmap_data": heatmap_data,
+            "grid_size": grid_size,
+            "date_range": DateRange(
+                start=start_date or datetime.min,
+                end=end_date or datetime.utcnow(),
+            ),
+            "sampling_rate": sampling_rate,
+        }
+    )
+
+
+async def build_mouse_move_heatmap_columns(
+    db: AsyncSession,
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    grid_size: int,
+    output_format: str,
+    filters: EventFilters = NO_FILTERS,
+) -> bytes:
+    """Mouse move heatmap encoded column-wise, without per-point models"""
+    rows = await fetch_mouse_move_heatmap(db, page, start_date, end_date, grid_size, filters)
+    xs, ys, counts = zip(*rows) if rows else ((),) * 3
+    count = int_column(counts, "<u4")
+    meta = {
+        "page": {"url": page.url, "title": page.title},
+        "grid_size": grid_size,
+        "max_count": int(count.max()) if len(count) else 0,
+        "date_range": {
+            "start": start_date or datetime.min,
+            "end": end_date or datetime.utcnow(),
+        },
+        "sampling_rate": filters.sampling_rate,
+    }
+    return encode_columns(
+        output_format, meta, {"x": int_column(xs), "y": int_column(ys), "count": count}
+    )
+
+
+@router.post(
+    "/heatmaps/batch",
+    response_model=HeatmapBatchResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_heatmap_batch(
+    request: Request,
+    batch: HeatmapBatchRequest,
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    """
+    Get several click, scroll and mouse move heatmaps in one request
+
+    - **items**: Up to 50 of {page_url, kind, start_date, end_date,
+      grid_size, top_n}, kind being clicks, scrolls or mouse-moves; each is
+      answered exactly like the matching GET endpoint with JSON output
+      and no filters, and shares its cache entries
+
+    All pages are looked up in one query; the items then run concurrently,
+    each on its own pooled session, at most HEATMAP_BATCH_CONCURRENCY at a
+    time and only as many as the analytics gate has free slots for (at
+    least one), so a dashboard waits about as long as its slowest heatmap
+    without taking more connections than it was admitted for.
+    Results come back in request order; items for unknown pages get
+    status 404 and an error instead of data, as do items that fail (503
+    for database errors, 500 otherwise) without failing the others.
+    """
+    urls = {url for item in batch.items for url in (item.page_url, normalize_url(item.page_url))}
+    pages = {
+        page.url: PageScope.of_page(page)
+        for page in await db.scalars(select(Page).where(Page.url.in_(urls)))
+    }
+    # Release the request's connection: the items compute on their own sessions
+    await db.commit()
+
+    bypass = "no-cache" in request.headers.get("cache-control", "")
+
+    async def run(item: HeatmapBatchItem) -> bytes:
+        result = {"page_url": item.page_url, "kind": item.kind}
+        page = pages.get(normalize_url(item.page_url)) or pages.get(item.page_url)
+        if page is None:
+            return dumps(
+                {
+                    **result,
+                    "status": status.HTTP_404_NOT_FOUND,
+                    "error": {
+                        "code": "NOT_FOUND",
+                        "message": f"Page not found: {item.page_url}",
+                    },
+                }
+            )
+        try:
+            key, compute = batch_item_query(item, page)
+            body = await cached_body(key, compute, bypass=bypass)
+        except HTTPException as exc:
+            # Detail in the API's {"error": {...}} shape, as every route raises it
+            return dumps({**result, "status": exc.status_code, **exc.detail})
+        except (SQLAlchemyError, OSError, asyncio.TimeoutError):
+            # Statement timeouts and lost connections: worth retrying alone
+            logger.warning("Batch item %s %s failed", item.kind, item.page_url, exc_info=True)
+            return dumps(
+                {
+                    **result,
+                    "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "error": {
+                        "code": "SERVER_ERROR",
+                        "message": "Heatmap temporarily unavailable",
+                    },
+                }
+            )
+        except Exception:
+            logger.exception("Batch item %s %s failed", item.kind, item.page_url)
+            return dumps(
+                {
+                    **result,
+                    "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    "error": {
+                        "code": "SERVER_ERROR",
+                        "message": "Internal server error occurred",
+                    },
+                }
+            )
+        # Splice the encoded heatmap in as is rather than decoding it again
+        return dumps({**result, "status": status.HTTP_200_OK})[:-1] + b',"data":' + body + b"}"
+
+    results = [b""] * len(batch.items)
+    pending = iter(enumerate(batch.items))
+
+    async def worker() -> None:
+        for index, item in pending:  # Shared: each item is taken by one worker
+            results[index] = await run(item)
+
+    # One worker runs on the request's admission slot; the others each hold
+    # a slot that was free, so the batch never waits on the gate it is in
+    extra_slots = []
+    for _ in range(min(settings.HEATMAP_BATCH_CONCURRENCY, len(batch.items)) - 1):
+        slot = await analytics_gate.try_acquire()
+        if slot is None:
+            break
+        extra_slots.append(slot)
+    try:
+        # A task group cancels and awaits every worker before the slots go
+        # back, should one fail despite run() answering errors per item
+        async with asyncio.TaskGroup() as workers:
+            for _ in range(1 + len(extra_slots)):
+                workers.create_task(worker())
+    finally:
+        for slot in extra_slots:
+            slot.release()
+    return Response(
+        content=b'{"results":[' + b",".join(results) + b"]}",
+        media_type="application/json",
+    )
+
+
+def batch_item_query(item: HeatmapBatchItem, page: PageScope) -> Tuple[HeatmapCacheKey, Compute]:
+    """Cache key and computation of a batch item, matching its GET endpoint"""
+    if item.kind == "scrolls":
+        key = cache_key("scrolls", page.id, item.start_date, item.end_date)
+        return key, lambda session: build_scroll_heatmap(session, page, key.start, key.end)
+
+    if item.kind == "mouse-moves":
+        grid_size = item.grid_size or 10
+        key = cache_key(
+            "mouse-moves", page.id, item.start_date, item.end_date, grid_size, format="json"
+        )
+        return key, lambda session: build_mouse_move_heatmap(
+            session, page, key.start, key.end, grid_size
+        )
+
+    if item.grid_size:
+        top_n = item.top_n
+        key = cache_key(
+            "clicks",
+            page.id,
+            item.start_date,
+            item.end_date,
+            item.grid_size,
+            format="json",
+            top_n=top_n,
+        )
+        return key, lambda session: build_click_grid_heatmap(
+            session, page, key.start, key.end, item.grid_size, top_n, "json"
+        )
+
+    key = cache_key("clicks", page.id, item.start_date, item.end_date, format="json")
+    return key, lambda session: build_click_heatmap(session, page, key.start, key.end)
+
+
+@router.get(
+    "/heatmaps/{kind}/diff",
+    response_model=HeatmapDiffResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_heatmap_diff(
+    request: Request,
+    kind: Literal["clicks", "mouse-moves"],
+    page_url: Optional[str] = Query(None, description="Page URL"),
+    page_group: Optional[str] = Query(None, description="Page group name (instead of page_url)"),
+    grid_size: int = Query(20, description="Grid cell size in pixels", ge=2, le=200),
+    a_start_date: Optional[datetime] = Query(None, description="Start of side A (ISO8601)"),
+    a_end_date: Optional[datetime] = Query(None, description="End of side A (ISO8601)"),
+    b_start_date: Optional[datetime] = Query(None, description="Start of side B (ISO8601)"),
+    b_end_date: Optional[datetime] = Query(None, description="End of side B (ISO8601)"),
+    a_filters: EventFilters = Depends(prefixed_event_filters("a")),
+    b_filters: EventFilters = Depends(prefixed_event_filters("b")),
+    accuracy: float = Query(
+        1.0, gt=0.0, le=1.0, description="Fraction of sessions to read on both sides"
+    ),
+    output_format: Optional[HeatmapFormat] = Query(
+        None, alias="format", description="json, columnar, binary or arrow (default: Accept)"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    """
+    Compare two click or mouse move heatmaps of a page cell by cell
+
+    Side A and side B each select events by date range and/or segment,
+    e.g. the weeks before and after a redesign, or mobile vs desktop
+    (a_device_type=mobile&b_device_type=desktop over the same range).
+
+    - **kind**: clicks or mouse-moves
+    - **page_url** / **page_group**: Page URL, or the name of a page group to
+      aggregate over all its pages (exactly one is required)
+    - **grid_size**: Cell size in pixels (default: 20, range: 2-200)
+    - **a_start_date** / **a_end_date** / **b_start_date** / **b_end_date**:
+      Date range of each side (optional)
+    - **a_breakpoint** / **a_device_type** / **a_browser** / **a_returning**
+      (and b_*): Event filters of each side, as on /heatmaps/clicks
+    - **accuracy**: Session sample fraction, as on /heatmaps/clicks
+    - **format**: Overrides the Accept header; columnar, binary and arrow
+      return columns x, y, delta and change
+
+    Both grids come from one scan of the page's events with a filtered
+    count per side. Cells hold delta (B - A events) and change (B's share
+    of its total minus A's), so sides of different volume compare fairly;
+    only the HEATMAP_DIFF_MAX_CELLS most changed cells are returned.
+    """
+    output_format = negotiate_format(request, output_format)
+    sample_below = sample_threshold(accuracy)
+    a_filters = a_filters._replace(sample_below=sample_below)
+    b_filters = b_filters._replace(sample_below=sample_below)
+    page = await get_page_scope(db, page_url, page_group)
+
+    # Cached as live unless both sides have ended
+    ends = (a_end_date, b_end_date)
+    key = cache_key(
+        f"{kind}/diff",
+        page.id,
+        None,
+        None if None in ends else max(to_utc_naive(end) for end in ends),
+        grid_size,
+        format=output_format,
+        a_start=to_utc_naive(a_start_date),
+        a_end=to_utc_naive(a_end_date),
+        b_start=to_utc_naive(b_start_date),
+        b_end=to_utc_naive(b_end_date),
+        **{f"a_{name}": value for name, value in a_filters.cache_params().items()},
+        **{f"b_{name}": value for name, value in b_filters.cache_params().items()},
+    )
+    params = dict(key.params)
+    return await cached_response(
+        request,
+        key,
+        lambda session: build_heatmap_diff(
+            session,
+            kind,
+            page,
+            grid_size,
+            (params["a_start"], params["a_end"], a_filters),
+            (params["b_start"], params["b_end"], b_filters),
+            output_format,
+        ),
+        db=db,
+        media_type=FORMAT_MEDIA_TYPES[output_format],
+        headers={"Vary": "Accept"},
+    )
+
+
+DiffSide = Tuple[Optional[datetime], Optional[datetime], EventFilters]
+
+
+def _side_condition(model, side: DiffSide):
+    start_date, end_date, filters = side
+    conditions = filters.conditions(model)
+    if start_date:
+        conditions.append(model.timestamp >= start_date)
+    if end_date:
+        conditions.append(model.timestamp <= end_date)
+    return and_(*conditions) if conditions else true()
+
+
+async def fetch_heatmap_diff(
+    db: AsyncSession,
+    model,
+    page: PageScope,
+    grid_size: int,
+    side_a: DiffSide,
+    side_b: DiffSide,
+) -> np.ndarray:
+    """
+    Per-cell event counts of both sides from one scan
+
+    Returns:
+        int64 array of shape (cells, 4): x, y, A count, B count
+    """
+    cell_x = model.x // grid_size * grid_size
+    cell_y = model.y // grid_size * grid_size
+    in_a = _side_condition(model, side_a)
+    in_b = _side_condition(model, side_b)
+    query = (
+        select(
+            cell_x,
+            cell_y,
+            side_a[2].scaled(func.count().filter(in_a)),
+            side_b[2].scaled(func.count().filter(in_b)),
+        )
+        .where(page.condition(model.page_id), or_(in_a, in_b))
+        .group_by(cell_x, cell_y)
+    )
+    rows = (await db.execute(query)).all()
+    return np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+
+def diff_cells(counts: np.ndarray, max_cells: int) -> Tuple[Dict[str, np.ndarray], int, int, bool]:
+    """
+    Deltas and share changes of all cells, most changed first
+
+    Returns:
+        (columns x, y, delta, change; total A; total B; truncated)
+    """
+    xs, ys, a, b = counts.T
+    total_a, total_b = int(a.sum()), int(b.sum())
+    share_a = a / total_a if total_a else np.zeros(len(a))
+    share_b = b / total_b if total_b else np.zeros(len(b))
+    change = share_b - share_a
+
+    order = np.argsort(-np.abs(change), kind="stable")[:max_cells]
+    columns = {
+        "x": xs[order].astype("<i4"),
+        "y": ys[order].astype("<i4"),
+        "delta": (b - a)[order].astype("<i4"),
+        "change": np.round(change[order], 6),
+    }
+    return columns, total_a, total_b, len(change) > max_cells
+
+
+async def build_heatmap_diff(
+    db: AsyncSession,
+    kind: str,
+    page: PageScope,
+    grid_size: int,
+    side_a: DiffSide,
+    side_b: DiffSide,
+    output_format: str,
+) -> bytes:
+    """Difference heatmap in any output format"""
+    counts = await fetch_heatmap_diff(db, POINT_SOURCES[kind], page, grid_size, side_a, side_b)
+    columns, total_a, total_b, truncated = diff_cells(counts, settings.HEATMAP_DIFF_MAX_CELLS)
+    meta = {
+        "page": PageInfo(url=page.url, title=page.title),
+        "kind": kind,
+        "grid_size": grid_size,
+        "a": {
+            "date_range": DateRange(
+                start=side_a[0] or datetime.min, end=side_a[1] or datetime.utcnow()
+            ),
+            "total": total_a,
+        },
+        "b": {
+            "date_range": DateRange(
+                start=side_b[0] or datetime.min, end=side_b[1] or datetime.utcnow()
+            ),
+            "total": total_b,
+        },
+        "max_abs_change": float(np.abs(columns["change"]).max()) if len(counts) else 0.0,
+        "truncated": truncated,
+        "sampling_rate": side_a[2].sampling_rate,
+    }
+
+    if output_format == "json":
+        cells = [
+            {"x": x, "y": y, "delta": delta, "change": change}
+            for x, y, delta, change in zip(
+                columns["x"].tolist(),
+                columns["y"].tolist(),
+                columns["delta"].tolist(),
+                columns["change"].tolist(),
+            )
+        ]
+        return dumps({**meta, "cells": cells})
+
+    columns["change"] = columns["change"].astype("<f4")
+    return encode_columns(output_format, meta, columns)
+
+
+FRAME_BUCKETS = {
+    "5m": timedelta(minutes=5),
+    "15m": timedelta(minutes=15),
+    "1h": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "1d": timedelta(days=1),
+}
+
+
+@router.get(
+    "/heatmaps/{kind}/frames",
+    response_model=HeatmapFramesResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_heatmap_frames(
+    request: Request,
+    kind: Literal["clicks", "mouse-moves"],
+    page_url: Optional[str] = Query(None, description="Page URL"),
+    page_group: Optional[str] = Query(None, description="Page group name (instead of page_url)"),
+    start_date: datetime = Query(..., description="Start of the first frame (ISO8601)"),
+    end_date: Optional[datetime] = Query(None, description="End date (ISO8601, default: now)"),
+    bucket: Literal["5m", "15m", "1h", "6h", "1d"] = Query("1h", description="Frame length"),
+    grid_size: int = Query(20, description="Grid cell size in pixels", ge=2, le=200),
+    filters: EventFilters = Depends(event_filters),
+    output_format: Optional[HeatmapFormat] = Query(
+        None, alias="format", description="json, columnar, binary or arrow (default: Accept)"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    """
+    Get click or mouse move heatmaps of consecutive time buckets, for playback
+
+    - **kind**: clicks or mouse-moves
+    - **page_url** / **page_group**: Page URL, or the name of a page group to
+      aggregate over all its pages (exactly one is required)
+    - **start_date**: Start of the first frame (required)
+    - **end_date**: End of the last frame (default: now, rounded up to the
+      end of its bucket)
+    - **bucket**: Frame length: 5m, 15m, 1h (default), 6h or 1d; at most
+      HEATMAP_MAX_FRAMES frames per request
+    - **grid_size**: Cell size in pixels (default: 20, range: 2-200)
+    - **breakpoint** / **device_type** / **browser** / **returning** /
+      **accuracy**: Event filters and sampling, as on /heatmaps/clicks
+    - **format**: Overrides the Accept header; columnar, binary and arrow
+      return columns frame (index into frame_starts), x, y and count
+
+    All frames come from one query grouped by bucket and cell. Frames are
+    sparse: JSON frames list [x, y, count] for their non-empty cells only.
+    """
+    output_format = negotiate_format(request, output_format)
+    start, end, frame_count = frame_range(start_date, end_date, bucket)
+    page = await get_page_scope(db, page_url, page_group)
+    key = cache_key(
+        f"{kind}/frames",
+        page.id,
+        start,
+        end,
+        grid_size,
+        format=output_format,
+        bucket=bucket,
+        **filters.cache_params(),
+    )
+    return await cached_response(
+        request,
+        key,
+        lambda session: build_heatmap_frames(
+            session,
+            kind,
+            page,
+            start,
+            end,
+            bucket,
+            frame_count,
+            grid_size,
+            filters,
+            output_format,
+        ),
+        db=db,
+        media_type=FORMAT_MEDIA_TYPES[output_format],
+        headers={"Vary": "Accept"},
+    )
+
+
+def frame_range(
+    start_date: datetime, end_date: Optional[datetime], bucket: str
+) -> Tuple[datetime, datetime, int]:
+    """
+    (start, end, frame count) of a frames request; 422 unless the range
+    spans 1 to HEATMAP_MAX_FRAMES buckets (the last one possibly partial)
+    """
+    start = to_utc_naive(start_date)
+    end = to_utc_naive(end_date) if end_date else datetime.utcnow()
+    length = FRAME_BUCKETS[bucket]
+    frame_count = -(-(end - start) // length)
+    if end_date is None:
+        # Open ranges end with the bucket in progress: one key per bucket
+        end = start + length * frame_count
+    if not 0 < frame_count <= settings.HEATMAP_MAX_FRAMES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": f"Range must span 1 to {settings.HEATMAP_MAX_FRAMES} "
+                    f"{bucket} buckets, got {frame_count}",
+                }
+            },
+        )
+    return start, end, frame_count
+
+
+async def fetch_heatmap_frames(
+    db: AsyncSession,
+    model,
+    page: PageScope,
+    start: datetime,
+    end: datetime,
+    length: timedelta,
+    grid_size: int,
+    filters: EventFilters = NO_FILTERS,
+) -> np.ndarray:
+    """
+    Per-bucket, per-cell event counts
+
+    Returns:
+        int64 array of shape (cells, 4): frame index, x, y, count, ordered
+        by frame
+    """
+    frame = cast(
+        func.floor(func.extract("epoch", model.timestamp - start) / length.total_seconds()),
+        Integer,
+    )
+    cell_x = model.x // grid_size * grid_size
+    cell_y = model.y // grid_size * grid_size
+    query = (
+        select(frame, cell_x, cell_y, filters.scaled(func.count()))
+        .where(
+            page.condition(model.page_id),
+            model.timestamp >= start,
+            model.timestamp < end,
+        )
+        .group_by(frame, cell_x, cell_y)
+        .order_by(frame)
+    )
+    query = filters.apply(query, model)
+    rows = (await db.execute(query)).all()
+    return np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+
+async def build_heatmap_frames(
+    db: AsyncSession,
+    kind: str,
+    page: PageScope,
+    start: datetime,
+    end: datetime,
+    bucket: str,
+    frame_count: int,
+    grid_size: int,
+    filters: EventFilters,
+    output_format: str,
+) -> bytes:
+    """Heatmap frames in any output format"""
+    length = FRAME_BUCKETS[bucket]
+    cells = await fetch_heatmap_frames(
+        db, POINT_SOURCES[kind], page, start, end, length, grid_size, filters
+    )
+    frames, xs, ys, counts = cells.T
+    starts = [start + length * i for i in range(frame_count)]
+    meta = {
+        "page": PageInfo(url=page.url, title=page.title),
+        "kind": kind,
+        "grid_size": grid_size,
+        "bucket": bucket,
+        "bucket_seconds": int(length.total_seconds()),
+        "date_range": DateRange(start=start, end=end),
+        "max_count": int(counts.max()) if len(counts) else 0,
+        "sampling_rate": filters.sampling_rate,
+    }
+
+    if output_format == "json":
+        totals = np.bincount(frames, weights=counts, minlength=frame_count).astype(np.int64)
+        bounds = np.searchsorted(frames, np.arange(frame_count + 1))
+        triples = np.stack([xs, ys, counts], axis=1).tolist()
+        meta["frames"] = [
+            {
+                "start": frame_start,
+                "total": total,
+                "cells": triples[bounds[i] : bounds[i + 1]],
+            }
+            for i, (frame_start, total) in enumerate(zip(starts, totals.tolist()))
+        ]
+        return dumps(meta)
+
+    meta["frame_starts"] = starts
+    columns = {
+        "frame": frames.astype("<i4"),
+        "x": xs.astype("<i4"),
+        "y": ys.astype("<i4"),
+        "count": counts.astype("<i4"),
+    }
+    return encode_columns(output_format, meta, columns)
+
+
+@router.get(
+    "/heatmaps/{kind}/render",
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {
+            "content": {"image/png": {}, "application/octet-stream": {}},
+            "description": "PNG overlay or raw row-major density grid",
+        }
+    },
+)
+async def render_heatmap(
+    request: Request,
+    kind: Literal["clicks", "mouse-moves"],
+    page_url: Optional[str] = Query(None, description="Page URL"),
+    page_group: Optional[str] = Query(None, description="Page group name (instead of page_url)"),
+    page_width: int = Query(..., description="Page width in CSS pixels", ge=1, le=20000),
+    page_height: int = Query(..., description="Page height in CSS pixels", ge=1, le=200000),
+    width: int = Query(512, description="Output width in pixels", ge=16, le=4096),
+    height: Optional[int] = Query(
+        None, description="Output height in pixels (default: page aspect ratio)", ge=16, le=16384
+    ),
+    blur: float = Query(4.0, description="Gaussian sigma in output pixels", ge=0.0, le=64.0),
+    output_format: Literal["png", "float32", "uint8"] = Query(
+        "png", alias="format", description="png, float32 or uint8"
+    ),
+    colormap: Literal["heat", "gray"] = Query("heat", description="PNG colormap"),
+    start_date: Optional[datetime] = Query(None, description="Start date (ISO8601)"),
+    end_date: Optional[datetime] = Query(None, description="End date (ISO8601)"),
+    filters: EventFilters = Depends(event_filters),
+    relative_x: bool = Query(
+        False, description="Place x by its fraction of the viewport width instead of in pixels"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    """
+    Render a click or mouse move heatmap server-side
+
+    - **kind**: clicks or mouse-moves
+    - **page_url** / **page_group**: Page URL, or the name of a page group to
+      aggregate over all its pages (exactly one is required)
+    - **page_width** / **page_height**: Page size the events are mapped from (required)
+    - **width** / **height**: Output resolution
+    - **blur**: Gaussian kernel sigma in output pixels (0 disables smoothing)
+    - **format**: png (RGBA overlay), float32 (events per output pixel) or
+      uint8 (intensity scaled to the densest pixel); raw grids are
+      row-major, little-endian, X-Grid-Width x X-Grid-Height
+    - **colormap**: heat (default, same palette as the overlay renderer) or
+      gray; png only
+    - **breakpoint** / **device_type** / **browser** / **returning** /
+      **accuracy**: Event filters and sampling, as on the clicks and
+      mouse-moves endpoints (X-Sampling-Rate reports the fraction read)
+    - **relative_x**: Map x from the event's position relative to its
+      viewport width onto page_width, so events recorded at different
+      widths line up on a responsive layout
+    """
+    if height is None:
+        height = max(1, round(width * page_height / page_width))
+    if width * height > settings.RENDER_MAX_PIXELS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": f"Output of {width}x{height} exceeds "
+                    f"{settings.RENDER_MAX_PIXELS} pixels",
+                }
+            },
+        )
+
+    page = await get_page_scope(db, page_url, page_group)
+    params = filters.cache_params()
+    if relative_x:
+        params["relative_x"] = True
+    if output_format == "png":
+        # Raw grids do not depend on the colormap: one entry for all of them
+        params["colormap"] = colormap
+    key = cache_key(
+        f"{kind}/render",
+        page.id,
+        start_date,
+        end_date,
+        page_width=page_width,
+        page_height=page_height,
+        width=width,
+        height=height,
+        blur=blur,
+        format=output_format,
+        **params,
+    )
+    return await cached_response(
+        request,
+        key,
+        lambda session: build_heatmap_raster(
+            session,
+            POINT_SOURCES[kind],
+            page,
+            key.start,
+            key.end,
+            (page_width, page_height),
+            (height, width),
+            blur,
+            output_format,
+            colormap,
+            filters,
+            relative_x,
+        ),
+        db=db,
+        media_type=MEDIA_TYPES[output_format],
+        headers={
+            "X-Grid-Width": str(width),
+            "X-Grid-Height": str(height),
+            "X-Grid-Format": output_format,
+            "X-Sampling-Rate": str(filters.sampling_rate),
+        },
+    )
+
+
+async def build_heatmap_raster(
+    db: AsyncSession,
+    model,
+    page: PageScope,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    extent: Tuple[int, int],
+    shape: Tuple[int, int],
+    blur: float,
+    output_format: str,
+    colormap: str,
+    filters: EventFilters = NO_FILTERS,
+    relative_x: bool = False,
+) -> bytes:
+    """
+    Fetch point counts and render them in the process pool
+
+    Points are pre-aggregated in SQL into cells no larger than one output
+    pixel, so the transfer is bounded by the output size rather than the
+    event count. With relative_x, x is taken as x_ratio * page width
+    (events recorded before x_ratio existed are skipped).
+    """
+    cell = max(1, min(extent[0] // shape[1], extent[1] // shape[0]))
+    x = cast(func.floor(model.x_ratio * extent[0]), Integer) if relative_x else model.x
+    cell_x = (x // cell).label("cell_x")
+    cell_y = (model.y // cell).label("cell_y")
+
+    query = (
+        select(cell_x, cell_y, filters.scaled(func.count()).label("event_count"))
+        .where(page.condition(model.page_id))
+        .where(x < extent[0], model.y < extent[1])
+    )
+    if start_date:
+        query = query.where(model.timestamp >= start_date)
+    if end_date:
+        query = query.where(model.timestamp <= end_date)
+    query = filters.apply(query, model)
+    query = query.group_by(cell_x, cell_y)
+
+    result = await db.execute(query)
+    rows = result.all()
+
+    points = np.array(rows, dtype=np.float64).reshape(-1, 3)
+    xs = (points[:, 0] + 0.5) * cell
+    ys = (points[:, 1] + 0.5) * cell
+    return await render_in_pool(xs, ys, points[:, 2], extent, shape, blur, output_format, colormap)
+
+
+@router.get(
+    "/heatmaps/{kind}/tiles/{z}/{x}/{y}",
+    response_model=HeatmapTileResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_heatmap_tile(
+    request: Request,
+    kind: Literal["clicks", "mouse-moves"],
+    z: int = Path(..., description="Zoom level (0 = coarsest)", ge=0, le=settings.TILE_MAX_ZOOM),
+    x: int = Path(..., description="Tile column", ge=0, le=4095),
+    y: int = Path(..., description="Tile row", ge=0, le=65535),
+    page_url: Optional[str] = Query(None, description="Page URL"),
+    page_group: Optional[str] = Query(None, description="Page group name (instead of page_url)"),
+    start_date: Optional[date] = Query(None, description="First day (default: end_date - 29 days)"),
+    end_date: Optional[date] = Query(None, description="Last day, inclusive (default: today, UTC)"),
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    """
+    Get one tile of a zoomable click or mouse move heatmap
+
+    - **kind**: clicks or mouse-moves
+    - **z** / **x** / **y**: Tile address; at zoom z a cell covers
+      TILE_MIN_CELL_PX * 2^(TILE_MAX_ZOOM - z) page pixels and a tile
+      TILE_SIZE x TILE_SIZE cells
+    - **page_url** / **page_group**: Page URL, or the name of a page group to
+      aggregate over all its pages (exactly one is required)
+    - **start_date** / **end_date**: Whole UTC days
+
+    Tiles whose range ended before the settle window are final and served
+    with an immutable Cache-Control.
+    """
+    start_day, end_day = default_day_range(start_date, end_date)
+    if start_day > end_day:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": "start_date must not be after end_date",
+                }
+            },
+        )
+
+    page = await get_page_scope(db, page_url, page_group)
+    # Whole days: the range ends at midnight after end_day
+    key = cache_key(
+        f"{kind}/tiles",
+        page.id,
+        datetime.combine(start_day, datetime.min.time()),
+        datetime.combine(end_day + timedelta(days=1), datetime.min.time()),
+        z=z,
+        x=x,
+        y=y,
+    )
+    return await cached_response(
+        request,
+        key,
+        lambda session: build_heatmap_tile(session, kind, page, z, x, y, start_day, end_day),
+        db=db,
+    )
+
+
+async def build_heatmap_tile(
+    db: AsyncSession,
+    kind: str,
+    page: PageScope,
+    z: int,
+    x: int,
+    y: int,
+    start_day: date,
+    end_day: date,
+) -> HeatmapTileResponse:
+    counts = await fetch_tile_cells(db, kind, page.page_ids, z, x, y, start_day, end_day)
+    size = cell_size(z)
+    return HeatmapTileResponse(
+        kind=kind,
+        z=z,
+        x=x,
+        y=y,
+        tile_size=settings.TILE_SIZE,
+        cell_size=size,
+        origin_x=x * settings.TILE_SIZE * size,
+        origin_y=y * settings.TILE_SIZE * size,
+        max_count=max(counts.values(), default=0),
+        cells=[[col, row, count] for (col, row), count in sorted(counts.items())],
         date_range=DateRange(
-            start=start_date or datetime.min,
-            end=end_date or datetime.utcnow(),
+            start=datetime.combine(start_day, datetime.min.time()),
+            end=datetime.combine(end_day + timedelta(days=1), datetime.min.time()),
         ),
     )
@@ -0,0 +1,118 @@
+"""
+Page group management API endpoints
+"""
+
+from typing import List
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_admin_db
+from app.models.page_group import PageGroup, PageGroupMember
+from app.schemas.page_group import PageGroupCreate, PageGroupResponse
+from app.services.page_groups import add_group_members, normalize_pattern, pattern_regex
+
+router = APIRouter()
+
+
+@router.post(
+    "/page-groups",
+    response_model=PageGroupResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_page_group(
+    group_data: PageGroupCreate,
+    db: AsyncSession = Depends(get_admin_db),
+):
+    """
+    Create a page group from a URL pattern
+
+    - **name**: Group name, passed as page_group to the heatmap endpoints (required)
+    - **pattern**: Page URL where * matches within one path segment and **
+      matches anything, e.g. https://shop.example.com/product/* (required);
+      query strings are ignored unless the pattern has one
+
+    All existing pages matching the pattern join the group, and pages
+    created later join it as they appear.
+    """
+    existing = await db.scalar(select(PageGroup.id).where(PageGroup.name == group_data.name))
+    if existing is not None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": f"Page group {group_data.name} already exists",
+                }
+            },
+        )
+
+    pattern = normalize_pattern(group_data.pattern)
+    group = PageGroup(name=group_data.name, pattern=pattern, regex=pattern_regex(pattern))
+    db.add(group)
+    await db.flush()  # Get group.id
+    page_count = await add_group_members(db, group)
+    await db.commit()
+
+    return PageGroupResponse(
+        id=group.id,
+        name=group.name,
+        pattern=group.pattern,
+        page_count=page_count,
+        created_at=group.created_at,
+    )
+
+
+@router.get("/page-groups", response_model=List[PageGroupResponse], status_code=status.HTTP_200_OK)
+async def get_page_groups(
+    db: AsyncSession = Depends(get_admin_db),
+):
+    """
+    Get list of page groups with their page counts
+    """
+    result = await db.execute(
+        select(PageGroup, func.count(PageGroupMember.page_id))
+        .outerjoin(PageGroupMember, PageGroupMember.group_id == PageGroup.id)
+        .group_by(PageGroup.id)
+        .order_by(PageGroup.name)
+    )
+    return [
+        PageGroupResponse(
+            id=group.id,
+            name=group.name,
+            pattern=group.pattern,
+            page_count=page_count,
+            created_at=group.created_at,
+        )
+        for group, page_count in result.all()
+    ]
+
+
+@router.delete("/page-groups/{group_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_page_group(
+    group_id: UUID,
+    db: AsyncSession = Depends(get_admin_db),
+):
+    """
+    Delete a page group (its pages and their events are kept)
+
+    - **group_id**: Page group UUID (required)
+    """
+    await db.execute(delete(PageGroupMember).where(PageGroupMember.group_id == group_id))
+    result = await db.execute(delete(PageGroup).where(PageGroup.id == group_id))
+
+    if result.rowcount == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": {
+                    "code": "NOT_FOUND",
+                    "message": f"Page group {group_id} not found",
+                }
+            },
+        )
+
+    await db.commit()
+
+    return None
@@ -0,0 +1,165 @@
+"""
+Page listing API endpoints
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Literal, Optional, Tuple
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import get_read_db
+from app.models.page import Page
+from app.models.page_stats import PageStats
+from app.schemas.page import PageListResponse, PageStatsListResponse
+from app.services.fast_json import fast_response
+
+router = APIRouter()
+
+PageSort = Literal["last_activity", "sessions", "clicks"]
+
+# Sort orders, each served by a (column, page_id) index on page_stats
+SORT_COLUMNS = {
+    "last_activity": PageStats.last_event_at,
+    "sessions": PageStats.sessions,
+    "clicks": PageStats.clicks,
+}
+
+
+def encode_cursor(sort: str, value: Any, page_id: UUID) -> str:
+    """Opaque cursor of the last row of a page"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, str(page_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(sort: str, cursor: str) -> Tuple[Any, UUID]:
+    """(sort value, page_id) of a cursor; 422 for malformed or foreign cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, page_id = json.loads(raw)
+        if cursor_sort != sort:
+            raise ValueError("cursor of another sort order")
+        if sort == "last_activity":
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, int):
+            raise ValueError("non-integer counter")
+        return value, UUID(page_id)
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": "Invalid cursor",
+                }
+            },
+        )
+
+
+async def list_page_stats(
+    db: AsyncSession, sort: str, limit: int, cursor: Optional[str]
+) -> Tuple[List[Tuple[Page, PageStats]], Optional[int], Optional[str]]:
+    """
+    One keyset page of pages with their counters, most active first
+
+    Returns:
+        ((page, stats) rows, total pages (first page only, else None),
+        cursor of the next page or None)
+    """
+    column = SORT_COLUMNS[sort]
+    query = (
+        select(Page, PageStats)
+        .join(PageStats, PageStats.page_id == Page.id)
+        .order_by(column.desc(), PageStats.page_id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        value, page_id = decode_cursor(sort, cursor)
+        query = query.where(tuple_(column, PageStats.page_id) < tuple_(value, page_id))
+
+    rows = (await db.execute(query)).all()
+    # Counting scans all of page_stats, so only the first page pays for it
+    total = None if cursor else await db.scalar(select(func.count()).select_from(PageStats))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        _, last = rows[-1]
+        next_cursor = encode_cursor(sort, getattr(last, column.key), last.page_id)
+    return rows, total, next_cursor
+
+
+@router.get("/pages", response_model=PageListResponse, status_code=status.HTTP_200_OK)
+async def get_pages(
+    sort: PageSort = Query("last_activity", description="last_activity, sessions or clicks"),
+    limit: int = Query(50, ge=1, le=settings.PAGE_LIST_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Get tracked pages, most active first
+
+    - **sort**: Order by latest activity (default), session count or click count
+    - **limit**: Pages per response (default: 50)
+    - **cursor**: Continue after the previous response (its next_cursor)
+
+    Keyset paginated over the page_stats counters, so any page of the list
+    costs one index range scan however many pages exist; total is only
+    counted for the first page (null when a cursor is given).
+    """
+    rows, total, next_cursor = await list_page_stats(db, sort, limit, cursor)
+    pages = [
+        {
+            "id": page.id,
+            "url": page.url,
+            "title": page.title,
+            "created_at": page.created_at,
+            "updated_at": stats.last_event_at,
+        }
+        for page, stats in rows
+    ]
+    return fast_response({"pages": pages, "total": total, "next_cursor": next_cursor})
+
+
+@router.get("/pages/stats", response_model=PageStatsListResponse, status_code=status.HTTP_200_OK)
+async def get_page_stats(
+    sort: PageSort = Query("last_activity", description="last_activity, sessions or clicks"),
+    limit: int = Query(50, ge=1, le=settings.PAGE_LIST_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Get activity counters of tracked pages, most active first
+
+    - **sort**: Order by latest activity (default), session count or click count
+    - **limit**: Pages per response (default: 50)
+    - **cursor**: Continue after the previous response (its next_cursor)
+
+    Counters are maintained by ingest (app.services.page_stats) and trail
+    it by up to PAGE_STATS_FLUSH_INTERVAL_SECONDS. total is only counted
+    for the first page (null when a cursor is given).
+    """
+    rows, total, next_cursor = await list_page_stats(db, sort, limit, cursor)
+    stats = [
+        {
+            "page_id": page.id,
+            "page_url": page.url,
+            "page_title": page.title,
+            "total_clicks": counters.clicks,
+            "total_scrolls": counters.scrolls,
+            "total_mouse_moves": counters.mouse_moves,
+            "unique_sessions": counters.sessions,
+            "scroll_sessions": counters.scroll_sessions,
+            "last_activity": counters.last_event_at,
+        }
+        for page, counters in rows
+    ]
+    return fast_response({"stats": stats, "total": total, "next_cursor": next_cursor})
@@ -0,0 +1,51 @@
+"""
+Request profile retrieval endpoints (admin only)
+"""
+
+import asyncio
+import re
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from app.services.sampling_profiler import read_profile
+
+router = APIRouter()
+
+PROFILE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(request: Request, profile_id: str):
+    """
+    Download a stored request profile in folded-stack format
+
+    Feed the result to flamegraph.pl, speedscope or inferno.
+
+    - **profile_id**: Value of the X-Profile-Id response header (required)
+    """
+    if not getattr(request.state, "is_admin", False):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                "error": {
+                    "code": "FORBIDDEN",
+                    "message": "Admin API key required",
+                }
+            },
+        )
+
+    folded = None
+    if PROFILE_ID_PATTERN.match(profile_id):
+        folded = await asyncio.to_thread(read_profile, profile_id)
+    if folded is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": {
+                    "code": "NOT_FOUND",
+                    "message": f"Profile {profile_id} not found",
+                }
+            },
+        )
+
+    return PlainTextResponse(folded)
@@ -12,26 +12,38 @@ from app.database import get_db
 from app.models.page import Page
 from app.models.session import Session
 from app.schemas.session import SessionStart, SessionEnd, SessionResponse
+from app.services.page_groups import add_page_to_groups
+from app.services.page_stats import create_page_stats, record_page_activity
+from app.services.urls import normalize_url
 
 router = APIRouter()
 
 
 async def get_or_create_page(db: AsyncSession, url: str, title: str | None) -> Page:
-    """Get existing page or create new one"""
+    """Get existing page or create new one (under the normalized URL)"""
+    normalized = normalize_url(url)
+
     # Parse domain from URL
-    parsed_url = urlparse(url)
+    parsed_url = urlparse(normalized)
     domain = parsed_url.netloc
 
-    # Check if page exists
-    stmt = select(Page).where(Page.url == url)
+    # Check if page exists (pages created before normalization match as sent)
+    stmt = (
+        select(Page)
+        .where(Page.url.in_({url, normalized}))
+        .order_by(Page.url != normalized)
+        .limit(1)
+    )
     result = await db.execute(stmt)
     page = result.scalar_one_or_none()
 
     if not page:
         # Create new page
-        page = Page(url=url, title=title, domain=domain)
+        page = Page(url=normalized, title=title, domain=domain)
         db.add(page)
         await db.flush()  # Flush to get page.id
+        await add_page_to_groups(db, page)
+        await create_page_stats(db, page)
 
     return page
 
@@ -66,6 +78,7 @@ async def start_session(
     db.add(session)
     await db.commit()
     await db.refresh(session)
+    record_page_activity(page.id, session.session_start, sessions=1)
 
     return session
 
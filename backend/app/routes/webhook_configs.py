@@ -8,7 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_admin_db
 from app.models.webhook_config import WebhookConfig
 from app.schemas.webhook_config import (
     WebhookConfigCreate,
@@ -32,7 +32,7 @@ router = APIRouter()
 async def create_webhook_config(
     request: Request,
     webhook_data: WebhookConfigCreate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Create a new webhook configuration for the authenticated user
@@ -68,7 +68,7 @@ async def list_webhook_configs(
     request: Request,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     List all webhook configurations for the authenticated user
@@ -101,7 +101,7 @@ async def list_webhook_configs(
 async def get_webhook_config(
     request: Request,
     webhook_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Get details of a specific webhook configuration
@@ -137,7 +137,7 @@ async def update_webhook_config(
     request: Request,
     webhook_id: UUID,
     webhook_data: WebhookConfigUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Update a webhook configuration
@@ -195,7 +195,7 @@ async def update_webhook_config(
 async def delete_webhook_config(
     request: Request,
     webhook_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Delete a webhook configuration
@@ -233,7 +233,7 @@ async def delete_webhook_config(
 async def regenerate_webhook_secret(
     request: Request,
     webhook_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Regenerate webhook secret
@@ -277,7 +277,7 @@ async def test_webhook(
     request: Request,
     webhook_id: UUID,
     test_data: WebhookTestRequest,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Test webhook delivery
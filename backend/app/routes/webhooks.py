@@ -2,14 +2,16 @@
 Webhook integration API endpoints
 """
 
+import time
 import httpx
 from fastapi import APIRouter, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_admin_db
 from app.models.webhook_log import WebhookLog
 from app.schemas.webhook import WebhookPayload, WebhookResponse
 from app.config import settings
+from app.services.metrics import record_webhook_delivery
 
 router = APIRouter()
 
@@ -21,7 +23,7 @@ router = APIRouter()
 )
 async def receive_webhook(
     payload: WebhookPayload,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Receive webhook from Connected One
@@ -56,7 +58,7 @@ async def receive_webhook(
 )
 async def send_webhook(
     payload: WebhookPayload,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_admin_db),
 ):
     """
     Send webhook to Connected One (internal API)
@@ -82,6 +84,8 @@ async def send_webhook(
     # Send webhook
     response_status = None
     response_body = None
+    outcome = "success"
+    start = time.perf_counter()
 
     try:
         async with httpx.AsyncClient(timeout=10.0) as client:
@@ -101,6 +105,9 @@ async def send_webhook(
     except httpx.HTTPError as e:
         response_status = getattr(e.response, "status_code", None) if hasattr(e, "response") else 500
         response_body = str(e)
+        outcome = "http_error" if isinstance(e, httpx.HTTPStatusError) else "error"
+
+    record_webhook_delivery("connected_one", outcome, time.perf_counter() - start)
 
     # Log webhook delivery
     log = WebhookLog(
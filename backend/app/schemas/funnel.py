@@ -94,3 +94,5 @@ class FunnelStatsResponse(BaseModel):
     stats: List[FunnelStepStats]
     overall_conversion_rate: float = Field(..., ge=0.0, le=100.0)
     date_range: DateRange
+    approximate: bool = False  # User counts estimated from HyperLogLog sketches
+    error_bound: Optional[float] = None  # Relative standard error of approximate counts
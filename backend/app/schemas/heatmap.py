@@ -3,8 +3,10 @@ Heatmap schemas
 """
 
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
+
+from app.config import settings
 
 
 class PageInfo(BaseModel):
@@ -24,21 +26,35 @@ class DateRange(BaseModel):
 
 
 class ClickHeatmapPoint(BaseModel):
-    """Click heatmap data point"""
+    """Click heatmap data point (a grid cell's top-left corner when binned)"""
 
     x: int
     y: int
     click_count: int
-    element_tag: str
+    element_tag: Optional[str] = None  # Not set for grid cells
     element_text: Optional[str] = None
 
 
+class ElementClickStats(BaseModel):
+    """Clicks on one element (tag, id, class)"""
+
+    element_tag: Optional[str] = None
+    element_id: Optional[str] = None
+    element_class: Optional[str] = None
+    click_count: int
+    share: float = Field(..., ge=0.0, le=1.0)
+
+
 class ClickHeatmapResponse(BaseModel):
     """Click heatmap response"""
 
     page: PageInfo
     heatmap_data: List[ClickHeatmapPoint]
     date_range: DateRange
+    grid_size: Optional[int] = None
+    top_elements: Optional[List[ElementClickStats]] = None  # Grid mode only
+    truncated: bool = False  # heatmap_data was capped to the densest cells
+    sampling_rate: float = 1.0  # Fraction of sessions read; counts are scaled by its inverse
 
 
 class ScrollDepthData(BaseModel):
@@ -55,6 +71,8 @@ class ScrollHeatmapResponse(BaseModel):
     page: PageInfo
     scroll_data: List[ScrollDepthData]
     date_range: DateRange
+    approximate: bool = False  # users_reached estimated from HyperLogLog sketches
+    error_bound: Optional[float] = None  # Relative standard error of approximate counts
 
 
 class MouseMoveHeatmapPoint(BaseModel):
@@ -73,3 +91,120 @@ class MouseMoveHeatmapResponse(BaseModel):
     heatmap_data: List[MouseMoveHeatmapPoint]
     grid_size: int = 10
     date_range: DateRange
+    sampling_rate: float = 1.0  # Fraction of sessions read; counts are scaled by its inverse
+
+
+class HeatmapTileResponse(BaseModel):
+    """One tile of the zoomable heatmap pyramid"""
+
+    kind: str
+    z: int
+    x: int
+    y: int
+    tile_size: int  # Cells per tile side
+    cell_size: int  # Page pixels per cell side
+    origin_x: int  # Page pixel coordinates of the tile's top-left corner
+    origin_y: int
+    max_count: int
+    cells: List[List[int]]  # [column, row, count] relative to the origin
+    date_range: DateRange
+
+
+class HeatmapDiffSide(BaseModel):
+    """One side (A or B) of a heatmap comparison"""
+
+    date_range: DateRange
+    total: int  # Events on this side (scaled when sampled)
+
+
+class HeatmapDiffCell(BaseModel):
+    """Change of one grid cell from A to B (x/y are its top-left corner)"""
+
+    x: int
+    y: int
+    delta: int  # B count - A count
+    change: float  # B share - A share, each as a fraction of its side's total
+
+
+class HeatmapDiffResponse(BaseModel):
+    """Per-cell difference between two click or mouse move heatmaps"""
+
+    page: PageInfo
+    kind: str
+    grid_size: int
+    a: HeatmapDiffSide
+    b: HeatmapDiffSide
+    max_abs_change: float  # Largest |change| over all cells, for color scaling
+    cells: List[HeatmapDiffCell]  # By descending |change|
+    truncated: bool = False  # cells was capped to HEATMAP_DIFF_MAX_CELLS
+    sampling_rate: float = 1.0
+
+
+class HeatmapFrame(BaseModel):
+    """Events of one time bucket"""
+
+    start: datetime
+    total: int
+    cells: List[List[int]]  # [x, y, count], x/y being the cell's top-left corner
+
+
+class HeatmapFramesResponse(BaseModel):
+    """Click or mouse move heatmaps of consecutive time buckets"""
+
+    page: PageInfo
+    kind: str
+    grid_size: int
+    bucket: str
+    bucket_seconds: int
+    date_range: DateRange
+    max_count: int  # Largest cell count over all frames, for a stable color scale
+    frames: List[HeatmapFrame]  # One per bucket, empty buckets included
+    sampling_rate: float = 1.0
+
+
+class HeatmapBatchItem(BaseModel):
+    """One heatmap of a batch, as the query parameters of its GET endpoint"""
+
+    page_url: str = Field(..., min_length=1)
+    kind: Literal["clicks", "scrolls", "mouse-moves"]
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    # clicks: grid-binned when set (2-200); mouse-moves: 5-50, default 10
+    grid_size: Optional[int] = None
+    # Grid-binned clicks only: elements listed per cell
+    top_n: int = Field(20, ge=0, le=settings.CLICK_TOP_ELEMENTS_MAX)
+
+    @field_validator("grid_size")
+    @classmethod
+    def validate_grid_size(cls, v, info: ValidationInfo):
+        if v is None:
+            return v
+        kind = info.data.get("kind")
+        if kind == "scrolls":
+            raise ValueError("grid_size does not apply to scroll heatmaps")
+        low, high = (5, 50) if kind == "mouse-moves" else (2, 200)
+        if not low <= v <= high:
+            raise ValueError(f"grid_size must be between {low} and {high}")
+        return v
+
+
+class HeatmapBatchRequest(BaseModel):
+    """Several heatmaps fetched in one request"""
+
+    items: List[HeatmapBatchItem] = Field(..., min_length=1, max_length=50)
+
+
+class HeatmapBatchResult(BaseModel):
+    """Result of one batch item, in request order"""
+
+    page_url: str
+    kind: str
+    status: int  # 200; 404 for unknown pages, 503 or 500 for failed items
+    data: Optional[Dict[str, Any]] = None  # The GET endpoint's JSON response
+    error: Optional[Dict[str, Any]] = None
+
+
+class HeatmapBatchResponse(BaseModel):
+    """Results of a batch heatmap request"""
+
+    results: List[HeatmapBatchResult]
@@ -0,0 +1,48 @@
+"""
+Page schemas
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+from pydantic import BaseModel
+
+
+class PageResponse(BaseModel):
+    """Page list entry"""
+
+    id: UUID
+    url: str
+    title: Optional[str]
+    created_at: datetime
+    updated_at: datetime  # Latest session start or event
+
+
+class PageListResponse(BaseModel):
+    """One page of the page list"""
+
+    pages: List[PageResponse]
+    total: Optional[int] = None  # First page only
+    next_cursor: Optional[str] = None  # Pass as cursor for the next page; None at the end
+
+
+class PageStatsResponse(BaseModel):
+    """Activity counters of a page"""
+
+    page_id: UUID
+    page_url: str
+    page_title: Optional[str]
+    total_clicks: int
+    total_scrolls: int
+    total_mouse_moves: int
+    unique_sessions: int
+    scroll_sessions: int  # Sessions with at least one scroll event
+    last_activity: datetime
+
+
+class PageStatsListResponse(BaseModel):
+    """One page of the page stats list"""
+
+    stats: List[PageStatsResponse]
+    total: Optional[int] = None  # First page only
+    next_cursor: Optional[str] = None
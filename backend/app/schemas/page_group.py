@@ -0,0 +1,25 @@
+"""
+Page group schemas
+"""
+
+from datetime import datetime
+from uuid import UUID
+from pydantic import BaseModel, Field
+
+
+class PageGroupCreate(BaseModel):
+    """Page group creation schema"""
+
+    name: str = Field(..., min_length=1, max_length=100)
+    # Page URL with * (within a path segment) and ** (anything) wildcards
+    pattern: str = Field(..., min_length=1, max_length=2000)
+
+
+class PageGroupResponse(BaseModel):
+    """Page group response schema"""
+
+    id: UUID
+    name: str
+    pattern: str
+    page_count: int
+    created_at: datetime
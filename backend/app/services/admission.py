@@ -0,0 +1,157 @@
+"""
+Admission control - Concurrency limits with a bounded wait queue
+
+A gate hands out slots, each standing for one analytics connection in
+use. Analytics requests (get_read_db) take one slot for the request, at
+most ANALYTICS_MAX_CONCURRENCY at a time. Further requests wait in a queue
+of at most ANALYTICS_MAX_QUEUE for up to ANALYTICS_QUEUE_TIMEOUT_SECONDS;
+beyond that they are turned away with a 503 and Retry-After at once
+instead of piling up on the analytics pool, so dashboard bursts degrade
+into fast refusals rather than timeouts. Ingest is never admitted through
+a gate.
+
+Work that outlives or fans out of its request takes its slots explicitly:
+a streamed body keeps the request's slot until the stream ends
+(admitted_stream), and extra concurrent work takes more slots only when
+they are free (try_acquire), so a request never waits on a second slot
+while holding its first.
+"""
+
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.services.metrics import admission_rejections, register_admission_gauges
+
+
+class AdmissionSlot:
+    """One slot of a gate, released exactly once"""
+
+    def __init__(self, gate: "AdmissionGate"):
+        self._gate = gate
+        self._held = True
+        self.kept = False
+
+    def keep(self) -> "AdmissionSlot":
+        """Keep the slot past its block (e.g. for a streamed body); the holder releases it"""
+        self.kept = True
+        return self
+
+    def release(self) -> None:
+        if self._held:
+            self._held = False
+            self._gate._release()
+
+
+class AdmissionGate:
+    """Semaphore whose waiters are counted and bounded"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _reject(self, reason: str) -> HTTPException:
+        admission_rejections.inc(self.name, reason)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(max(1, math.ceil(self.queue_timeout)))},
+            detail={
+                "error": {
+                    "code": "OVERLOADED",
+                    "message": f"Too many concurrent {self.name} requests, retry shortly",
+                }
+            },
+        )
+
+    async def acquire(self) -> AdmissionSlot:
+        """Take a slot, queueing if needed; 503 when the queue is full or the wait too long"""
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise self._reject("queue_full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject("queue_timeout") from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.running += 1
+        return AdmissionSlot(self)
+
+    async def try_acquire(self) -> Optional[AdmissionSlot]:
+        """A free slot without queueing, or None"""
+        if self._semaphore.locked():
+            return None
+        await self._semaphore.acquire()
+        self.running += 1
+        return AdmissionSlot(self)
+
+    def _release(self) -> None:
+        self.running -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncGenerator[AdmissionSlot, None]:
+        """Hold one slot for the block (unless kept)"""
+        slot = await self.acquire()
+        try:
+            yield slot
+        finally:
+            if not slot.kept:
+                slot.release()
+
+
+# Global instance
+analytics_gate = AdmissionGate(
+    "analytics",
+    max_concurrency=settings.ANALYTICS_MAX_CONCURRENCY,
+    max_queue=settings.ANALYTICS_MAX_QUEUE,
+    queue_timeout=settings.ANALYTICS_QUEUE_TIMEOUT_SECONDS,
+)
+register_admission_gauges(lambda: [analytics_gate])
+
+
+async def analytics_admission() -> AsyncGenerator[AdmissionSlot, None]:
+    """Dependency holding an analytics slot for the request"""
+    async with analytics_gate.slot() as slot:
+        yield slot
+
+
+async def admitted_stream(
+    slot: AdmissionSlot, chunks: AsyncGenerator[bytes, None]
+) -> AsyncIterator[bytes]:
+    """
+    Streamed body holding a kept slot until it ends
+
+    The slot is released once chunks is closed, however the stream ends.
+    The returned iterator is already started, so that also holds when the
+    response is abandoned before its first chunk (the event loop closes
+    started generators it collects).
+    """
+    slot.keep()
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            yield b""
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            try:
+                await chunks.aclose()
+            finally:
+                slot.release()
+
+    stream = body()
+    await stream.__anext__()
+    return stream
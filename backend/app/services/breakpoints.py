@@ -0,0 +1,44 @@
+"""
+Device breakpoints - Viewport width buckets and viewport-relative coordinates
+
+Click and mouse move events store, next to their page pixel coordinates,
+the breakpoint their viewport falls into (HEATMAP_BREAKPOINTS maps names
+to minimum viewport widths) and x as a fraction of the viewport width, so
+heatmaps can be filtered per device class or aligned across widths.
+"""
+
+from typing import Optional
+
+from fastapi import HTTPException, status
+from app.config import settings
+
+
+def breakpoint_for(viewport_width: int) -> str:
+    """Name of the widest breakpoint whose minimum width fits the viewport"""
+    ordered = sorted(settings.HEATMAP_BREAKPOINTS.items(), key=lambda item: item[1])
+    name = ordered[0][0]
+    for candidate, min_width in ordered:
+        if viewport_width >= min_width:
+            name = candidate
+    return name
+
+
+def x_ratio(x: int, viewport_width: int) -> float:
+    """x relative to the viewport width (0 = left edge, 1 = right edge)"""
+    return round(x / viewport_width, 4)
+
+
+def validate_breakpoint(name: Optional[str]) -> Optional[str]:
+    """Reject unknown breakpoint filters with a 422"""
+    if name is not None and name not in settings.HEATMAP_BREAKPOINTS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": f"Unknown breakpoint {name!r}; expected one of "
+                    + ", ".join(settings.HEATMAP_BREAKPOINTS),
+                }
+            },
+        )
+    return name
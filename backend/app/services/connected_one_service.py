@@ -2,9 +2,11 @@
 Connected One integration service - Proxy API for Connected One
 """
 
+import time
 from typing import Any, Dict, List, Optional
 import httpx
 from app.config import settings
+from app.services.metrics import record_webhook_delivery
 
 
 class ConnectedOneService:
@@ -83,14 +85,20 @@ class ConnectedOneService:
         Raises:
             httpx.HTTPError: If API request fails
         """
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{self.base_url}/v1/webhooks/heatmap-events",
-                headers=self.headers,
-                json=event_data,
-            )
-            response.raise_for_status()
-            return response.json()
+        outcome = "error"
+        start = time.perf_counter()
+        try:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                response = await client.post(
+                    f"{self.base_url}/v1/webhooks/heatmap-events",
+                    headers=self.headers,
+                    json=event_data,
+                )
+                outcome = "http_error" if response.status_code >= 400 else "success"
+                response.raise_for_status()
+                return response.json()
+        finally:
+            record_webhook_delivery("connected_one", outcome, time.perf_counter() - start)
 
     async def validate_api_key(self) -> bool:
         """
@@ -0,0 +1,58 @@
+"""
+Fast JSON - orjson encoding and responses that skip response_model validation
+
+FastAPI validates a route's return value against its response_model,
+converts it with jsonable_encoder and encodes it with the default
+response class. Routes on hot paths instead return fast_response(...):
+a returned Response is sent as is, so data that is already shaped like
+the schema (a model built by the route, or plain dicts/lists) is encoded
+exactly once. The response_model stays on the route for the OpenAPI docs.
+"""
+
+from decimal import Decimal
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+import orjson
+from fastapi import Response, status
+from pydantic import BaseModel
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, UUID):  # asyncpg's UUID subclass, which orjson does not take
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """orjson with numpy arrays/scalars, Decimals, UUIDs and Pydantic models"""
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+def fast_response(
+    content: Any,
+    status_code: int = status.HTTP_200_OK,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    JSON response without response_model validation
+
+    Args:
+        content: Pydantic model (encoded by pydantic-core) or JSON-shaped
+            data (encoded by orjson); it must already match the schema
+        status_code: Status code (the route decorator's is not applied)
+        headers: Extra response headers
+    """
+    body = content.model_dump_json().encode() if isinstance(content, BaseModel) else dumps(content)
+    return Response(
+        content=body,
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
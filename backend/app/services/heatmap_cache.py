@@ -0,0 +1,372 @@
+"""
+Heatmap response cache - Serialized heatmap responses with ingest-watermark invalidation
+
+Entries are keyed by (endpoint, scope_id, start, end, grid_size, params),
+where params holds any further endpoint options and the scope is the
+page (heatmaps) or funnel (funnel stats) whose events the result
+aggregates, and hold the serialized JSON body together with the
+version they were computed at:
+
+- live ranges (open-ended or ending recently) use the scope's ingest
+  watermark, which the event endpoints bump after every committed batch
+- ranges that ended more than HEATMAP_CACHE_SETTLE_SECONDS ago can no longer
+  receive events and use the fixed version "past", so they never expire
+- live versions also carry the current HEATMAP_CACHE_LIVE_MAX_AGE_SECONDS
+  window of the wall clock, so a live entry is recomputed at least that
+  often even when no bump reaches this process
+
+The version also feeds the ETag, so clients revalidate with If-None-Match
+and get a 304 without the aggregation (or the body) being produced.
+
+Watermarks live in the process that ingested the batch. Without a shared
+cache (RESULT_CACHE_BACKEND), other workers and instances never see the
+bump, so with several of them live ranges can be stale for up to the live
+max age; only a single-process deployment gets exact invalidation.
+
+Lookups go through the in-process LRU first and then, when configured, the
+shared cache (app.services.shared_cache), which also carries watermark bumps
+between instances. Misses are computed on the read replica when it keeps up
+(app.database.read_target); a result that may predate its version is
+returned without being stored.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Sequence, Tuple, Union
+from uuid import UUID
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import read_target
+from app.services.metrics import record_cache_lookup
+from app.services.shared_cache import shared_cache
+from app.services.singleflight import SingleFlight
+
+PAST_VERSION = "past"
+
+
+class HeatmapCacheKey(NamedTuple):
+    """Identity of one heatmap result"""
+
+    endpoint: str
+    scope_id: UUID
+    start: Optional[datetime]
+    end: Optional[datetime]
+    grid_size: Optional[int] = None
+    params: Tuple[Tuple[str, Any], ...] = ()
+
+    def digest(self) -> str:
+        """Stable string form used for ETags and shared cache keys"""
+        start = self.start.isoformat() if self.start else ""
+        end = self.end.isoformat() if self.end else ""
+        digest = f"{self.endpoint}|{self.scope_id}|{start}|{end}|{self.grid_size or ''}"
+        if self.params:
+            digest += "|" + "&".join(f"{name}={value}" for name, value in self.params)
+        return digest
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize query datetimes to the naive UTC used for event timestamps"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def cache_key(
+    endpoint: str,
+    scope_id: UUID,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    grid_size: Optional[int] = None,
+    **params: Any,
+) -> HeatmapCacheKey:
+    """Build a key with datetimes normalized to naive UTC and sorted params"""
+    return HeatmapCacheKey(
+        endpoint,
+        scope_id,
+        to_utc_naive(start),
+        to_utc_naive(end),
+        grid_size,
+        tuple(sorted(params.items())),
+    )
+
+
+class IngestWatermarks:
+    """
+    Per-scope (page or funnel) time of the last committed event batch
+
+    Scopes not ingested since process start report the start time, so
+    entries computed afterwards stay valid until the first new batch
+    arrives. Bumps are shared with other instances through the shared
+    cache; the first one makes all instances agree on the value.
+
+    A scope can also stand for other scopes (a page group for its pages,
+    see set_members) and then reports the newest of their watermarks.
+    """
+
+    def __init__(self):
+        self._started = time.time()
+        self._watermarks: Dict[str, float] = {}
+        self._members: Dict[str, Tuple[str, ...]] = {}
+
+    def get(self, scope_id: UUID) -> float:
+        scope = str(scope_id)
+        watermark = self._watermarks.get(scope, self._started)
+        for member in self._members.get(scope, ()):
+            watermark = max(watermark, self._watermarks.get(member, self._started))
+        return watermark
+
+    def set_members(self, scope_id: UUID, member_ids: Sequence[UUID]) -> None:
+        """Make a scope's watermark follow its members' (replacing earlier members)"""
+        self._members[str(scope_id)] = tuple(str(member) for member in member_ids)
+
+    def bump(self, scope_id: UUID) -> float:
+        """Advance a scope's watermark (strictly increasing) and broadcast it"""
+        watermark = max(time.time(), self.get(scope_id) + 1e-6)
+        self._watermarks[str(scope_id)] = watermark
+        if shared_cache is not None:
+            shared_cache.invalidate(str(scope_id), watermark)
+        return watermark
+
+    def resync(self) -> None:
+        """Advance every scope's watermark (bumps from other instances may have been missed)"""
+        now = time.time()
+        self._started = max(self._started, now)
+        self._watermarks = {scope: max(value, now) for scope, value in self._watermarks.items()}
+
+    def observe(self, scope: str, watermark: float) -> None:
+        """Apply a watermark bump received from another instance"""
+        if watermark > self._watermarks.get(scope, 0.0):
+            self._watermarks[scope] = watermark
+
+
+class _Entry(NamedTuple):
+    version: str
+    body: bytes
+
+
+class HeatmapCache:
+    """Size-bounded LRU of serialized heatmap responses"""
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size_bytes = 0
+        self._entries: "OrderedDict[HeatmapCacheKey, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: HeatmapCacheKey, version: str) -> Optional[bytes]:
+        """Cached body if present and computed at the given version"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.version != version:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.body
+
+    def put(self, key: HeatmapCacheKey, version: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(version, body)
+        self.size_bytes += len(body)
+        while self.size_bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def _remove(self, key: HeatmapCacheKey) -> None:
+        entry = self._entries.pop(key)
+        self.size_bytes -= len(entry.body)
+
+
+# Global instances
+ingest_watermarks = IngestWatermarks()
+heatmap_cache = HeatmapCache(
+    max_bytes=settings.HEATMAP_CACHE_MAX_BYTES,
+    max_entries=settings.HEATMAP_CACHE_MAX_ENTRIES,
+)
+inflight = SingleFlight("inflight")
+
+
+def is_past_range(end: Optional[datetime]) -> bool:
+    """Whether no more events can arrive for a range ending at end"""
+    if end is None:
+        return False
+    settle = timedelta(seconds=settings.HEATMAP_CACHE_SETTLE_SECONDS)
+    return to_utc_naive(end) <= datetime.utcnow() - settle
+
+
+def cache_version(key: HeatmapCacheKey) -> str:
+    """
+    Current version of a key
+
+    "past", or the scope's ingest watermark followed by the current live
+    max-age window ("<watermark>~<window>")
+    """
+    if is_past_range(key.end):
+        return PAST_VERSION
+    version = f"{ingest_watermarks.get(key.scope_id):.6f}"
+    if settings.HEATMAP_CACHE_LIVE_MAX_AGE_SECONDS > 0:
+        window = int(time.time() // settings.HEATMAP_CACHE_LIVE_MAX_AGE_SECONDS)
+        version += f"~{window}"
+    return version
+
+
+def version_watermark(version: str) -> Optional[float]:
+    """Ingest watermark a version was computed at (None for "past")"""
+    if version == PAST_VERSION:
+        return None
+    return float(version.partition("~")[0])
+
+
+def make_etag(key: HeatmapCacheKey, version: str) -> str:
+    digest = hashlib.sha1(f"{key.digest()}|{version}".encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _cache_headers(etag: str, version: str) -> Dict[str, str]:
+    if version == PAST_VERSION:
+        cache_control = f"private, max-age={settings.HEATMAP_CACHE_PAST_MAX_AGE}, immutable"
+    else:
+        cache_control = "private, no-cache"
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def validator_headers(key: HeatmapCacheKey) -> Dict[str, str]:
+    """ETag and Cache-Control for the current version of a key (uncached responses)"""
+    version = cache_version(key)
+    return _cache_headers(make_etag(key, version), version)
+
+
+async def _load(
+    key: HeatmapCacheKey,
+    version: str,
+    compute: Callable[[AsyncSession], Awaitable[Union[BaseModel, bytes]]],
+    bypass: bool,
+) -> bytes:
+    """Shared cache lookup, then computation on a dedicated session"""
+    if shared_cache is not None and not bypass:
+        entry = await shared_cache.get(key.digest())
+        hit = entry is not None and entry[0] == version
+        record_cache_lookup("shared", hit)
+        if hit:
+            if settings.HEATMAP_CACHE_ENABLED:
+                heatmap_cache.put(key, version, entry[1])
+            return entry[1]
+
+    # Own session: the computation may outlive the request that started it
+    target = await read_target()
+    async with target.sessionmaker() as session:
+        result = await compute(session)
+    body = result if isinstance(result, bytes) else result.model_dump_json().encode()
+
+    # A replica that had not replayed the batch behind a live version yet
+    # computed an older state: serve it, but do not store it under the version
+    watermark = version_watermark(version)
+    if watermark is not None and watermark > target.replayed_through:
+        return body
+
+    if settings.HEATMAP_CACHE_ENABLED:
+        heatmap_cache.put(key, version, body)
+    if shared_cache is not None:
+        ttl = (
+            settings.RESULT_CACHE_PAST_TTL_SECONDS
+            if version == PAST_VERSION
+            else settings.RESULT_CACHE_TTL_SECONDS
+        )
+        shared_cache.set(key.digest(), version, body, ttl)
+    return body
+
+
+async def cached_response(
+    request: Request,
+    key: HeatmapCacheKey,
+    compute: Callable[[AsyncSession], Awaitable[Union[BaseModel, bytes]]],
+    db: Optional[AsyncSession] = None,
+    media_type: str = "application/json",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Serve a result from the caches, computing and storing it on a miss
+
+    Concurrent misses for the same key and version share one computation
+    (see app.services.singleflight).
+
+    Args:
+        request: Incoming request (If-None-Match / Cache-Control)
+        key: Cache key of the result
+        compute: Coroutine factory producing the response model (or an
+            already encoded body) from a session
+        db: Request session; its transaction is ended before waiting on the
+            computation so waiting requests do not hold pool connections
+        media_type: Content type of the body
+        headers: Extra response headers (must be derivable from the key)
+
+    Returns:
+        304 when the client's ETag is current, otherwise the JSON body
+    """
+    version = cache_version(key)
+    etag = make_etag(key, version)
+    headers = {**(headers or {}), **_cache_headers(etag, version)}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    bypass = "no-cache" in request.headers.get("cache-control", "")
+    body = await cached_body(key, compute, db=db, bypass=bypass, version=version)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+async def cached_body(
+    key: HeatmapCacheKey,
+    compute: Callable[[AsyncSession], Awaitable[Union[BaseModel, bytes]]],
+    db: Optional[AsyncSession] = None,
+    bypass: bool = False,
+    version: Optional[str] = None,
+) -> bytes:
+    """
+    Encoded result of a key from the caches, computing and storing it on a miss
+
+    The body lookup of cached_response, for callers that assemble their own
+    response (e.g. several results in one); bypass skips the cache reads.
+    """
+    if version is None:
+        version = cache_version(key)
+    if settings.HEATMAP_CACHE_ENABLED and not bypass:
+        body = heatmap_cache.get(key, version)
+        record_cache_lookup("heatmap", body is not None)
+        if body is not None:
+            return body
+
+    if db is not None:
+        await db.commit()
+    return await inflight.do((key, version, bypass), lambda: _load(key, version, compute, bypass))
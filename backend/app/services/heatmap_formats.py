@@ -0,0 +1,168 @@
+"""
+Heatmap formats - Columnar encodings of heatmap point data
+
+Besides the default row-oriented JSON (one object per point), the point
+heatmap endpoints can return the same data as columns, built straight
+from the query result without per-row Pydantic models:
+
+- columnar: JSON with one array per column
+  ({"data": {"x": [...], "y": [...], "count": [...]}, ...})
+- binary: little-endian typed arrays behind a JSON header (see encode_binary)
+- arrow: an Apache Arrow IPC stream with one record batch
+
+The click heatmap can additionally be streamed as NDJSON (one point per
+line), see app.routes.heatmaps.stream_click_heatmap.
+
+String columns are dictionary encoded (in the binary format as int32
+codes, -1 for null, with the dictionary in the header).
+"""
+
+import struct
+from typing import Any, Dict, List, Literal, Optional, Sequence, Union, get_args
+
+import numpy as np
+import pyarrow as pa
+from fastapi import Request
+
+from app.services.fast_json import dumps
+
+FORMAT_MEDIA_TYPES = {
+    "json": "application/json",
+    "columnar": "application/vnd.heatmap.columnar+json",
+    "binary": "application/vnd.heatmap.binary",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "ndjson": "application/x-ndjson",
+}
+
+HeatmapFormat = Literal["json", "columnar", "binary", "arrow"]
+ClickHeatmapFormat = Literal["json", "columnar", "binary", "arrow", "ndjson"]
+
+BINARY_MAGIC = b"HMC1"
+
+Column = Union[np.ndarray, List[Optional[str]]]
+Columns = Dict[str, Column]
+
+
+def negotiate_format(
+    request: Request,
+    requested: Optional[str],
+    formats: Sequence[str] = get_args(HeatmapFormat),
+) -> str:
+    """
+    Pick the output format from the format parameter or the Accept header
+
+    An explicit format wins; otherwise the first media type in Accept (by
+    q-value, then order) among the given formats is used, defaulting to
+    row JSON.
+    """
+    if requested:
+        return requested
+
+    candidates = []
+    for position, part in enumerate(request.headers.get("accept", "").split(",")):
+        media_type, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        candidates.append((-quality, position, media_type.strip().lower()))
+
+    by_media_type = {FORMAT_MEDIA_TYPES[name]: name for name in formats}
+    for negative_quality, _, media_type in sorted(candidates):
+        if negative_quality < 0 and media_type in by_media_type:
+            return by_media_type[media_type]
+    return "json"
+
+
+def int_column(values: Sequence[Any], dtype: str = "<i4") -> np.ndarray:
+    """Numeric query column (ints, Decimals or floats) as a typed array"""
+    return np.fromiter((int(v) for v in values), dtype=dtype, count=len(values))
+
+
+def encode_columnar_json(meta: Dict[str, Any], columns: Columns) -> bytes:
+    """Metadata plus {"data": {column: [values]}}"""
+    length = len(next(iter(columns.values()))) if columns else 0
+    body = {**meta, "length": length, "data": columns}
+    return dumps(body)
+
+
+def _pad(size: int) -> int:
+    return -size % 8
+
+
+def encode_binary(meta: Dict[str, Any], columns: Columns) -> bytes:
+    """
+    Typed-array body
+
+    Layout: b"HMC1", uint32 header length, UTF-8 JSON header (padded with
+    spaces to 8 bytes), then one buffer per column, each 8-byte aligned so
+    it can be viewed in place (e.g. new Int32Array(body, offset, length)).
+    The header holds the metadata and a "columns" list of
+    {name, dtype, offset, length[, dictionary]}; offsets are from the
+    start of the data section (8 + header length, rounded up to 8).
+    """
+    buffers = []
+    specs = []
+    for name, values in columns.items():
+        spec: Dict[str, Any] = {"name": name}
+        if isinstance(values, np.ndarray):
+            array = values
+        else:
+            dictionary: Dict[str, int] = {}
+            array = np.fromiter(
+                (-1 if v is None else dictionary.setdefault(v, len(dictionary)) for v in values),
+                dtype="<i4",
+                count=len(values),
+            )
+            spec["dictionary"] = list(dictionary)
+        spec["dtype"] = array.dtype.str
+        spec["length"] = len(array)
+        specs.append(spec)
+        buffers.append(array.tobytes())
+
+    offset = 0
+    for spec, buffer in zip(specs, buffers):
+        spec["offset"] = offset
+        offset += len(buffer) + _pad(len(buffer))
+    header = dumps({**meta, "columns": specs})
+
+    parts = [BINARY_MAGIC, struct.pack("<I", len(header)), header, b" " * _pad(len(header))]
+    for buffer in buffers:
+        parts.append(buffer)
+        parts.append(b"\0" * _pad(len(buffer)))
+    return b"".join(parts)
+
+
+def encode_arrow(meta: Dict[str, Any], columns: Columns) -> bytes:
+    """Arrow IPC stream; metadata is stored as JSON under the schema key "heatmap" """
+    batch = pa.RecordBatch.from_pydict(
+        {
+            name: (
+                pa.array(values)
+                if isinstance(values, np.ndarray)
+                else pa.array(values, pa.string()).dictionary_encode()
+            )
+            for name, values in columns.items()
+        },
+        metadata={"heatmap": dumps(meta)},
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+ENCODERS = {
+    "columnar": encode_columnar_json,
+    "binary": encode_binary,
+    "arrow": encode_arrow,
+}
+
+
+def encode_columns(output_format: str, meta: Dict[str, Any], columns: Columns) -> bytes:
+    """Encode columns in one of the non-default formats"""
+    return ENCODERS[output_format](meta, columns)
@@ -0,0 +1,189 @@
+"""
+Heatmap rendering - Point aggregates to density rasters with NumPy
+
+The rendering functions are pure (no database or app state) so they run
+in a process pool, off the event loop: points are binned into an
+output-resolution grid with bincount, smoothed with a separable Gaussian
+kernel and returned either as a raw grid (float32 densities or uint8
+intensities) or as an RGBA PNG ready to overlay on the page.
+"""
+
+import asyncio
+import math
+import multiprocessing
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+# Colormap anchors: (position, (r, g, b, a)); "heat" matches the frontend
+# renderer (blue -> yellow -> red, opacity 0.5 -> 0.9)
+COLORMAPS: Dict[str, List[Tuple[float, Tuple[int, int, int, int]]]] = {
+    "heat": [
+        (0.0, (0, 0, 255, 128)),
+        (0.5, (255, 255, 0, 179)),
+        (1.0, (255, 0, 0, 230)),
+    ],
+    "gray": [
+        (0.0, (0, 0, 0, 0)),
+        (1.0, (0, 0, 0, 255)),
+    ],
+}
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "float32": "application/octet-stream",
+    "uint8": "application/octet-stream",
+}
+
+
+def bin_points(
+    xs: np.ndarray,
+    ys: np.ndarray,
+    weights: np.ndarray,
+    extent: Tuple[float, float],
+    shape: Tuple[int, int],
+) -> np.ndarray:
+    """
+    Sum weighted points into a grid
+
+    Args:
+        xs, ys: Page coordinates in pixels
+        weights: Event count per point
+        extent: (page_width, page_height) mapped onto the grid
+        shape: (height, width) of the grid
+
+    Returns:
+        float64 grid of shape (height, width); points outside the extent are dropped
+    """
+    height, width = shape
+    col = np.floor(xs * (width / extent[0])).astype(np.int64)
+    row = np.floor(ys * (height / extent[1])).astype(np.int64)
+    inside = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+    flat = row[inside] * width + col[inside]
+    grid = np.bincount(flat, weights=weights[inside], minlength=width * height)
+    # bincount of no points is int64 whatever the weights
+    return grid.astype(np.float64, copy=False).reshape(height, width)
+
+
+def gaussian_kernel(sigma: float) -> np.ndarray:
+    """Normalized 1-D Gaussian truncated at 3 sigma"""
+    radius = max(1, int(math.ceil(3 * sigma)))
+    taps = np.arange(-radius, radius + 1, dtype=np.float64)
+    kernel = np.exp(-0.5 * (taps / sigma) ** 2)
+    return kernel / kernel.sum()
+
+
+def gaussian_blur(grid: np.ndarray, sigma: float) -> np.ndarray:
+    """Separable Gaussian blur (zero padding), one vectorized pass per tap"""
+    if sigma <= 0:
+        return grid
+    kernel = gaussian_kernel(sigma)
+    radius = len(kernel) // 2
+    for axis in (0, 1):
+        pad = [(0, 0), (0, 0)]
+        pad[axis] = (radius, radius)
+        padded = np.pad(grid, pad)
+        size = grid.shape[axis]
+        window = [slice(None), slice(None)]
+        out = np.zeros_like(grid)
+        for offset, weight in enumerate(kernel):
+            window[axis] = slice(offset, offset + size)
+            out += weight * padded[tuple(window)]
+        grid = out
+    return grid
+
+
+def colormap_lut(name: str) -> np.ndarray:
+    """(256, 4) uint8 RGBA lookup table; index 0 is fully transparent"""
+    anchors = COLORMAPS[name]
+    positions = np.array([p for p, _ in anchors])
+    steps = np.linspace(0.0, 1.0, 256)
+    lut = np.stack(
+        [np.interp(steps, positions, [color[c] for _, color in anchors]) for c in range(4)],
+        axis=1,
+    )
+    lut = np.round(lut).astype(np.uint8)
+    lut[0] = 0
+    return lut
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Encode an (height, width, 4) uint8 array as an RGBA PNG"""
+    height, width, _ = rgba.shape
+    # Each scanline is prefixed with filter type 0 (None)
+    scanlines = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        crc = zlib.crc32(tag + data) & 0xFFFFFFFF
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", crc)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def render_density(
+    xs: np.ndarray,
+    ys: np.ndarray,
+    weights: np.ndarray,
+    extent: Tuple[float, float],
+    shape: Tuple[int, int],
+    sigma: float,
+    output_format: str,
+    colormap: str = "heat",
+) -> bytes:
+    """
+    Render points as a density raster
+
+    Returns:
+        - float32: little-endian row-major densities (events per output pixel)
+        - uint8: intensities scaled so the densest pixel is 255
+        - png: uint8 intensities through the colormap
+    """
+    density = gaussian_blur(bin_points(xs, ys, weights, extent, shape), sigma)
+    if output_format == "float32":
+        return density.astype("<f4").tobytes()
+
+    peak = density.max() if density.size else 0.0
+    scale = 255.0 / peak if peak > 0 else 0.0
+    intensity = np.round(density * scale).astype(np.uint8)
+    if output_format == "uint8":
+        return intensity.tobytes()
+    return encode_png(colormap_lut(colormap)[intensity])
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """Process pool for rendering (spawned lazily, never forked from the server)"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.RENDER_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_render_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def render_in_pool(*args) -> bytes:
+    """Run render_density in the process pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_render_pool(), render_density, *args)
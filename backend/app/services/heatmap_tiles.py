@@ -0,0 +1,253 @@
+"""
+Heatmap tiles - Quadtree tile pyramid over precomputed per-day cell counts
+
+Zoom level z divides the page into cells of
+TILE_MIN_CELL_PX * 2 ** (TILE_MAX_ZOOM - z) pixels; a tile (z, x, y) is the
+TILE_SIZE x TILE_SIZE block of cells starting at cell (x * TILE_SIZE,
+y * TILE_SIZE). Zoom 0 is the coarsest level.
+
+A background rollup aggregates every closed day (one that ended more than
+HEATMAP_CACHE_SETTLE_SECONDS ago) into heatmap_tile_cells: the finest zoom
+from the raw events, every coarser zoom from the level below it. Tile reads
+sum those rows for rolled-up days and fall back to the raw events only for
+the remaining days (usually just today).
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.config import settings
+from app.database import admin_engine
+from app.models.click_event import ClickEvent
+from app.models.heatmap_tile import HeatmapTileCell, HeatmapTileRollup
+from app.models.mouse_move_event import MouseMoveEvent
+from app.services.page_groups import page_condition
+
+logger = logging.getLogger(__name__)
+
+# Event models with page coordinates, by heatmap kind
+POINT_SOURCES = {
+    "clicks": ClickEvent,
+    "mouse-moves": MouseMoveEvent,
+}
+
+# pg_try_advisory_lock key so only one instance rolls up at a time
+ROLLUP_LOCK_ID = 0x686D_7469  # "hmti"
+
+CellCounts = Dict[Tuple[int, int], int]
+
+
+def cell_size(zoom: int) -> int:
+    """Page pixels per cell side at a zoom level"""
+    return settings.TILE_MIN_CELL_PX * 2 ** (settings.TILE_MAX_ZOOM - zoom)
+
+
+def closed_before() -> date:
+    """First day that may still receive events"""
+    settle = timedelta(seconds=settings.HEATMAP_CACHE_SETTLE_SECONDS)
+    return (datetime.utcnow() - settle).date()
+
+
+def _day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+
+async def rollup_day(conn: AsyncConnection, day: date) -> None:
+    """(Re)build all zoom levels of one day for every page"""
+    start, end = _day_bounds(day)
+    await conn.execute(delete(HeatmapTileCell).where(HeatmapTileCell.day == day))
+
+    columns = ["page_id", "kind", "zoom", "day", "cell_x", "cell_y", "event_count"]
+    finest = settings.TILE_MAX_ZOOM
+    size = cell_size(finest)
+    for kind, model in POINT_SOURCES.items():
+        cell_x = (model.x // size).label("cell_x")
+        cell_y = (model.y // size).label("cell_y")
+        source = (
+            select(
+                model.page_id,
+                literal(kind).label("kind"),
+                literal(finest).label("zoom"),
+                literal(day).label("day"),
+                cell_x,
+                cell_y,
+                func.count().label("event_count"),
+            )
+            .where(model.timestamp >= start, model.timestamp < end)
+            .where(model.x >= 0, model.y >= 0)
+            .group_by(model.page_id, cell_x, cell_y)
+        )
+        await conn.execute(insert(HeatmapTileCell).from_select(columns, source))
+
+    # Each coarser level halves the cell grid of the level below
+    for zoom in range(finest - 1, -1, -1):
+        cell_x = (HeatmapTileCell.cell_x // 2).label("cell_x")
+        cell_y = (HeatmapTileCell.cell_y // 2).label("cell_y")
+        source = (
+            select(
+                HeatmapTileCell.page_id,
+                HeatmapTileCell.kind,
+                literal(zoom).label("zoom"),
+                HeatmapTileCell.day,
+                cell_x,
+                cell_y,
+                func.sum(HeatmapTileCell.event_count).label("event_count"),
+            )
+            .where(HeatmapTileCell.day == day, HeatmapTileCell.zoom == zoom + 1)
+            .group_by(
+                HeatmapTileCell.page_id, HeatmapTileCell.kind, HeatmapTileCell.day, cell_x, cell_y
+            )
+        )
+        await conn.execute(insert(HeatmapTileCell).from_select(columns, source))
+
+    await conn.execute(delete(HeatmapTileRollup).where(HeatmapTileRollup.day == day))
+    await conn.execute(insert(HeatmapTileRollup).values(day=day, rolled_up_at=datetime.utcnow()))
+
+
+async def rollup_pending_days() -> int:
+    """
+    Roll up closed days in the backfill window that have not been rolled up
+
+    Returns:
+        Number of days rolled up (0 if another instance holds the lock)
+    """
+    async with admin_engine.connect() as conn:
+        locked = await conn.scalar(select(func.pg_try_advisory_lock(ROLLUP_LOCK_ID)))
+        await conn.commit()
+        if not locked:
+            return 0
+        try:
+            last = closed_before()
+            first = last - timedelta(days=settings.TILE_ROLLUP_BACKFILL_DAYS)
+            done = set(
+                await conn.scalars(
+                    select(HeatmapTileRollup.day).where(HeatmapTileRollup.day >= first)
+                )
+            )
+            pending = [
+                first + timedelta(days=i)
+                for i in range((last - first).days)
+                if first + timedelta(days=i) not in done
+            ]
+            for day in pending:
+                await rollup_day(conn, day)
+                await conn.commit()
+            if pending:
+                logger.info("Rolled up heatmap tiles for %d day(s)", len(pending))
+            return len(pending)
+        finally:
+            await conn.rollback()
+            await conn.execute(select(func.pg_advisory_unlock(ROLLUP_LOCK_ID)))
+            await conn.commit()
+
+
+async def run_tile_rollups() -> None:
+    """Background loop started from the application lifespan"""
+    while True:
+        try:
+            await rollup_pending_days()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Heatmap tile rollup failed")
+        await asyncio.sleep(settings.TILE_ROLLUP_INTERVAL_SECONDS)
+
+
+def _day_runs(days: List[date]) -> List[Tuple[date, date]]:
+    """Group sorted days into contiguous (first, last) runs"""
+    runs: List[Tuple[date, date]] = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+async def fetch_tile_cells(
+    db: AsyncSession,
+    kind: str,
+    page_ids: Sequence[UUID],
+    zoom: int,
+    tile_x: int,
+    tile_y: int,
+    start_day: date,
+    end_day: date,
+) -> CellCounts:
+    """
+    Event counts per cell of one tile over [start_day, end_day], summed over pages
+
+    Returns:
+        {(column, row): count} with column/row relative to the tile origin
+    """
+    tile = settings.TILE_SIZE
+    x0, y0 = tile_x * tile, tile_y * tile
+    counts: CellCounts = defaultdict(int)
+
+    rolled = list(
+        await db.scalars(
+            select(HeatmapTileRollup.day).where(
+                HeatmapTileRollup.day >= start_day, HeatmapTileRollup.day <= end_day
+            )
+        )
+    )
+    if rolled:
+        query = (
+            select(
+                HeatmapTileCell.cell_x,
+                HeatmapTileCell.cell_y,
+                func.sum(HeatmapTileCell.event_count),
+            )
+            .where(
+                page_condition(HeatmapTileCell.page_id, page_ids),
+                HeatmapTileCell.kind == kind,
+                HeatmapTileCell.zoom == zoom,
+                HeatmapTileCell.day.in_(rolled),
+                HeatmapTileCell.cell_x >= x0,
+                HeatmapTileCell.cell_x < x0 + tile,
+                HeatmapTileCell.cell_y >= y0,
+                HeatmapTileCell.cell_y < y0 + tile,
+            )
+            .group_by(HeatmapTileCell.cell_x, HeatmapTileCell.cell_y)
+        )
+        for cx, cy, count in (await db.execute(query)).all():
+            counts[(cx - x0, cy - y0)] += int(count)
+
+    rolled_days = set(rolled)
+    missing = [
+        start_day + timedelta(days=i)
+        for i in range((end_day - start_day).days + 1)
+        if start_day + timedelta(days=i) not in rolled_days
+    ]
+    model = POINT_SOURCES[kind]
+    size = cell_size(zoom)
+    cell_x = (model.x // size).label("cell_x")
+    cell_y = (model.y // size).label("cell_y")
+    for first, last in _day_runs(missing):
+        query = (
+            select(cell_x, cell_y, func.count())
+            .where(page_condition(model.page_id, page_ids))
+            .where(model.timestamp >= _day_bounds(first)[0], model.timestamp < _day_bounds(last)[1])
+            .where(model.x >= x0 * size, model.x < (x0 + tile) * size)
+            .where(model.y >= y0 * size, model.y < (y0 + tile) * size)
+            .group_by(cell_x, cell_y)
+        )
+        for cx, cy, count in (await db.execute(query)).all():
+            counts[(cx - x0, cy - y0)] += int(count)
+
+    return counts
+
+
+def default_day_range(start_day: Optional[date], end_day: Optional[date]) -> Tuple[date, date]:
+    """Fill in a missing end (today) and start (TILE_DEFAULT_RANGE_DAYS before end)"""
+    end_day = end_day or datetime.utcnow().date()
+    start_day = start_day or end_day - timedelta(days=settings.TILE_DEFAULT_RANGE_DAYS - 1)
+    return start_day, end_day
@@ -0,0 +1,374 @@
+"""
+Metrics service - In-process Prometheus metrics registry
+
+Recording is a dict lookup plus an integer increment so it can sit on the
+ingest hot path. Samples are rendered in the Prometheus text exposition
+format only when /metrics is scraped.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text exposition format"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Render a label set as {name="value",...}"""
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base class for registered metrics"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterable[str]:
+        """Yield exposition lines for every series"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render HELP/TYPE header and samples"""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing counter"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = defaultdict(float)
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        """Increment the series identified by labelvalues"""
+        self._values[labelvalues] += amount
+
+    def value(self, *labelvalues: str) -> float:
+        """Current value of a series"""
+        return self._values.get(labelvalues, 0.0)
+
+    def items(self) -> List[Tuple[LabelValues, float]]:
+        """Snapshot of all series"""
+        return list(self._values.items())
+
+    def samples(self) -> Iterable[str]:
+        for labelvalues, value in self.items():
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """Fixed-bucket histogram"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(sorted(buckets))
+        # {labelvalues: [per-bucket counts..., +Inf count, sum]}
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """Record one observation"""
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [0] * (len(self._buckets) + 1) + [0.0]
+        series[bisect_left(self._buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        bucket_names = self.labelnames + ("le",)
+        for labelvalues, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self._buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(bucket_names, labelvalues + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge(Metric):
+    """Gauge whose series are collected by a callback at scrape time"""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], Iterable[Tuple[LabelValues, float]]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._collect = collect
+
+    def samples(self) -> Iterable[str]:
+        if self._collect is None:
+            return
+        for labelvalues, value in self._collect():
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Register a metric (names must be unique)"""
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+# Global registry
+registry = MetricsRegistry()
+
+http_request_duration = registry.register(
+    Histogram(
+        "heatmap_http_request_duration_seconds",
+        "HTTP request latency by route template and status",
+        ("method", "route", "status"),
+    )
+)
+
+events_ingested = registry.register(
+    Counter(
+        "heatmap_events_ingested_total",
+        "Tracking events ingested by event type",
+        ("type",),
+    )
+)
+
+rate_limit_rejections = registry.register(
+    Counter(
+        "heatmap_rate_limit_rejections_total",
+        "Requests rejected by the rate limiter by endpoint group",
+        ("group",),
+    )
+)
+
+admission_rejections = registry.register(
+    Counter(
+        "heatmap_admission_rejections_total",
+        "Requests turned away by an admission gate by workload and reason",
+        ("workload", "reason"),
+    )
+)
+
+cache_requests = registry.register(
+    Counter(
+        "heatmap_cache_requests_total",
+        "Cache lookups by cache name and result (hit/miss)",
+        ("cache", "result"),
+    )
+)
+
+
+def _collect_cache_hit_ratio() -> Iterable[Tuple[LabelValues, float]]:
+    """Hit ratio per cache since process start"""
+    totals: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0.0])
+    for (cache, result), value in cache_requests.items():
+        totals[cache][0 if result == "hit" else 1] += value
+    for cache, (hits, misses) in totals.items():
+        lookups = hits + misses
+        yield (cache,), (hits / lookups) if lookups else 0.0
+
+
+registry.register(
+    Gauge(
+        "heatmap_cache_hit_ratio",
+        "Cache hit ratio per cache since process start",
+        ("cache",),
+        collect=_collect_cache_hit_ratio,
+    )
+)
+
+webhook_delivery_duration = registry.register(
+    Histogram(
+        "heatmap_webhook_delivery_seconds",
+        "Outgoing webhook delivery latency",
+        ("target",),
+    )
+)
+
+webhook_deliveries = registry.register(
+    Counter(
+        "heatmap_webhook_deliveries_total",
+        "Outgoing webhook deliveries by target and outcome",
+        ("target", "outcome"),
+    )
+)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Record a cache hit or miss"""
+    cache_requests.inc(cache, "hit" if hit else "miss")
+
+
+def record_webhook_delivery(target: str, outcome: str, duration: float) -> None:
+    """Record an outgoing webhook delivery"""
+    webhook_delivery_duration.observe(duration, target)
+    webhook_deliveries.inc(target, outcome)
+
+
+def register_pool_gauges(pools: Callable[[], Iterable[Tuple[str, object]]]) -> None:
+    """
+    Register connection pool gauges
+
+    Args:
+        pools: Callable returning (pool name, SQLAlchemy pool) pairs
+    """
+
+    def collect_checked_out() -> Iterable[Tuple[LabelValues, float]]:
+        for name, pool in pools():
+            yield (name,), pool.checkedout()
+
+    def collect_overflow() -> Iterable[Tuple[LabelValues, float]]:
+        for name, pool in pools():
+            yield (name,), max(pool.overflow(), 0)
+
+    def collect_size() -> Iterable[Tuple[LabelValues, float]]:
+        for name, pool in pools():
+            yield (name,), pool.size()
+
+    registry.register(
+        Gauge(
+            "heatmap_db_pool_checked_out",
+            "Connections currently checked out of the pool",
+            ("pool",),
+            collect=collect_checked_out,
+        )
+    )
+    registry.register(
+        Gauge(
+            "heatmap_db_pool_overflow",
+            "Overflow connections currently open beyond pool_size",
+            ("pool",),
+            collect=collect_overflow,
+        )
+    )
+    registry.register(
+        Gauge(
+            "heatmap_db_pool_size",
+            "Configured pool size",
+            ("pool",),
+            collect=collect_size,
+        )
+    )
+
+
+def register_replica_gauges(lag: Callable[[], Optional[float]]) -> None:
+    """
+    Register the read replica lag gauge
+
+    Args:
+        lag: Callable returning the last measured lag in seconds (None
+            while unknown or unreachable)
+    """
+
+    def collect_lag() -> Iterable[Tuple[LabelValues, float]]:
+        value = lag()
+        if value is not None:
+            yield (), value
+
+    registry.register(
+        Gauge(
+            "heatmap_db_replica_lag_seconds",
+            "Replication lag of the read replica at its last check",
+            collect=collect_lag,
+        )
+    )
+
+
+def register_admission_gauges(gates: Callable[[], Iterable[object]]) -> None:
+    """
+    Register admission gate gauges
+
+    Args:
+        gates: Callable returning gates (app.services.admission.AdmissionGate)
+    """
+
+    def collect_running() -> Iterable[Tuple[LabelValues, float]]:
+        for gate in gates():
+            yield (gate.name,), gate.running
+
+    def collect_waiting() -> Iterable[Tuple[LabelValues, float]]:
+        for gate in gates():
+            yield (gate.name,), gate.waiting
+
+    registry.register(
+        Gauge(
+            "heatmap_admission_running",
+            "Requests currently admitted by an admission gate",
+            ("workload",),
+            collect=collect_running,
+        )
+    )
+    registry.register(
+        Gauge(
+            "heatmap_admission_waiting",
+            "Requests currently queued at an admission gate",
+            ("workload",),
+            collect=collect_waiting,
+        )
+    )
@@ -0,0 +1,134 @@
+"""
+Page groups - Heatmaps aggregated over the pages matching a URL pattern
+
+A group's pattern is a page URL in which * stands for any run of
+characters within one path segment and ** for anything, e.g.
+https://shop.example.com/product/* covers every product page. Query
+strings are ignored unless the pattern has one. Patterns are compiled to
+a regex that Postgres evaluates when the group is created (over all
+pages) and when a page is created (over all groups), so membership is a
+plain (group_id, page_id) table and heatmaps over a group read the
+events of its pages through the usual page_id indexes.
+
+Cached group heatmaps are keyed by the group id; their live version is
+the newest ingest watermark of any member (IngestWatermarks.set_members).
+"""
+
+import re
+from typing import NamedTuple, Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import ColumnElement, any_, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.page import Page
+from app.models.page_group import PageGroup, PageGroupMember
+from app.services.heatmap_cache import ingest_watermarks
+
+_WILDCARDS = re.compile(r"\*\*|\*")
+
+
+def normalize_pattern(pattern: str) -> str:
+    """Lower-case a pattern's scheme and host, as normalize_url does for pages"""
+    pattern = pattern.strip()
+    scheme, separator, rest = pattern.partition("://")
+    if not separator:
+        return pattern
+    host, _, path = rest.partition("/")
+    return f"{scheme.lower()}://{host.lower()}/{path}"
+
+
+def pattern_regex(pattern: str) -> str:
+    """Anchored regex (valid in Python and Postgres) matching a pattern's URLs"""
+    parts = []
+    position = 0
+    for wildcard in _WILDCARDS.finditer(pattern):
+        parts.append(re.escape(pattern[position : wildcard.start()]))
+        parts.append(".*" if wildcard.group() == "**" else "[^/?#]*")
+        position = wildcard.end()
+    parts.append(re.escape(pattern[position:]))
+    query = "" if "?" in pattern else r"(\?.*)?"
+    return f"^{''.join(parts)}{query}$"
+
+
+def page_condition(column: ColumnElement, page_ids: Sequence[UUID]) -> ColumnElement:
+    """column restricted to the given pages (= ANY of an array for groups)"""
+    if len(page_ids) == 1:
+        return column == page_ids[0]
+    return column == any_(literal(list(page_ids), ARRAY(PGUUID(as_uuid=True))))
+
+
+class PageScope(NamedTuple):
+    """The pages one heatmap aggregates: a single page or a page group's members"""
+
+    id: UUID  # Page or group id; the cache scope
+    url: str  # Page URL or group pattern
+    title: Optional[str]  # Page title or group name
+    page_ids: Tuple[UUID, ...]
+
+    @classmethod
+    def of_page(cls, page: Page) -> "PageScope":
+        return cls(page.id, page.url, page.title, (page.id,))
+
+    def condition(self, column: ColumnElement) -> ColumnElement:
+        """column (a page_id) restricted to this scope's pages"""
+        return page_condition(column, self.page_ids)
+
+
+async def page_group_scope(db: AsyncSession, name: str) -> PageScope:
+    """Scope of a page group by name, with its members; 404 for unknown groups"""
+    result = await db.execute(
+        select(
+            PageGroup.id,
+            PageGroup.name,
+            PageGroup.pattern,
+            func.array_remove(func.array_agg(PageGroupMember.page_id), None),
+        )
+        .outerjoin(PageGroupMember, PageGroupMember.group_id == PageGroup.id)
+        .where(PageGroup.name == name)
+        .group_by(PageGroup.id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": {
+                    "code": "NOT_FOUND",
+                    "message": f"Page group not found: {name}",
+                }
+            },
+        )
+
+    group_id, name, pattern, page_ids = row
+    page_ids = tuple(page_ids)
+    ingest_watermarks.set_members(group_id, page_ids)
+    return PageScope(group_id, pattern, name, page_ids)
+
+
+async def add_group_members(db: AsyncSession, group: PageGroup) -> int:
+    """Add every existing page matching a new group; returns the member count"""
+    result = await db.execute(
+        insert(PageGroupMember).from_select(
+            ["group_id", "page_id"],
+            select(literal(group.id, PGUUID(as_uuid=True)), Page.id).where(
+                Page.url.regexp_match(group.regex)
+            ),
+        )
+    )
+    return result.rowcount
+
+
+async def add_page_to_groups(db: AsyncSession, page: Page) -> None:
+    """Add a new page to the groups whose pattern it matches"""
+    await db.execute(
+        insert(PageGroupMember).from_select(
+            ["group_id", "page_id"],
+            select(PageGroup.id, literal(page.id, PGUUID(as_uuid=True))).where(
+                literal(page.url).regexp_match(PageGroup.regex)
+            ),
+        )
+    )
@@ -0,0 +1,160 @@
+"""
+Page stats - Per-page activity counters maintained by ingest
+
+Session starts and event batches add to an in-process buffer of counter
+deltas per page; a background task merges it into page_stats every
+PAGE_STATS_FLUSH_INTERVAL_SECONDS, adding the deltas and keeping the
+latest activity time, so a busy page costs one row update per flush
+instead of one per batch. Rows are created together with their page.
+Counters trail ingest by up to one flush interval (and lose the unflushed
+deltas if the process dies).
+
+A scroll session is a session with at least one scroll event on the
+page. The scroll endpoint counts it with the batch that inserts its
+page_scroll_sessions marker (INSERT ... ON CONFLICT DO NOTHING), so
+concurrent first batches of one session count it once.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List
+from uuid import UUID
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import admin_engine
+from app.models.page import Page
+from app.models.page_stats import PageStats
+from app.services.heatmap_cache import to_utc_naive
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("sessions", "clicks", "scrolls", "scroll_sessions", "mouse_moves")
+
+
+class PageStatsDelta:
+    """Counter increments of one page since the last flush"""
+
+    __slots__ = COUNTERS + ("last_event_at",)
+
+    def __init__(self, last_event_at: datetime):
+        for counter in COUNTERS:
+            setattr(self, counter, 0)
+        self.last_event_at = last_event_at
+
+    def merge(self, other: "PageStatsDelta") -> None:
+        for counter in COUNTERS:
+            setattr(self, counter, getattr(self, counter) + getattr(other, counter))
+        self.last_event_at = max(self.last_event_at, other.last_event_at)
+
+
+class PageStatsBuffer:
+    """Deltas recorded since the last flush"""
+
+    def __init__(self):
+        self._pending: Dict[UUID, PageStatsDelta] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, page_id: UUID, last_event_at: datetime, **counts: int) -> None:
+        # Client clocks run ahead; never report activity in the future
+        last_event_at = min(to_utc_naive(last_event_at), datetime.utcnow())
+        delta = self._pending.get(page_id)
+        if delta is None:
+            delta = self._pending[page_id] = PageStatsDelta(last_event_at)
+        else:
+            delta.last_event_at = max(delta.last_event_at, last_event_at)
+        for counter, count in counts.items():
+            setattr(delta, counter, getattr(delta, counter) + count)
+
+    def take(self) -> Dict[UUID, PageStatsDelta]:
+        """Remove and return everything buffered"""
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, deltas: Dict[UUID, PageStatsDelta]) -> None:
+        """Put back deltas whose flush failed"""
+        for page_id, delta in deltas.items():
+            current = self._pending.get(page_id)
+            if current is None:
+                self._pending[page_id] = delta
+            else:
+                current.merge(delta)
+
+
+# Global instance
+page_stats_buffer = PageStatsBuffer()
+
+
+def record_page_activity(page_id: UUID, last_event_at: datetime, **counts: int) -> None:
+    """Count a session start or event batch, e.g. clicks=len(events)"""
+    page_stats_buffer.add(page_id, last_event_at, **counts)
+
+
+async def create_page_stats(db: AsyncSession, page: Page) -> None:
+    """Zero counters for a new page (so it is listed before its first flush)"""
+    await db.execute(
+        insert(PageStats)
+        .values(page_id=page.id, last_event_at=page.created_at)
+        .on_conflict_do_nothing()
+    )
+
+
+async def flush_page_stats() -> int:
+    """Merge the buffer into page_stats; returns the number of pages updated"""
+    pending = page_stats_buffer.take()
+    if not pending:
+        return 0
+
+    # Key order, so concurrent flushes from several instances cannot deadlock.
+    # Every page gets its row on creation; deltas of deleted pages match nothing
+    rows: List[dict] = [
+        {
+            "b_page_id": page_id,
+            **{f"b_{counter}": getattr(delta, counter) for counter in COUNTERS},
+            "b_last_event_at": delta.last_event_at,
+        }
+        for page_id, delta in sorted(pending.items())
+    ]
+    statement = (
+        update(PageStats)
+        .where(PageStats.page_id == bindparam("b_page_id"))
+        .values(
+            **{
+                counter: getattr(PageStats, counter) + bindparam(f"b_{counter}")
+                for counter in COUNTERS
+            },
+            last_event_at=func.greatest(PageStats.last_event_at, bindparam("b_last_event_at")),
+        )
+        .execution_options(synchronize_session=None)
+    )
+    try:
+        async with admin_engine.begin() as conn:
+            await conn.execute(statement, rows)
+    except BaseException:
+        page_stats_buffer.restore(pending)
+        raise
+    return len(rows)
+
+
+async def run_page_stats() -> None:
+    """Background loop started from the application lifespan"""
+    try:
+        while True:
+            try:
+                await flush_page_stats()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Page stats flush failed")
+            await asyncio.sleep(settings.PAGE_STATS_FLUSH_INTERVAL_SECONDS)
+    finally:
+        try:
+            await flush_page_stats()
+        except Exception:
+            logger.exception("Final page stats flush failed")
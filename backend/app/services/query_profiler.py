@@ -0,0 +1,153 @@
+"""
+Query profiler - Per-request SQL statistics via SQLAlchemy cursor events
+
+Each request gets a QueryProfile stored in a context variable. The
+before/after_cursor_execute hooks time every statement and attribute it
+to the active profile, log slow statements, and count statement shapes so
+repeated identical statements (N+1 patterns) can be reported.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# Expanded IN lists ($1, $2, $3 / %(p_1)s, %(p_2)s) collapse to one placeholder
+_PLACEHOLDER_LIST_RE = re.compile(r"(\$\d+|%\(\w+\)s|\?)(\s*,\s*(\$\d+|%\(\w+\)s|\?))+")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a SQL statement so executions differing only in values compare equal"""
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    return _PLACEHOLDER_LIST_RE.sub(r"\1, ...", shape)
+
+
+def parameter_shape(parameters: Any) -> str:
+    """Describe bound parameters by type only (values are never logged)"""
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            # executemany
+            return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+        return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+    return type(parameters).__name__
+
+
+class QueryProfile:
+    """SQL statistics collected for one request"""
+
+    def __init__(self):
+        self.query_count = 0
+        self.total_time = 0.0
+        self.shape_counts: Counter = Counter()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        """Record one executed statement"""
+        self.query_count += 1
+        self.total_time += elapsed
+        self.shape_counts[statement_shape(statement)] += 1
+
+    def repeated_statements(self, threshold: int) -> Dict[str, int]:
+        """Statement shapes executed more than threshold times"""
+        return {shape: count for shape, count in self.shape_counts.items() if count > threshold}
+
+    def server_timing(self) -> str:
+        """Server-Timing header value"""
+        return f'db;dur={self.total_time * 1000:.2f};desc="{self.query_count} queries"'
+
+
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar(
+    "current_query_profile", default=None
+)
+# (statement, parameters) pairs collected by capture_statements()
+_captured_statements: ContextVar[Optional[List[Tuple[str, Any]]]] = ContextVar(
+    "captured_statements", default=None
+)
+
+
+def start_profile() -> Tuple[QueryProfile, Any]:
+    """
+    Start collecting statistics for the current context
+
+    Returns:
+        The new profile and a token for end_profile()
+    """
+    profile = QueryProfile()
+    return profile, _current_profile.set(profile)
+
+
+def end_profile(token: Any) -> None:
+    """Stop collecting statistics for the current context"""
+    _current_profile.reset(token)
+
+
+def current_profile() -> Optional[QueryProfile]:
+    """Profile of the current request, if any"""
+    return _current_profile.get()
+
+
+@contextmanager
+def capture_statements() -> Iterator[List[Tuple[str, Any]]]:
+    """
+    Collect the statements executed in this context (and tasks started from it)
+
+    Used by benchmarks to EXPLAIN exactly what an endpoint ran.
+
+    Yields:
+        List that receives (statement, parameters) pairs
+    """
+    captured: List[Tuple[str, Any]] = []
+    token = _captured_statements.set(captured)
+    try:
+        yield captured
+    finally:
+        _captured_statements.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+
+    if elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms): %s params=%s",
+            elapsed * 1000,
+            statement_shape(statement),
+            parameter_shape(parameters),
+        )
+
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+
+    captured = _captured_statements.get()
+    if captured is not None:
+        captured.append((statement, parameters))
+
+
+def install_query_profiler(engine: Engine) -> None:
+    """
+    Attach timing hooks to an engine
+
+    Args:
+        engine: Sync engine (use AsyncEngine.sync_engine for async engines)
+    """
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
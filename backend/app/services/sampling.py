@@ -0,0 +1,38 @@
+"""
+Session sampling - Uniform session samples for approximate point heatmaps
+
+Click and mouse move events store a sample key at ingest: a hash of their
+session id into [0, SAMPLE_KEYS). Events whose key is below k form a
+uniform sample of k / SAMPLE_KEYS of the sessions (whole sessions, so
+each sampled visit keeps all its events), and a
+(page_id, sample_key, timestamp) index reads only that fraction of a
+page's rows. Counts over the sample are scaled back by SAMPLE_KEYS / k.
+
+The key is the first 32 bits of the MD5 of the session id's text form,
+which Postgres computes identically (SAMPLE_KEY_SQL) for backfills.
+"""
+
+import hashlib
+from typing import Optional
+from uuid import UUID
+
+SAMPLE_KEYS = 10000
+
+SAMPLE_KEY_SQL = f"(('x' || substr(md5(session_id::text), 1, 8))::bit(32)::bigint % {SAMPLE_KEYS})"
+
+
+def sample_key(session_id: UUID) -> int:
+    """Sample key of a session's events"""
+    return int(hashlib.md5(str(session_id).encode()).hexdigest()[:8], 16) % SAMPLE_KEYS
+
+
+def sample_threshold(accuracy: Optional[float]) -> Optional[int]:
+    """
+    Sample keys to keep for a requested sampling fraction
+
+    Returns:
+        k (events with sample_key < k are read), or None for every event
+    """
+    if accuracy is None or accuracy >= 1:
+        return None
+    return min(max(1, round(accuracy * SAMPLE_KEYS)), SAMPLE_KEYS - 1)
@@ -0,0 +1,143 @@
+"""
+Sampling profiler - Wall-clock stack sampling of the event loop thread
+
+A background thread snapshots the target thread's Python stack at a fixed
+interval and counts identical stacks. The result is written in the
+"folded" (collapsed stack) format understood by flamegraph.pl, speedscope
+and inferno:
+
+    main (app/main.py:10);handler (app/routes/heatmaps.py:42) 17
+
+Samples cover everything running on the event loop while the profile is
+active, so concurrent requests on the same worker show up as well.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from app.config import settings
+
+
+def _frame_label(frame) -> str:
+    """Label for one stack frame (no ';' so the folded format stays valid)"""
+    code = frame.f_code
+    filename = code.co_filename
+    marker = f"{os.sep}app{os.sep}"
+    if marker in filename:
+        filename = "app" + os.sep + filename.split(marker, 1)[1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Samples one thread's stack until stopped"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self.duration = 0.0
+
+    def start(self) -> None:
+        """Start sampling in a daemon thread"""
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started_at
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def folded(self) -> str:
+        """Collapsed stacks, one "stack count" line per distinct stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    async def save(self, profile_id: str) -> None:
+        """Write the profile to PROFILING_OUTPUT_DIR, off the event loop"""
+        await asyncio.to_thread(write_profile, profile_id, self.folded())
+
+
+def new_profile_id(method: str, path: str) -> str:
+    """Unique, file-name-safe profile ID for a request"""
+    slug = "".join(c if c.isalnum() or c in "-_" else "_" for c in path.strip("/")) or "root"
+    return f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{method.lower()}-{slug}"
+
+
+def profile_file(profile_id: str) -> str:
+    """Path of a stored profile"""
+    return os.path.join(settings.PROFILING_OUTPUT_DIR, f"{profile_id}.folded")
+
+
+def write_profile(profile_id: str, folded: str) -> None:
+    """Store a folded profile (blocking)"""
+    os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+    with open(profile_file(profile_id), "w", encoding="utf-8") as f:
+        f.write(folded)
+
+
+def read_profile(profile_id: str) -> Optional[str]:
+    """A stored folded profile, or None if there is none (blocking)"""
+    try:
+        with open(profile_file(profile_id), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def sign_profile_request(path: str, expires: int) -> str:
+    """
+    Build an X-Profile-Request header value for a path
+
+    Args:
+        path: Request path to profile (e.g. /api/v1/heatmaps/mouse-moves)
+        expires: Unix timestamp after which the signature is rejected
+
+    Returns:
+        "<expires>.<hex signature>"
+    """
+    signature = hmac.new(
+        settings.PROFILING_SECRET.encode("utf-8"),
+        f"{expires}:{path}".encode("utf-8"),
+        hashlib.sha256,
+    ).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify_profile_request(value: str, path: str) -> bool:
+    """Check an X-Profile-Request header value"""
+    if not settings.PROFILING_SECRET:
+        return False
+    try:
+        expires_str, _ = value.split(".", 1)
+        expires = int(expires_str)
+    except ValueError:
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(value, sign_profile_request(path, expires))
@@ -0,0 +1,217 @@
+"""
+Audience segments - Session attributes denormalized onto event rows
+
+Click and mouse move events carry the device type, browser and
+new-vs-returning flag of their session, copied at ingest, so segment
+filters on heatmaps are answered from the event table (and its
+(page_id, device_type, browser, timestamp) / (page_id, is_returning,
+timestamp) indexes) without joining sessions or users.
+
+A session's attributes (and its user, which the unique-user sketches of
+app.services.user_sketches need) never change once it has started, so
+ingest looks them up through a process-wide LRU; a batch costs at most
+one query.
+A session is returning when its user has an earlier session.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from uuid import UUID
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import ColumnElement, Select, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.config import settings
+from app.models.session import Session
+from app.services.breakpoints import validate_breakpoint
+from app.services.metrics import record_cache_lookup
+from app.services.sampling import SAMPLE_KEYS, sample_threshold
+
+
+def normalize(value: Optional[str]) -> Optional[str]:
+    """Case-insensitive form stored on events and used by filters"""
+    if value is None:
+        return None
+    return value.strip().lower() or None
+
+
+class SessionSegment(NamedTuple):
+    """Attributes copied from a session onto its events"""
+
+    user_id: UUID
+    device_type: Optional[str]
+    browser: Optional[str]
+    is_returning: bool
+
+
+class SessionSegmentCache:
+    """Count-bounded LRU of session segments"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[UUID, SessionSegment]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, session_id: UUID) -> Optional[SessionSegment]:
+        segment = self._entries.get(session_id)
+        if segment is not None:
+            self._entries.move_to_end(session_id)
+        return segment
+
+    def put(self, session_id: UUID, segment: SessionSegment) -> None:
+        self._entries[session_id] = segment
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Global instance
+session_segments = SessionSegmentCache(max_entries=settings.SESSION_SEGMENT_CACHE_MAX_ENTRIES)
+
+
+async def session_segment(db: AsyncSession, session_id: UUID) -> SessionSegment:
+    """Segment of a session, from the cache or one query; 404 for unknown sessions"""
+    segment = session_segments.get(session_id)
+    record_cache_lookup("session_segments", segment is not None)
+    if segment is not None:
+        return segment
+
+    earlier = aliased(Session)
+    returning = exists().where(
+        earlier.user_id == Session.user_id,
+        earlier.session_start < Session.session_start,
+    )
+    result = await db.execute(
+        select(
+            Session.user_id,
+            Session.device_type,
+            Session.browser,
+            returning.label("is_returning"),
+        ).where(Session.id == session_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": {
+                    "code": "NOT_FOUND",
+                    "message": f"Session {session_id} not found",
+                }
+            },
+        )
+
+    segment = SessionSegment(
+        row.user_id, normalize(row.device_type), normalize(row.browser), row.is_returning
+    )
+    session_segments.put(session_id, segment)
+    return segment
+
+
+class EventFilters(NamedTuple):
+    """Per-event filters shared by the point heatmap endpoints"""
+
+    breakpoint: Optional[str] = None
+    device_type: Optional[str] = None
+    browser: Optional[str] = None
+    returning: Optional[bool] = None
+    sample_below: Optional[int] = None  # Session sample (app.services.sampling)
+
+    @property
+    def sampling_rate(self) -> float:
+        """Fraction of sessions read"""
+        return 1.0 if self.sample_below is None else self.sample_below / SAMPLE_KEYS
+
+    def scaled(self, count: ColumnElement) -> ColumnElement:
+        """A count over the filtered events, scaled back up to all sessions when sampled"""
+        if self.sample_below is None:
+            return count
+        return (count * SAMPLE_KEYS + self.sample_below // 2) // self.sample_below
+
+    def conditions(self, model) -> List[ColumnElement]:
+        """The set filters as conditions on model's columns"""
+        conditions = []
+        if self.breakpoint:
+            conditions.append(model.breakpoint == self.breakpoint)
+        if self.device_type:
+            conditions.append(model.device_type == self.device_type)
+        if self.browser:
+            conditions.append(model.browser == self.browser)
+        if self.returning is not None:
+            conditions.append(model.is_returning == self.returning)
+        if self.sample_below is not None:
+            conditions.append(model.sample_key < self.sample_below)
+        return conditions
+
+    def apply(self, query: Select, model) -> Select:
+        """Add the set filters to a query on model"""
+        conditions = self.conditions(model)
+        return query.where(*conditions) if conditions else query
+
+    def cache_params(self) -> Dict[str, Any]:
+        """Set filters, for cache keys"""
+        return {name: value for name, value in self._asdict().items() if value is not None}
+
+
+NO_FILTERS = EventFilters()
+
+
+def event_filters(
+    breakpoint: Optional[str] = Query(
+        None, description="Only events from this viewport breakpoint"
+    ),
+    device_type: Optional[str] = Query(
+        None, description="Only events from sessions on this device type (case-insensitive)"
+    ),
+    browser: Optional[str] = Query(
+        None, description="Only events from sessions in this browser (case-insensitive)"
+    ),
+    returning: Optional[bool] = Query(
+        None, description="Only events from returning (true) or first-time (false) visitors"
+    ),
+    accuracy: float = Query(
+        1.0,
+        gt=0.0,
+        le=1.0,
+        description="Fraction of sessions to read (1 = exact); counts are scaled back up",
+    ),
+) -> EventFilters:
+    """Dependency parsing and validating the event filter parameters"""
+    return EventFilters(
+        validate_breakpoint(breakpoint),
+        normalize(device_type),
+        normalize(browser),
+        returning,
+        sample_threshold(accuracy),
+    )
+
+
+def prefixed_event_filters(prefix: str) -> Callable[..., EventFilters]:
+    """
+    Dependency for a second set of event filters under prefixed names
+
+    E.g. prefixed_event_filters("a") reads a_breakpoint, a_device_type,
+    a_browser and a_returning (sampling is left to the caller).
+    """
+
+    def dependency(
+        breakpoint: Optional[str] = Query(None, alias=f"{prefix}_breakpoint"),
+        device_type: Optional[str] = Query(None, alias=f"{prefix}_device_type"),
+        browser: Optional[str] = Query(None, alias=f"{prefix}_browser"),
+        returning: Optional[bool] = Query(None, alias=f"{prefix}_returning"),
+    ) -> EventFilters:
+        return EventFilters(
+            validate_breakpoint(breakpoint),
+            normalize(device_type),
+            normalize(browser),
+            returning,
+        )
+
+    return dependency
@@ -0,0 +1,535 @@
+"""
+Shared result cache - Second-level cache for aggregate results across instances
+
+The in-process cache (app.services.heatmap_cache) only helps the instance
+that computed a result. This module stores the same serialized results in a
+backend every instance can reach:
+
+- postgres: UNLOGGED result_cache table, invalidations via LISTEN/NOTIFY
+- redis: any Redis-protocol server (Redis, Valkey, KeyDB, ...), invalidations
+  via PUBLISH/SUBSCRIBE
+- memory: in-process stand-in with the same interface, for tests and local
+  development (instances in one process share its store and channel)
+
+Values are "<flag><version>\\n<body>" where the flag says whether the body
+is zlib-compressed. Invalidations are (scope, watermark) pairs: event
+endpoints bump a page's or funnel's ingest watermark locally, the bumps are
+coalesced and published every RESULT_CACHE_NOTIFY_INTERVAL_MS, and every
+instance applies them to its own watermarks. Backend errors and timeouts
+are logged and treated as cache misses; they never fail a request.
+
+While an instance is not subscribed to invalidations (e.g. its listener
+connection dropped and is reconnecting) it cannot tell stale entries from
+current ones, so it skips shared cache reads; once subscribed again it
+treats every scope as changed (on_resync), since bumps may have been missed.
+"""
+
+import asyncio
+import logging
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+import asyncpg
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+from app.models.result_cache_entry import ResultCacheEntry
+
+logger = logging.getLogger(__name__)
+
+InvalidationHandler = Callable[[str, float], None]
+
+_RAW = b"0"
+_ZLIB = b"1"
+# pg_notify payloads must stay below 8000 bytes
+_MAX_MESSAGE_BYTES = 7000
+
+
+def encode_entry(version: str, body: bytes, compress_min_bytes: int) -> bytes:
+    """Serialize a cached body with its version, compressing large bodies"""
+    if len(body) >= compress_min_bytes:
+        return _ZLIB + version.encode() + b"\n" + zlib.compress(body, 6)
+    return _RAW + version.encode() + b"\n" + body
+
+
+def decode_entry(value: bytes) -> Tuple[str, bytes]:
+    """Inverse of encode_entry"""
+    flag, rest = value[:1], value[1:]
+    version, _, body = rest.partition(b"\n")
+    if flag == _ZLIB:
+        body = zlib.decompress(body)
+    return version.decode(), body
+
+
+def encode_invalidations(pending: Dict[str, float]) -> List[str]:
+    """Pack (scope, watermark) pairs into notification payloads"""
+    messages = []
+    current: List[str] = []
+    size = 0
+    for scope, watermark in pending.items():
+        item = f"{scope}={watermark:.6f}"
+        if current and size + len(item) + 1 > _MAX_MESSAGE_BYTES:
+            messages.append(",".join(current))
+            current, size = [], 0
+        current.append(item)
+        size += len(item) + 1
+    if current:
+        messages.append(",".join(current))
+    return messages
+
+
+def decode_invalidations(message: str) -> List[Tuple[str, float]]:
+    """Inverse of encode_invalidations; malformed items are skipped"""
+    pairs = []
+    for item in message.split(","):
+        scope, _, watermark = item.partition("=")
+        try:
+            pairs.append((scope, float(watermark)))
+        except ValueError:
+            logger.warning("Ignoring malformed cache invalidation: %r", item)
+    return pairs
+
+
+class CacheBackend:
+    """Storage and messaging primitives a shared cache backend provides"""
+
+    # Whether channel messages are currently being delivered
+    listening = False
+
+    async def start(self, on_message: Callable[[str], None], on_resync: Callable[[], None]) -> None:
+        """
+        Open connections and start delivering channel messages
+
+        on_resync is called whenever the subscription is established again
+        after a gap in which messages may have been lost.
+        """
+
+    async def stop(self) -> None:
+        """Close connections"""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        raise NotImplementedError
+
+    async def publish(self, message: str) -> None:
+        raise NotImplementedError
+
+    async def purge_expired(self) -> None:
+        """Drop expired entries (backends without native TTLs)"""
+
+
+class MemoryBackend(CacheBackend):
+    """In-process stand-in for a Redis-protocol server"""
+
+    _store: Dict[str, Tuple[float, bytes]] = {}
+    _subscribers: List[Callable[[str], None]] = []
+
+    def __init__(self):
+        self._on_message: Optional[Callable[[str], None]] = None
+
+    async def start(self, on_message: Callable[[str], None], on_resync: Callable[[], None]) -> None:
+        self._on_message = on_message
+        self._subscribers.append(on_message)
+        self.listening = True
+
+    async def stop(self) -> None:
+        self.listening = False
+        if self._on_message in self._subscribers:
+            self._subscribers.remove(self._on_message)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._store.get(key)
+        if item is None or item[0] < time.monotonic():
+            return None
+        return item[1]
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._store[key] = (time.monotonic() + ttl, value)
+
+    async def publish(self, message: str) -> None:
+        for subscriber in list(self._subscribers):
+            subscriber(message)
+
+    async def purge_expired(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._store.items() if expires < now]:
+            self._store.pop(key, None)
+
+
+class PostgresBackend(CacheBackend):
+    """UNLOGGED result_cache table plus LISTEN/NOTIFY"""
+
+    def __init__(self, engine, channel: str):
+        self.engine = engine
+        self.channel = channel
+        self._listener_task: Optional[asyncio.Task] = None
+
+    async def start(self, on_message: Callable[[str], None], on_resync: Callable[[], None]) -> None:
+        self._listener_task = asyncio.create_task(self._listen(on_message, on_resync))
+
+    async def stop(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            await asyncio.gather(self._listener_task, return_exceptions=True)
+            self._listener_task = None
+
+    async def _listen(
+        self, on_message: Callable[[str], None], on_resync: Callable[[], None]
+    ) -> None:
+        """Dedicated LISTEN connection, reconnecting with backoff"""
+        url = make_url(self.engine.url).set(drivername="postgresql")
+        delay = 0.5
+        first = True
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(url.render_as_string(hide_password=False))
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                await conn.add_listener(
+                    self.channel, lambda _conn, _pid, _channel, payload: on_message(payload)
+                )
+                self.listening = True
+                if not first:
+                    on_resync()
+                first, delay = False, 0.5
+                # Notifications arrive on the connection's protocol; wait for it to drop
+                while not closed.is_set() and not conn.is_closed():
+                    try:
+                        await asyncio.wait_for(closed.wait(), 5.0)
+                    except asyncio.TimeoutError:
+                        await conn.execute("SELECT 1", timeout=5.0)  # Detects half-open links
+                raise ConnectionError("listener connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.listening = False
+                first = False
+                logger.warning("Result cache listener disconnected: %s", e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            finally:
+                self.listening = False
+                if conn is not None and not conn.is_closed():
+                    conn.terminate()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        stmt = select(ResultCacheEntry.value).where(
+            ResultCacheEntry.key == key,
+            ResultCacheEntry.expires_at > datetime.utcnow(),
+        )
+        async with self.engine.connect() as conn:
+            result = await conn.execute(stmt)
+            return result.scalar_one_or_none()
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        stmt = insert(ResultCacheEntry).values(key=key, value=value, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ResultCacheEntry.key],
+            set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at},
+        )
+        async with self.engine.begin() as conn:
+            await conn.execute(stmt)
+
+    async def publish(self, message: str) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(select(func.pg_notify(self.channel, message)))
+
+    async def purge_expired(self) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                delete(ResultCacheEntry).where(ResultCacheEntry.expires_at <= datetime.utcnow())
+            )
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+class _RespConnection:
+    """Minimal RESP2 client connection (one command in flight at a time)"""
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._call("AUTH", self.password)
+        if self.db:
+            await self._call("SELECT", str(self.db))
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def execute(self, *args: Any) -> Any:
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await self.connect()
+                return await self._call(*args)
+            except BaseException:
+                # Including cancellation (e.g. a timeout) mid-reply: the rest of
+                # the reply would answer the next command, so start over
+                self.close()
+                raise
+
+    async def send(self, *args: Any) -> None:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._writer.write(b"".join(parts))
+        await self._writer.drain()
+
+    async def read_reply(self) -> Any:
+        line = await self._reader.readuntil(b"\r\n")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RespError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            return (await self._reader.readexactly(length + 2))[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await self.read_reply() for _ in range(length)]
+        raise RespError(f"Unexpected reply type: {line!r}")
+
+    async def _call(self, *args: Any) -> Any:
+        await self.send(*args)
+        return await self.read_reply()
+
+
+class RedisBackend(CacheBackend):
+    """Any Redis-protocol server; PUBLISH/SUBSCRIBE for invalidations"""
+
+    def __init__(self, url: str, channel: str, key_prefix: str = "result_cache:"):
+        self.url = url
+        self.channel = channel
+        self.key_prefix = key_prefix
+        self._conn = _RespConnection(url)
+        self._subscriber_task: Optional[asyncio.Task] = None
+
+    async def start(self, on_message: Callable[[str], None], on_resync: Callable[[], None]) -> None:
+        self._subscriber_task = asyncio.create_task(self._subscribe(on_message, on_resync))
+
+    async def stop(self) -> None:
+        if self._subscriber_task is not None:
+            self._subscriber_task.cancel()
+            await asyncio.gather(self._subscriber_task, return_exceptions=True)
+        self._conn.close()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        reply = await self._conn.execute("GET", self.key_prefix + key)
+        if reply is not None and not isinstance(reply, bytes):
+            raise RespError(f"Unexpected reply to GET: {reply!r}")
+        return reply
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self._conn.execute("SET", self.key_prefix + key, value, "EX", ttl)
+
+    async def publish(self, message: str) -> None:
+        await self._conn.execute("PUBLISH", self.channel, message)
+
+    async def _subscribe(
+        self, on_message: Callable[[str], None], on_resync: Callable[[], None]
+    ) -> None:
+        """Dedicated subscriber connection, reconnecting with backoff"""
+        delay = 0.5
+        first = True
+        while True:
+            conn = _RespConnection(self.url)
+            try:
+                await conn.connect()
+                await conn.send("SUBSCRIBE", self.channel)
+                while True:
+                    reply = await conn.read_reply()
+                    if not isinstance(reply, list) or not reply:
+                        continue
+                    if reply[0] == b"subscribe":
+                        self.listening = True
+                        if not first:
+                            on_resync()
+                        first, delay = False, 0.5
+                    elif reply[0] == b"message":
+                        on_message(reply[2].decode())
+            except asyncio.CancelledError:
+                raise
+            except (OSError, asyncio.IncompleteReadError, RespError) as e:
+                self.listening = False
+                first = False
+                logger.warning("Result cache subscriber disconnected: %s", e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            finally:
+                self.listening = False
+                conn.close()
+
+
+class SharedCache:
+    """
+    Versioned, compressed results in a shared backend
+
+    get/set never raise: failures and slow backends count as misses.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        compress_min_bytes: int,
+        timeout: float,
+        notify_interval: float,
+    ):
+        self.backend = backend
+        self.compress_min_bytes = compress_min_bytes
+        self.timeout = timeout
+        self.notify_interval = notify_interval
+        self._on_invalidate: Optional[InvalidationHandler] = None
+        self._on_resync: Optional[Callable[[], None]] = None
+        self._pending: Dict[str, float] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._writes: Set[asyncio.Task] = set()
+
+    async def start(
+        self, on_invalidate: InvalidationHandler, on_resync: Optional[Callable[[], None]] = None
+    ) -> None:
+        """
+        Subscribe to invalidations and start publishing local ones
+
+        Args:
+            on_invalidate: Applies a (scope, watermark) bump from another instance
+            on_resync: Called after reconnecting, when bumps may have been missed
+        """
+        self._on_invalidate = on_invalidate
+        self._on_resync = on_resync
+        await self.backend.start(self._handle_message, self._handle_resync)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+        await self.backend.stop()
+
+    async def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        """(version, body) stored for key, or None"""
+        if not self.backend.listening:
+            return None  # Missed invalidations would go unnoticed
+        try:
+            value = await asyncio.wait_for(self.backend.get(key), self.timeout)
+            if value is None:
+                return None
+            if not isinstance(value, (bytes, bytearray, memoryview)):
+                raise TypeError(f"unexpected value type {type(value).__name__}")
+            return decode_entry(bytes(value))
+        except Exception as e:
+            logger.warning("Result cache get failed: %s", e)
+            return None
+
+    def set(self, key: str, version: str, body: bytes, ttl: int) -> None:
+        """Store in the background so the response is not delayed"""
+        value = encode_entry(version, body, self.compress_min_bytes)
+        task = asyncio.create_task(self._write(key, value, ttl))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    def invalidate(self, scope: str, watermark: float) -> None:
+        """Queue a watermark bump for publication to other instances"""
+        self._pending[scope] = max(watermark, self._pending.get(scope, 0.0))
+
+    async def _write(self, key: str, value: bytes, ttl: int) -> None:
+        try:
+            await asyncio.wait_for(self.backend.set(key, value, ttl), self.timeout * 10)
+        except Exception as e:
+            logger.warning("Result cache set failed: %s", e)
+
+    def _handle_resync(self) -> None:
+        logger.info("Result cache resubscribed; treating all scopes as changed")
+        if self._on_resync is not None:
+            self._on_resync()
+
+    def _handle_message(self, message: str) -> None:
+        if self._on_invalidate is None:
+            return
+        for scope, watermark in decode_invalidations(message):
+            self._on_invalidate(scope, watermark)
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        for message in encode_invalidations(pending):
+            try:
+                await self.backend.publish(message)
+            except Exception as e:
+                logger.warning("Result cache invalidation publish failed: %s", e)
+
+    async def _flush_loop(self) -> None:
+        last_purge = time.monotonic()
+        while True:
+            await asyncio.sleep(self.notify_interval)
+            await self._flush()
+            if time.monotonic() - last_purge >= 300:
+                last_purge = time.monotonic()
+                try:
+                    await self.backend.purge_expired()
+                except Exception as e:
+                    logger.warning("Result cache purge failed: %s", e)
+
+
+def create_backend(name: str) -> CacheBackend:
+    """Backend for a RESULT_CACHE_BACKEND setting value"""
+    if name == "postgres":
+        from app.database import analytics_engine
+
+        return PostgresBackend(analytics_engine, settings.RESULT_CACHE_CHANNEL)
+    if name == "redis":
+        return RedisBackend(settings.RESULT_CACHE_REDIS_URL, settings.RESULT_CACHE_CHANNEL)
+    if name == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown RESULT_CACHE_BACKEND: {name!r}")
+
+
+def create_shared_cache() -> Optional[SharedCache]:
+    """Shared cache configured by settings, or None when disabled"""
+    if not settings.RESULT_CACHE_BACKEND:
+        return None
+    return SharedCache(
+        create_backend(settings.RESULT_CACHE_BACKEND),
+        compress_min_bytes=settings.RESULT_CACHE_COMPRESS_MIN_BYTES,
+        timeout=settings.RESULT_CACHE_TIMEOUT_MS / 1000.0,
+        notify_interval=settings.RESULT_CACHE_NOTIFY_INTERVAL_MS / 1000.0,
+    )
+
+
+# Global instance (None when RESULT_CACHE_BACKEND is empty)
+shared_cache = create_shared_cache()
@@ -0,0 +1,65 @@
+"""
+Singleflight - Coalesce identical concurrent computations in one process
+
+Callers asking for the same key while a computation is in flight await
+that computation instead of starting their own. The computation runs in
+its own task, so a caller that is cancelled (e.g. its client disconnected)
+does not cancel it for the others; it is only cancelled once every caller
+has gone away.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.services.metrics import record_cache_lookup
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Per-key deduplication of concurrent async computations"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn() for key, or join the run already in flight
+
+        Args:
+            key: Identity of the computation (normalized parameters)
+            fn: Coroutine factory, only called when no run is in flight
+
+        Returns:
+            The (shared) result; exceptions are shared the same way
+        """
+        flight = self._flights.get(key)
+        record_cache_lookup(self.name, flight is not None)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller is gone: stop the work and let new callers start afresh
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,54 @@
+"""
+Page URLs - Normalization applied when pages are created and looked up
+
+Pages are keyed by URL, so variants of one address would otherwise split
+its events over several pages. normalize_url lower-cases the scheme and
+host, drops default ports and fragments, and strips the tracking
+parameters in URL_TRACKING_PARAMS (campaign tags, click ids), keeping the
+path and the remaining parameters as sent.
+"""
+
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+from app.config import settings
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    for pattern in settings.URL_TRACKING_PARAMS:
+        if pattern.endswith("*"):
+            if name.startswith(pattern[:-1]):
+                return True
+        elif name == pattern:
+            return True
+    return False
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a page URL"""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    if not parts.netloc:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    userinfo = parts.netloc.rpartition("@")[0]
+    netloc = f"{userinfo}@{host}" if userinfo else host
+
+    query = parts.query
+    if query:
+        params = parse_qsl(query, keep_blank_values=True)
+        kept = [(name, value) for name, value in params if not is_tracking_param(name)]
+        if len(kept) != len(params):
+            query = urlencode(kept, quote_via=quote)
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
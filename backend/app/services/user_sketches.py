@@ -0,0 +1,439 @@
+"""
+User sketches - Per-day HyperLogLog sketches for approximate unique-user counts
+
+Unique users behind scroll depths and funnel steps are kept as one
+HyperLogLog sketch (app.services.hll) per scope, metric and day:
+
+- page scopes: "scroll:<d>" for every d in SCROLL_DEPTHS, the users with a
+  scroll event at depth_percent >= d (d = 0 is everyone who scrolled)
+- funnel step scopes: "entered" (any event) and "completed" (completed
+  events)
+
+Event endpoints add users to an in-process buffer; a background task
+merges it into user_sketches every USER_SKETCH_FLUSH_INTERVAL_SECONDS and
+builds the sketches of days in the backfill window that predate the
+buffer from the raw events. Merging is an element-wise maximum, so a day
+rebuilt from raw events while live events are flushed into it is never
+double counted. Approximate reads merge the stored sketches of the days
+in a range, so they trail ingest by up to one flush interval and cover
+whole days; days without built sketches are sketched from their raw
+events at read time.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import DefaultDict, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import ColumnElement, and_, bindparam, func, or_, select, true, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.config import settings
+from app.database import admin_engine
+from app.models.funnel_event import FunnelEvent
+from app.models.scroll_event import ScrollEvent
+from app.models.session import Session
+from app.models.user_sketch import UserSketch, UserSketchBuild
+from app.services import hll
+from app.services.heatmap_cache import to_utc_naive
+
+logger = logging.getLogger(__name__)
+
+# Scroll depth thresholds reported by the scroll heatmap
+SCROLL_DEPTHS = (0, 25, 50, 75, 100)
+
+ENTERED = "entered"
+COMPLETED = "completed"
+
+# pg_try_advisory_lock key so only one instance builds days at a time
+BUILD_LOCK_ID = 0x686D_6C6C  # "hmll"
+
+SketchKey = Tuple[UUID, str, date]
+
+
+def scroll_metric(depth: int) -> str:
+    return f"scroll:{depth}"
+
+
+def error_bound() -> float:
+    """Relative standard error reported with approximate counts"""
+    return round(hll.relative_error(settings.USER_SKETCH_PRECISION), 4)
+
+
+class SketchBuffer:
+    """Sketches of events ingested since the last flush"""
+
+    def __init__(self, precision: int):
+        self.precision = precision
+        self._pending: Dict[SketchKey, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, scope_id: UUID, metric: str, timestamp: datetime, user_id: UUID) -> None:
+        key = (scope_id, metric, to_utc_naive(timestamp).date())
+        registers = self._pending.get(key)
+        if registers is None:
+            registers = self._pending[key] = hll.empty(self.precision)
+        hll.add(registers, user_id)
+
+    def take(self) -> Dict[SketchKey, np.ndarray]:
+        """Remove and return everything buffered"""
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, sketches: Dict[SketchKey, np.ndarray]) -> None:
+        """Put back sketches whose flush failed"""
+        for key, registers in sketches.items():
+            current = self._pending.get(key)
+            self._pending[key] = registers if current is None else hll.merge([current, registers])
+
+
+# Global instance
+sketch_buffer = SketchBuffer(precision=settings.USER_SKETCH_PRECISION)
+
+
+def record_scroll_events(
+    page_id: UUID, user_id: UUID, events: Iterable[Tuple[int, datetime]]
+) -> None:
+    """Add a user's scroll events (depth_percent, timestamp) to the page's sketches"""
+    if not settings.USER_SKETCHES_ENABLED:
+        return
+    for depth_percent, timestamp in events:
+        for depth in SCROLL_DEPTHS:
+            if depth_percent >= depth:
+                sketch_buffer.add(page_id, scroll_metric(depth), timestamp, user_id)
+
+
+def record_funnel_event(
+    funnel_step_id: UUID, user_id: UUID, completed: bool, timestamp: datetime
+) -> None:
+    """Add a funnel event's user to the step's sketches"""
+    if not settings.USER_SKETCHES_ENABLED:
+        return
+    sketch_buffer.add(funnel_step_id, ENTERED, timestamp, user_id)
+    if completed:
+        sketch_buffer.add(funnel_step_id, COMPLETED, timestamp, user_id)
+
+
+async def merge_sketches(conn: AsyncConnection, sketches: Dict[SketchKey, np.ndarray]) -> None:
+    """
+    Merge sketches into user_sketches (caller commits)
+
+    New rows are inserted as is; existing rows are locked (in key order, so
+    concurrent merges cannot deadlock) and replaced by the union.
+    """
+    now = datetime.utcnow()
+    keys = sorted(sketches)
+    for offset in range(0, len(keys), 1000):
+        chunk = keys[offset : offset + 1000]
+        inserted = set(
+            (
+                await conn.execute(
+                    insert(UserSketch)
+                    .values(
+                        [
+                            {
+                                "scope_id": scope_id,
+                                "metric": metric,
+                                "day": day,
+                                "registers": hll.to_bytes(sketches[(scope_id, metric, day)]),
+                                "updated_at": now,
+                            }
+                            for scope_id, metric, day in chunk
+                        ]
+                    )
+                    .on_conflict_do_nothing()
+                    .returning(UserSketch.scope_id, UserSketch.metric, UserSketch.day)
+                )
+            ).all()
+        )
+        existing = [key for key in chunk if key not in inserted]
+        if not existing:
+            continue
+
+        rows = await conn.execute(
+            select(UserSketch.scope_id, UserSketch.metric, UserSketch.day, UserSketch.registers)
+            .where(tuple_(UserSketch.scope_id, UserSketch.metric, UserSketch.day).in_(existing))
+            .order_by(UserSketch.scope_id, UserSketch.metric, UserSketch.day)
+            .with_for_update()
+        )
+        updates = []
+        for scope_id, metric, day, stored in rows.all():
+            registers = sketches[(scope_id, metric, day)]
+            stored = hll.from_bytes(stored)
+            if len(stored) == len(registers):  # Else: precision changed, start over
+                registers = hll.merge([stored, registers])
+            updates.append(
+                {
+                    "b_scope_id": scope_id,
+                    "b_metric": metric,
+                    "b_day": day,
+                    "b_registers": hll.to_bytes(registers),
+                    "b_updated_at": now,
+                }
+            )
+        await conn.execute(
+            update(UserSketch)
+            .where(
+                UserSketch.scope_id == bindparam("b_scope_id"),
+                UserSketch.metric == bindparam("b_metric"),
+                UserSketch.day == bindparam("b_day"),
+            )
+            .values(registers=bindparam("b_registers"), updated_at=bindparam("b_updated_at"))
+            .execution_options(synchronize_session=None),
+            updates,
+        )
+
+
+async def flush_sketches() -> int:
+    """Merge the buffer into user_sketches; returns the number of sketches written"""
+    pending = sketch_buffer.take()
+    if not pending:
+        return 0
+    try:
+        async with admin_engine.begin() as conn:
+            await merge_sketches(conn, pending)
+    except BaseException:
+        sketch_buffer.restore(pending)
+        raise
+    return len(pending)
+
+
+def _day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+
+Hashes = DefaultDict[Tuple[UUID, str], List[int]]
+
+
+async def hash_scroll_users(
+    db: Union[AsyncConnection, AsyncSession], hashes: Hashes, *conditions: ColumnElement
+) -> None:
+    """Add the hashed users behind the matching scroll events to hashes, per page and depth"""
+    scrolls = await db.stream(
+        select(ScrollEvent.page_id, Session.user_id, func.max(ScrollEvent.depth_percent))
+        .join(Session, ScrollEvent.session_id == Session.id)
+        .where(*conditions)
+        .group_by(ScrollEvent.page_id, Session.user_id)
+        .execution_options(yield_per=10000)
+    )
+    async for page_id, user_id, max_depth in scrolls:
+        hashed = hll.hash_uuid(user_id)
+        for depth in SCROLL_DEPTHS:
+            if max_depth >= depth:
+                hashes[(page_id, scroll_metric(depth))].append(hashed)
+
+
+async def hash_funnel_users(
+    db: Union[AsyncConnection, AsyncSession], hashes: Hashes, *conditions: ColumnElement
+) -> None:
+    """Add the hashed users behind the matching funnel events to hashes, per step"""
+    funnel_events = await db.stream(
+        select(
+            FunnelEvent.funnel_step_id,
+            FunnelEvent.user_id,
+            func.bool_or(FunnelEvent.completed),
+        )
+        .where(*conditions)
+        .group_by(FunnelEvent.funnel_step_id, FunnelEvent.user_id)
+        .execution_options(yield_per=10000)
+    )
+    async for step_id, user_id, completed in funnel_events:
+        hashed = hll.hash_uuid(user_id)
+        hashes[(step_id, ENTERED)].append(hashed)
+        if completed:
+            hashes[(step_id, COMPLETED)].append(hashed)
+
+
+def sketch_hashes(values: List[int]) -> np.ndarray:
+    registers = hll.empty(settings.USER_SKETCH_PRECISION)
+    hll.add_hashes(registers, np.array(values, dtype=np.uint64))
+    return registers
+
+
+async def build_day(conn: AsyncConnection, day: date) -> None:
+    """Build (merge in) one day's sketches from the raw scroll and funnel events"""
+    start, end = _day_bounds(day)
+    hashes: Hashes = defaultdict(list)
+    await hash_scroll_users(
+        conn, hashes, ScrollEvent.timestamp >= start, ScrollEvent.timestamp < end
+    )
+    await hash_funnel_users(
+        conn, hashes, FunnelEvent.timestamp >= start, FunnelEvent.timestamp < end
+    )
+
+    sketches = {
+        (scope_id, metric, day): sketch_hashes(values)
+        for (scope_id, metric), values in hashes.items()
+    }
+    await merge_sketches(conn, sketches)
+
+    await conn.execute(
+        insert(UserSketchBuild).values(day=day, built_at=datetime.utcnow()).on_conflict_do_nothing()
+    )
+
+
+async def build_pending_days() -> int:
+    """
+    Build the days of the backfill window (up to today) not built yet
+
+    Returns:
+        Number of days built (0 if another instance holds the lock)
+    """
+    async with admin_engine.connect() as conn:
+        locked = await conn.scalar(select(func.pg_try_advisory_lock(BUILD_LOCK_ID)))
+        await conn.commit()
+        if not locked:
+            return 0
+        try:
+            today = datetime.utcnow().date()
+            first = today - timedelta(days=settings.USER_SKETCH_BACKFILL_DAYS)
+            done = set(
+                await conn.scalars(select(UserSketchBuild.day).where(UserSketchBuild.day >= first))
+            )
+            pending = [
+                first + timedelta(days=i)
+                for i in range((today - first).days + 1)
+                if first + timedelta(days=i) not in done
+            ]
+            for day in pending:
+                await build_day(conn, day)
+                await conn.commit()
+            if pending:
+                logger.info("Built user sketches for %d day(s)", len(pending))
+            return len(pending)
+        finally:
+            await conn.rollback()
+            await conn.execute(select(func.pg_advisory_unlock(BUILD_LOCK_ID)))
+            await conn.commit()
+
+
+async def run_user_sketches() -> None:
+    """Background loop started from the application lifespan"""
+    try:
+        while True:
+            try:
+                await build_pending_days()
+                await flush_sketches()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("User sketch maintenance failed")
+            await asyncio.sleep(settings.USER_SKETCH_FLUSH_INTERVAL_SECONDS)
+    finally:
+        try:
+            await flush_sketches()
+        except Exception:
+            logger.exception("Final user sketch flush failed")
+
+
+def unsketched_ranges(
+    built: Sequence[date], first: Optional[date], last: Optional[date]
+) -> List[Tuple[Optional[datetime], Optional[datetime]]]:
+    """
+    Timestamp ranges [start, end) covering the days from first to last
+    (None: unbounded) that have no built sketches
+
+    Args:
+        built: Built days within first..last, sorted
+    """
+    ranges = []
+    start = _day_bounds(first)[0] if first else None
+    for day in built:
+        day_start, day_end = _day_bounds(day)
+        if start is None or start < day_start:
+            ranges.append((start, day_start))
+        start = day_end
+    end = _day_bounds(last)[1] if last else None
+    if start is None or end is None or start < end:
+        ranges.append((start, end))
+    return ranges
+
+
+def _in_ranges(
+    column: ColumnElement, ranges: List[Tuple[Optional[datetime], Optional[datetime]]]
+) -> ColumnElement:
+    return or_(
+        *(
+            and_(
+                column >= start if start else true(),
+                column < end if end else true(),
+            )
+            for start, end in ranges
+        )
+    )
+
+
+async def unique_users(
+    db: AsyncSession,
+    scope_ids: Sequence[UUID],
+    metrics: Sequence[str],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    merge_as: Optional[UUID] = None,
+) -> Dict[Tuple[UUID, str], int]:
+    """
+    Estimated unique users per (scope, metric) over the days of a range
+
+    Days without built sketches (those before the backfill window, or not
+    built yet) are sketched from their raw events instead, so a range
+    reaching past the window is not undercounted; it just costs a scan of
+    the older part.
+
+    With merge_as, the scopes' sketches are merged and counted as that
+    single scope (e.g. the users of a page group's pages, each once).
+
+    Returns:
+        {(scope_id, metric): estimate}, 0 for pairs without sketches
+    """
+    first = start_date.date() if start_date else None
+    last = end_date.date() if end_date else None
+    query = select(UserSketch.scope_id, UserSketch.metric, UserSketch.registers).where(
+        UserSketch.scope_id.in_(scope_ids), UserSketch.metric.in_(metrics)
+    )
+    builds = select(UserSketchBuild.day).order_by(UserSketchBuild.day)
+    if first:
+        query = query.where(UserSketch.day >= first)
+        builds = builds.where(UserSketchBuild.day >= first)
+    if last:
+        query = query.where(UserSketch.day <= last)
+        builds = builds.where(UserSketchBuild.day <= last)
+
+    size = 1 << settings.USER_SKETCH_PRECISION
+    grouped: DefaultDict[Tuple[UUID, str], List[np.ndarray]] = defaultdict(list)
+    for scope_id, metric, registers in (await db.execute(query)).all():
+        if len(registers) == size:
+            grouped[(merge_as or scope_id, metric)].append(np.frombuffer(registers, dtype=np.uint8))
+
+    ranges = unsketched_ranges(list(await db.scalars(builds)), first, last)
+    if ranges:
+        hashes: Hashes = defaultdict(list)
+        if any(metric not in (ENTERED, COMPLETED) for metric in metrics):
+            await hash_scroll_users(
+                db,
+                hashes,
+                ScrollEvent.page_id.in_(scope_ids),
+                _in_ranges(ScrollEvent.timestamp, ranges),
+            )
+        if ENTERED in metrics or COMPLETED in metrics:
+            await hash_funnel_users(
+                db,
+                hashes,
+                FunnelEvent.funnel_step_id.in_(scope_ids),
+                _in_ranges(FunnelEvent.timestamp, ranges),
+            )
+        for (scope_id, metric), values in hashes.items():
+            if metric in metrics:
+                grouped[(merge_as or scope_id, metric)].append(sketch_hashes(values))
+
+    scope_ids = [merge_as] if merge_as else scope_ids
+    estimates = {(scope_id, metric): 0 for scope_id in scope_ids for metric in metrics}
+    for key, sketches in grouped.items():
+        estimates[key] = hll.estimate(hll.merge(sketches))
+    return estimates
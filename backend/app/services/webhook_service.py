@@ -5,6 +5,7 @@ Webhook service - Send webhooks with HMAC signature
 import hmac
 import hashlib
 import json
+import time
 from typing import Any, Dict
 from datetime import datetime
 from uuid import UUID
@@ -14,6 +15,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.webhook_config import WebhookConfig
 from app.models.webhook_log import WebhookLog
+from app.services.metrics import record_webhook_delivery
 
 
 class WebhookService:
@@ -81,6 +83,7 @@ class WebhookService:
             sent_at=datetime.utcnow(),
         )
 
+        start = time.perf_counter()
         try:
             async with httpx.AsyncClient(timeout=30.0) as client:
                 response = await client.post(
@@ -101,16 +104,21 @@ class WebhookService:
                 webhook_config.total_deliveries += 1
 
                 if response.status_code >= 400:
+                    record_webhook_delivery(
+                        "user_webhook", "http_error", time.perf_counter() - start
+                    )
                     webhook_config.failed_deliveries += 1
                     session.add(log)
                     await session.commit()
                     return False
 
+                record_webhook_delivery("user_webhook", "success", time.perf_counter() - start)
                 session.add(log)
                 await session.commit()
                 return True
 
         except Exception as e:
+            record_webhook_delivery("user_webhook", "error", time.perf_counter() - start)
             log.response_status = 0
             log.response_body = f"Error: {str(e)}"
 
@@ -0,0 +1,8 @@
+"""
+Backend performance benchmarks
+
+- traffic: synthetic tracking traffic generator
+- ingest: /sessions/* and /events/* throughput benchmark
+- seed: bulk COPY loader for realistic analytics datasets
+- analytics: heatmap/funnel query latency and plans vs. data size
+"""
@@ -0,0 +1,193 @@
+"""
+Analytical query benchmark - Heatmap and funnel endpoint latency vs. data size
+
+Times /heatmaps/clicks, /heatmaps/scrolls, /heatmaps/mouse-moves and
+/funnels/{id}/stats in-process across date-range widths for hot, median
+and long-tail pages of a dataset loaded by benchmarks.seed. The SQL each
+request ran is captured through the query profiler and re-run under
+EXPLAIN (ANALYZE, BUFFERS) so plans are stored next to the timings.
+
+Usage:
+    python -m benchmarks.analytics --api-key hm_xxx
+    python -m benchmarks.analytics --api-key hm_xxx --save-baseline
+
+Without --save-baseline the run is compared against
+benchmarks/baselines/analytics.json (exit code 1 on regressions).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.client import open_client
+from benchmarks.results import (
+    DEFAULT_RESULTS_DIR,
+    compare_latency,
+    latency_summary,
+    load_results,
+    print_comparison,
+    save_results,
+)
+from benchmarks.seed import DEFAULT_MANIFEST
+
+API_PREFIX = "/api/v1"
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, "analytics.json")
+EVENT_TABLES = ("click_events", "mouse_move_events", "scroll_events", "funnel_events")
+
+
+def _plan_summary(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Headline numbers from one EXPLAIN (FORMAT JSON) document"""
+    root = plan["Plan"]
+    return {
+        "node": root["Node Type"],
+        "planning_ms": plan.get("Planning Time"),
+        "execution_ms": plan.get("Execution Time"),
+        "shared_hit_blocks": root.get("Shared Hit Blocks"),
+        "shared_read_blocks": root.get("Shared Read Blocks"),
+        "temp_written_blocks": root.get("Temp Written Blocks"),
+    }
+
+
+async def explain(statements: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    """Run EXPLAIN (ANALYZE, BUFFERS) for captured statements touching event tables"""
+    from app.database import analytics_engine
+    from app.services.query_profiler import statement_shape
+
+    plans = []
+    async with analytics_engine.connect() as conn:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            if not any(table in statement for table in EVENT_TABLES):
+                continue
+            result = await conn.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters
+            )
+            document = result.scalar()
+            if isinstance(document, str):
+                document = json.loads(document)
+            plan = document[0]
+            plans.append(
+                {"statement": statement_shape(statement), **_plan_summary(plan), "plan": plan}
+            )
+        await conn.rollback()
+    return plans
+
+
+def build_cases(
+    manifest: Dict[str, Any], widths: List[int]
+) -> List[Tuple[str, str, Dict[str, str]]]:
+    """(key, path, query params) for every endpoint/page/width combination"""
+    end = datetime.fromisoformat(manifest["range"]["end"])
+    cases = []
+    for days in widths:
+        params = {
+            "start_date": (end - timedelta(days=days)).isoformat(),
+            "end_date": end.isoformat(),
+        }
+        for label, page_url in manifest["pages"].items():
+            for kind in ("clicks", "scrolls", "mouse-moves"):
+                cases.append(
+                    (
+                        f"heatmaps/{kind} page={label} range={days}d",
+                        f"{API_PREFIX}/heatmaps/{kind}",
+                        {"page_url": page_url, **params},
+                    )
+                )
+        for funnel_id in manifest["funnels"][:1]:
+            cases.append(
+                (f"funnels/stats range={days}d", f"{API_PREFIX}/funnels/{funnel_id}/stats", params)
+            )
+    return cases
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.database import analytics_engine
+    from app.services.query_profiler import capture_statements, install_query_profiler
+
+    install_query_profiler(analytics_engine.sync_engine)
+
+    with open(args.manifest, encoding="utf-8") as f:
+        manifest = json.load(f)
+    cases = build_cases(manifest, args.widths)
+
+    results: Dict[str, Any] = {}
+    async with open_client("asgi", api_key=args.api_key) as (client, _):
+        # Bypass response caches so every repetition runs the aggregation
+        headers = {"Cache-Control": "no-cache"}
+        for key, path, params in cases:
+            for _ in range(args.warmup):
+                await client.get(path, params=params, headers=headers)
+
+            latencies = []
+            statements: List[Tuple[str, Any]] = []
+            status_code = None
+            for repetition in range(args.repeat):
+                with capture_statements() as captured:
+                    t0 = time.perf_counter()
+                    response = await client.get(path, params=params, headers=headers)
+                    latencies.append(time.perf_counter() - t0)
+                status_code = response.status_code
+                if repetition == args.repeat - 1:
+                    statements = list(captured)
+
+            plans = await explain(statements) if args.explain else []
+            results[key] = {
+                "status": status_code,
+                "bytes": len(response.content),
+                "latency": latency_summary(latencies),
+                "plans": plans,
+            }
+            print(
+                f"{key:<50} {status_code} p50 {results[key]['latency']['p50_ms']:>9.2f} ms "
+                f"max {results[key]['latency']['max_ms']:>9.2f} ms  "
+                + "  ".join(f"{p['node']} {p['execution_ms']:.1f}ms" for p in plans)
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analytics endpoint benchmark")
+    parser.add_argument("--api-key", default=os.environ.get("BENCH_API_KEY", ""))
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument(
+        "--widths", type=int, nargs="+", default=[1, 7, 30, 90], help="Date-range widths in days"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--no-explain", dest="explain", action="store_false")
+    parser.add_argument("--output-dir", default=DEFAULT_RESULTS_DIR)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.20)
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("--api-key (or BENCH_API_KEY) is required")
+
+    results = asyncio.run(run(args))
+    parameters = {k: v for k, v in vars(args).items() if k != "api_key"}
+    path = save_results("analytics", results, parameters, args.output_dir)
+    print(f"Results written to {path}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(path, encoding="utf-8") as src, open(args.baseline, "w", encoding="utf-8") as dst:
+            dst.write(src.read())
+        print(f"Baseline updated: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        baseline = load_results(args.baseline)["results"]
+        rows = compare_latency(results, baseline, metric="p50_ms", tolerance=args.tolerance)
+        print_comparison(rows, "p50_ms")
+        if any(row["regressed"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
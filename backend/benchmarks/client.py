@@ -0,0 +1,169 @@
+"""
+Benchmark clients - In-process (ASGI) and HTTP targets plus DB connection probes
+"""
+
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
+
+import httpx
+
+POOL_CHECKED_OUT_RE = re.compile(r"^heatmap_db_pool_checked_out\{[^}]*\} (\d+)", re.MULTILINE)
+
+
+def checked_out_from_metrics(text: str) -> int:
+    """Sum checked-out connections over all pools in a /metrics payload"""
+    return sum(int(value) for value in POOL_CHECKED_OUT_RE.findall(text))
+
+
+class ConnectionProbe:
+    """Samples how many DB connections are in use"""
+
+    async def sample(self) -> Optional[int]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class InProcessPoolProbe(ConnectionProbe):
+    """Reads the app's pool gauges directly (ASGI mode)"""
+
+    async def sample(self) -> Optional[int]:
+        from app.services.metrics import registry
+
+        return checked_out_from_metrics(registry.render())
+
+
+class MetricsEndpointProbe(ConnectionProbe):
+    """Scrapes /metrics of a running server"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def sample(self) -> Optional[int]:
+        try:
+            response = await self.client.get("/metrics")
+        except httpx.HTTPError:
+            return None
+        return checked_out_from_metrics(response.text)
+
+
+class PgStatActivityProbe(ConnectionProbe):
+    """Counts server-side backends for the target database"""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn.replace("postgresql+asyncpg://", "postgresql://")
+        self.conn = None
+
+    async def sample(self) -> Optional[int]:
+        import asyncpg
+
+        if self.conn is None:
+            self.conn = await asyncpg.connect(self.dsn)
+        return await self.conn.fetchval(
+            "SELECT count(*) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND pid <> pg_backend_pid()"
+        )
+
+    async def close(self) -> None:
+        if self.conn is not None:
+            await self.conn.close()
+
+
+class ProbeSampler:
+    """Samples a probe on an interval in the background"""
+
+    def __init__(self, probe: ConnectionProbe, interval: float = 0.05):
+        self.probe = probe
+        self.interval = interval
+        self.samples = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            value = await self.probe.sample()
+            if value is not None:
+                self.samples.append(value)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> list:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        return self.samples
+
+
+def disable_rate_limits() -> None:
+    """Lift in-process rate limits so they don't cap the measured throughput"""
+    from app.config import settings
+
+    for name in (
+        "RATE_LIMIT_EVENTS",
+        "RATE_LIMIT_HEATMAPS",
+        "RATE_LIMIT_FUNNELS",
+        "RATE_LIMIT_GENERAL",
+    ):
+        setattr(settings, name, 10**9)
+
+
+@asynccontextmanager
+async def open_client(
+    mode: str,
+    api_key: str,
+    base_url: str = "http://localhost:8000",
+    database_url: Optional[str] = None,
+    concurrency: int = 64,
+) -> AsyncIterator[Tuple[httpx.AsyncClient, ConnectionProbe]]:
+    """
+    Open a client against the app
+
+    Args:
+        mode: "asgi" (in-process, shares the app's engine) or "http"
+        api_key: Bearer token
+        base_url: Server URL for http mode
+        database_url: If set, count connections via pg_stat_activity
+        concurrency: Max connections for the HTTP client
+
+    Yields:
+        (client, connection probe)
+    """
+    headers = {"Authorization": f"Bearer {api_key}"}
+    timeout = httpx.Timeout(60.0)
+
+    if mode == "asgi":
+        from app.main import app
+
+        disable_rate_limits()
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench", headers=headers, timeout=timeout
+            ) as client:
+                probe = PgStatActivityProbe(database_url) if database_url else InProcessPoolProbe()
+                try:
+                    yield client, probe
+                finally:
+                    await probe.close()
+    elif mode == "http":
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(
+            base_url=base_url, headers=headers, timeout=timeout, limits=limits
+        ) as client:
+            probe = (
+                PgStatActivityProbe(database_url) if database_url else MetricsEndpointProbe(client)
+            )
+            try:
+                yield client, probe
+            finally:
+                await probe.close()
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
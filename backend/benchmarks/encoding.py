@@ -0,0 +1,218 @@
+"""
+Response encoding microbenchmark - Serialization cost per endpoint
+
+Isolates the step between "query rows are in memory" and "response body
+is ready" for the hot endpoints, comparing:
+
+- legacy: per-row Pydantic models, FastAPI's response_model validation
+  (serialize_response) and JSONResponse (stdlib json)
+- fast: what the routes do now (fast_response / pre-shaped dicts with
+  orjson, or model_dump_json for small models)
+
+Query results are fetched once from a dataset loaded by benchmarks.seed
+(hot page, first funnel, full seeded range); both paths must produce the
+same JSON document.
+
+Usage:
+    python -m benchmarks.encoding
+    python -m benchmarks.encoding --repeat 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from benchmarks.results import DEFAULT_RESULTS_DIR, latency_summary, save_results
+from benchmarks.seed import DEFAULT_MANIFEST
+
+Encoder = Callable[[], Awaitable[bytes]]
+
+
+@lru_cache(maxsize=None)
+def response_field(response_model: Any) -> Any:
+    """response_model field as FastAPI creates it once per route"""
+    from fastapi.utils import create_response_field
+
+    return create_response_field(name="Response", type_=response_model)
+
+
+async def legacy_body(response_model: Any, content: Any, status_code: int = 200) -> bytes:
+    """Body as FastAPI builds it for a route returning content with response_model"""
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+
+    value = await serialize_response(field=response_field(response_model), response_content=content)
+    return JSONResponse(value, status_code=status_code).body
+
+
+async def build_cases(manifest: Dict[str, Any]) -> Dict[str, Tuple[Encoder, Encoder]]:
+    """(legacy, fast) encoders per endpoint, over rows fetched once"""
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from app.database import AnalyticsSessionLocal
+    from app.models.funnel import Funnel
+    from app.models.page import Page
+    from app.routes import heatmaps
+    from app.routes.funnels import build_funnel_stats
+    from app.schemas.event import EventBatchResponse
+    from app.schemas.funnel import FunnelStatsResponse
+    from app.schemas.heatmap import (
+        ClickHeatmapPoint,
+        ClickHeatmapResponse,
+        DateRange,
+        MouseMoveHeatmapPoint,
+        MouseMoveHeatmapResponse,
+        PageInfo,
+        ScrollHeatmapResponse,
+    )
+    from app.services.fast_json import fast_response
+
+    start = datetime.fromisoformat(manifest["range"]["start"])
+    end = datetime.fromisoformat(manifest["range"]["end"])
+
+    async with AnalyticsSessionLocal() as db:
+        page = (
+            await db.execute(select(Page).where(Page.url == manifest["pages"]["hot"]))
+        ).scalar_one()
+        funnel = (
+            await db.execute(
+                select(Funnel)
+                .options(selectinload(Funnel.steps))
+                .where(Funnel.id == manifest["funnels"][0])
+            )
+        ).scalar_one()
+        click_rows, total_clicks = await heatmaps.fetch_click_heatmap(db, page, start, end)
+        move_rows = await heatmaps.fetch_mouse_move_heatmap(db, page, start, end, 10)
+        scroll = await heatmaps.build_scroll_heatmap(db, page, start, end)
+        funnel_stats = await build_funnel_stats(db, funnel, start, end)
+
+    async def legacy_events() -> bytes:
+        content = EventBatchResponse(inserted=100, message="Click events recorded successfully")
+        return await legacy_body(EventBatchResponse, content, 201)
+
+    async def fast_events() -> bytes:
+        return fast_response(
+            {"inserted": 100, "message": "Click events recorded successfully"}, 201
+        ).body
+
+    async def legacy_clicks() -> bytes:
+        content = ClickHeatmapResponse(
+            page=PageInfo(url=page.url, title=page.title, total_clicks=total_clicks),
+            heatmap_data=[
+                ClickHeatmapPoint(
+                    x=row.x,
+                    y=row.y,
+                    click_count=row.click_count,
+                    element_tag=row.element_tag,
+                    element_text=row.element_text,
+                )
+                for row in click_rows
+            ],
+            date_range=DateRange(start=start, end=end),
+        )
+        return await legacy_body(ClickHeatmapResponse, content)
+
+    async def fast_clicks() -> bytes:
+        return heatmaps.encode_click_heatmap(page, click_rows, total_clicks, start, end)
+
+    async def legacy_moves() -> bytes:
+        peak = max((row.move_count for row in move_rows), default=1)
+        content = MouseMoveHeatmapResponse(
+            page=PageInfo(url=page.url, title=page.title),
+            heatmap_data=[
+                MouseMoveHeatmapPoint(
+                    x_bucket=int(row.x_bucket),
+                    y_bucket=int(row.y_bucket),
+                    move_count=row.move_count,
+                    intensity=round(row.move_count / peak, 2),
+                )
+                for row in move_rows
+            ],
+            grid_size=10,
+            date_range=DateRange(start=start, end=end),
+        )
+        return await legacy_body(MouseMoveHeatmapResponse, content)
+
+    async def fast_moves() -> bytes:
+        return heatmaps.encode_mouse_move_heatmap(page, move_rows, 10, start, end)
+
+    def model_cases(response_model: Any, content: Any) -> Tuple[Encoder, Encoder]:
+        async def legacy() -> bytes:
+            return await legacy_body(response_model, content)
+
+        async def fast() -> bytes:
+            return content.model_dump_json().encode()
+
+        return legacy, fast
+
+    return {
+        "events/*": (legacy_events, fast_events),
+        "heatmaps/clicks": (legacy_clicks, fast_clicks),
+        "heatmaps/mouse-moves": (legacy_moves, fast_moves),
+        "heatmaps/scrolls": model_cases(ScrollHeatmapResponse, scroll),
+        "funnels/stats": model_cases(FunnelStatsResponse, funnel_stats),
+    }
+
+
+async def time_encoder(
+    encoder: Encoder, repeat: int, warmup: int
+) -> Tuple[Dict[str, float], bytes]:
+    for _ in range(warmup):
+        await encoder()
+    latencies = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = await encoder()
+        latencies.append(time.perf_counter() - t0)
+    return latency_summary(latencies), body
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    with open(args.manifest, encoding="utf-8") as f:
+        manifest = json.load(f)
+    cases = await build_cases(manifest)
+
+    results: Dict[str, Any] = {}
+    for key, (legacy, fast) in cases.items():
+        legacy_latency, legacy_bytes = await time_encoder(legacy, args.repeat, args.warmup)
+        fast_latency, fast_bytes = await time_encoder(fast, args.repeat, args.warmup)
+        speedup = (
+            legacy_latency["p50_ms"] / fast_latency["p50_ms"] if fast_latency["p50_ms"] else 0.0
+        )
+        results[key] = {
+            "bytes": len(fast_bytes),
+            "identical": json.loads(legacy_bytes) == json.loads(fast_bytes),
+            "legacy": legacy_latency,
+            "fast": fast_latency,
+            "speedup": round(speedup, 2),
+        }
+        print(
+            f"{key:<22} {len(fast_bytes):>10} B  legacy p50 {legacy_latency['p50_ms']:>9.3f} ms  "
+            f"fast p50 {fast_latency['p50_ms']:>9.3f} ms  x{speedup:>6.2f}"
+            + ("" if results[key]["identical"] else "  OUTPUT DIFFERS")
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Response encoding microbenchmark")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output-dir", default=DEFAULT_RESULTS_DIR)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    path = save_results("encoding", results, vars(args), args.output_dir)
+    print(f"Results written to {path}")
+    if not all(result["identical"] for result in results.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark result aggregation, persistence and comparison
+"""
+
+import json
+import os
+import platform
+import subprocess
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(q / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max/mean in milliseconds"""
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+    }
+
+
+class EndpointRecorder:
+    """Latency, status and event counts for one endpoint"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.events = 0
+        self.connection_samples: List[int] = []
+
+    def record(self, latency: float, status_code: int, event_count: int = 0) -> None:
+        self.latencies.append(latency)
+        self.statuses[status_code] += 1
+        if 200 <= status_code < 300:
+            self.events += event_count
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        """Aggregate results for a run of the given wall-clock duration"""
+        requests = len(self.latencies)
+        errors = sum(count for code, count in self.statuses.items() if code >= 400)
+        samples = self.connection_samples
+        return {
+            "requests": requests,
+            "errors": errors,
+            "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+            "duration_s": round(duration, 3),
+            "req_per_s": round(requests / duration, 2) if duration > 0 else 0.0,
+            "events": self.events,
+            "events_per_s": round(self.events / duration, 2) if duration > 0 else 0.0,
+            "latency": latency_summary(self.latencies),
+            "db_connections": {
+                "peak": max(samples) if samples else None,
+                "mean": round(sum(samples) / len(samples), 2) if samples else None,
+            },
+        }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(
+    name: str,
+    results: Dict[str, Any],
+    parameters: Dict[str, Any],
+    output_dir: str,
+) -> str:
+    """
+    Write results as JSON with run metadata
+
+    Returns:
+        Path of the written file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    now = datetime.utcnow()
+    document = {
+        "benchmark": name,
+        "created_at": now.isoformat() + "Z",
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "parameters": parameters,
+        "results": results,
+    }
+    path = os.path.join(output_dir, f"{name}-{now:%Y%m%dT%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2, default=str)
+    return path
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """Load a results file written by save_results"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_latency(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    metric: str = "p95_ms",
+    tolerance: float = 0.10,
+) -> List[Dict[str, Any]]:
+    """
+    Compare per-key latency against a baseline
+
+    Args:
+        current: {key: summary} with a "latency" dict per key
+        baseline: Same shape, from an earlier run
+        metric: Latency field to compare
+        tolerance: Allowed relative slowdown before a key counts as regressed
+
+    Returns:
+        One row per key present in both runs
+    """
+    rows = []
+    for key, summary in current.items():
+        if key not in baseline:
+            continue
+        new = summary["latency"][metric]
+        old = baseline[key]["latency"][metric]
+        change = (new - old) / old if old else 0.0
+        rows.append(
+            {
+                "key": key,
+                "baseline": old,
+                "current": new,
+                "change": round(change, 4),
+                "regressed": change > tolerance,
+            }
+        )
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], metric: str) -> None:
+    """Print a comparison table"""
+    print(f"{'key':<60} {'baseline':>10} {'current':>10} {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSED" if row["regressed"] else ""
+        print(
+            f"{row['key']:<60} {row['baseline']:>10.2f} {row['current']:>10.2f} "
+            f"{row['change'] * 100:>7.1f}%{flag}"
+        )
+    print(f"(metric: {metric})")
@@ -0,0 +1,529 @@
+"""
+Large dataset seeder - Bulk-loads event tables with COPY
+
+Creates users, pages, sessions and funnels, then streams rows into
+click_events, mouse_move_events, scroll_events and funnel_events with
+asyncpg's COPY protocol. Worker processes load disjoint chunks in
+parallel over their own connections.
+
+Skew:
+- Pages follow a Zipf distribution (a handful of hot landing pages and a
+  long tail), sessions are assigned to pages by that distribution and
+  events are drawn uniformly from sessions
+- Session starts follow a diurnal curve over the last --days days
+- Click and move positions cluster around per-page hotspots
+
+IDs are derived from the row index so workers can regenerate them
+without sharing state.
+
+Usage:
+    python -m benchmarks.seed --clicks 10000000 --mouse-moves 50000000 \\
+        --scrolls 5000000 --funnel-events 2000000 --workers 8
+
+    # Writes benchmarks/results/seed-manifest.json for benchmarks.analytics
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+from uuid import UUID
+
+from app.services.breakpoints import breakpoint_for, x_ratio
+from app.services.sampling import sample_key
+from benchmarks.results import DEFAULT_RESULTS_DIR
+
+CHUNK_ROWS = 100_000
+DEFAULT_MANIFEST = os.path.join(DEFAULT_RESULTS_DIR, "seed-manifest.json")
+
+# High 64 bits of generated UUIDs, one namespace per entity
+NAMESPACES = {
+    "user": 0x5EED0001,
+    "page": 0x5EED0002,
+    "session": 0x5EED0003,
+    "funnel": 0x5EED0004,
+    "step": 0x5EED0005,
+    "click": 0x5EED0010,
+    "move": 0x5EED0011,
+    "scroll": 0x5EED0012,
+    "funnel_event": 0x5EED0013,
+}
+
+VIEWPORTS = [(375, 812), (412, 915), (768, 1024), (1440, 900), (1920, 1080)]
+VIEWPORT_WEIGHTS = [0.35, 0.20, 0.10, 0.10, 0.25]
+DEVICE_TYPES = ["mobile", "mobile", "tablet", "desktop", "desktop"]
+BROWSERS = ["Safari", "Chrome", "Safari", "Firefox", "Chrome"]
+ELEMENT_TAGS = ["a", "button", "div", "img", "span"]
+
+
+def make_id(kind: str, index: int) -> UUID:
+    """Deterministic UUID for the index-th row of an entity"""
+    return UUID(int=(NAMESPACES[kind] << 96) | index)
+
+
+def asyncpg_dsn(url: str) -> str:
+    """Convert a SQLAlchemy URL to an asyncpg DSN"""
+    return url.replace("postgresql+asyncpg://", "postgresql://")
+
+
+class SeedPlan:
+    """Everything workers need to regenerate consistent rows"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.seed = args.seed
+        self.pages = args.pages
+        self.users = args.users
+        self.sessions = args.sessions
+        self.funnels = args.funnels
+        self.steps_per_funnel = args.steps_per_funnel
+        self.end = datetime.utcnow().replace(microsecond=0)
+        self.start = self.end - timedelta(days=args.days)
+
+        rng = random.Random(self.seed)
+        weights = [1.0 / (rank**args.zipf) for rank in range(1, self.pages + 1)]
+        self.page_cdf = list(accumulate(weights))
+        self.page_heights = array("i", (rng.randint(2000, 20000) for _ in range(self.pages)))
+
+        # Session -> page (Zipf) and start time (diurnal)
+        total = self.page_cdf[-1]
+        self.session_page = array("i")
+        self.session_start = array("d")
+        span = (self.end - self.start).total_seconds()
+        base = self.start.timestamp()
+        for _ in range(self.sessions):
+            self.session_page.append(bisect_left(self.page_cdf, rng.random() * total))
+            self.session_start.append(base + self._diurnal_offset(rng, span))
+        self.session_viewport = array(
+            "b", rng.choices(range(len(VIEWPORTS)), weights=VIEWPORT_WEIGHTS, k=self.sessions)
+        )
+
+        # Returning sessions: the user (session % users) has an earlier one
+        first_start: Dict[int, float] = {}
+        for s, started in enumerate(self.session_start):
+            user = s % self.users
+            first_start[user] = min(first_start.get(user, started), started)
+        self.session_returning = array(
+            "b",
+            (started > first_start[s % self.users] for s, started in enumerate(self.session_start)),
+        )
+
+    @staticmethod
+    def _diurnal_offset(rng: random.Random, span: float) -> float:
+        """Offset into the range with more traffic during the day"""
+        while True:
+            offset = rng.random() * span
+            hour = (offset / 3600.0) % 24
+            # Peak around 14:00, trough around 02:00
+            if rng.random() < 0.55 + 0.45 * math.cos((hour - 14) / 24 * 2 * math.pi):
+                return offset
+
+
+def _hotspot(rng: random.Random, page: int, width: int, height: int) -> Tuple[int, int]:
+    """Clustered position on a page; hotspots are derived from the page index"""
+    spot = random.Random(page * 7919 + rng.randint(0, 5))
+    x = rng.gauss(spot.uniform(0.1, 0.9) * width, width * 0.05)
+    y = rng.gauss(spot.uniform(0, height), 150)
+    return int(min(max(x, 0), width - 1)), int(min(max(y, 0), height - 1))
+
+
+def _event_context(plan: SeedPlan, rng: random.Random):
+    """Pick a session and derive page, user, viewport and timestamp"""
+    session = rng.randrange(plan.sessions)
+    page = plan.session_page[session]
+    width, height = VIEWPORTS[plan.session_viewport[session]]
+    timestamp = datetime.utcfromtimestamp(plan.session_start[session] + rng.random() * 600)
+    return session, page, width, height, timestamp
+
+
+def _segment(plan: SeedPlan, session: int) -> Tuple[str, str, bool, int]:
+    """Session attributes and sample key copied onto events, as at ingest"""
+    viewport = plan.session_viewport[session]
+    return (
+        DEVICE_TYPES[viewport].lower(),
+        BROWSERS[viewport].lower(),
+        bool(plan.session_returning[session]),
+        sample_key(make_id("session", session)),
+    )
+
+
+def click_rows(plan: SeedPlan, start: int, stop: int) -> Iterator[Tuple]:
+    rng = random.Random(plan.seed * 1_000_003 + start)
+    for i in range(start, stop):
+        session, page, width, height, timestamp = _event_context(plan, rng)
+        x, y = _hotspot(rng, page, width, plan.page_heights[page])
+        tag = ELEMENT_TAGS[i % len(ELEMENT_TAGS)]
+        yield (
+            make_id("click", i),
+            make_id("session", session),
+            make_id("page", page),
+            x,
+            y,
+            width,
+            height,
+            tag,
+            f"{tag}-{rng.randint(0, 20)}",
+            f"cta cta-{rng.randint(0, 5)}",
+            "Sign up",
+            x_ratio(x, width),
+            breakpoint_for(width),
+            *_segment(plan, session),
+            timestamp,
+            timestamp,
+        )
+
+
+def mouse_move_rows(plan: SeedPlan, start: int, stop: int) -> Iterator[Tuple]:
+    rng = random.Random(plan.seed * 1_000_033 + start)
+    for i in range(start, stop):
+        session, page, width, height, timestamp = _event_context(plan, rng)
+        x, y = _hotspot(rng, page, width, plan.page_heights[page])
+        yield (
+            make_id("move", i),
+            make_id("session", session),
+            make_id("page", page),
+            x,
+            y,
+            width,
+            height,
+            x_ratio(x, width),
+            breakpoint_for(width),
+            *_segment(plan, session),
+            timestamp,
+            timestamp,
+        )
+
+
+def scroll_rows(plan: SeedPlan, start: int, stop: int) -> Iterator[Tuple]:
+    rng = random.Random(plan.seed * 1_000_037 + start)
+    for i in range(start, stop):
+        session, page, _, height, timestamp = _event_context(plan, rng)
+        page_height = plan.page_heights[page]
+        depth = int(min(rng.betavariate(1.5, 2.0) * 110, 100))
+        yield (
+            make_id("scroll", i),
+            make_id("session", session),
+            make_id("page", page),
+            depth,
+            int(max(page_height - height, 0) * depth / 100),
+            page_height,
+            timestamp,
+            timestamp,
+        )
+
+
+def funnel_event_rows(plan: SeedPlan, start: int, stop: int) -> Iterator[Tuple]:
+    rng = random.Random(plan.seed * 1_000_039 + start)
+    for i in range(start, stop):
+        session, _, _, _, timestamp = _event_context(plan, rng)
+        funnel = rng.randrange(plan.funnels)
+        # Geometric drop-off: later steps see fewer users
+        step = 0
+        while step < plan.steps_per_funnel - 1 and rng.random() < 0.6:
+            step += 1
+        completed = rng.random() < 0.6
+        yield (
+            make_id("funnel_event", i),
+            make_id("funnel", funnel),
+            make_id("step", funnel * plan.steps_per_funnel + step),
+            make_id("session", session),
+            make_id("user", session % plan.users),
+            completed,
+            not completed,
+            timestamp,
+            timestamp,
+        )
+
+
+EVENT_TABLES = {
+    "click_events": (
+        click_rows,
+        [
+            "id",
+            "session_id",
+            "page_id",
+            "x",
+            "y",
+            "viewport_width",
+            "viewport_height",
+            "element_tag",
+            "element_id",
+            "element_class",
+            "element_text",
+            "x_ratio",
+            "breakpoint",
+            "device_type",
+            "browser",
+            "is_returning",
+            "sample_key",
+            "timestamp",
+            "created_at",
+        ],
+    ),
+    "mouse_move_events": (
+        mouse_move_rows,
+        [
+            "id",
+            "session_id",
+            "page_id",
+            "x",
+            "y",
+            "viewport_width",
+            "viewport_height",
+            "x_ratio",
+            "breakpoint",
+            "device_type",
+            "browser",
+            "is_returning",
+            "sample_key",
+            "timestamp",
+            "created_at",
+        ],
+    ),
+    "scroll_events": (
+        scroll_rows,
+        [
+            "id",
+            "session_id",
+            "page_id",
+            "depth_percent",
+            "max_scroll_y",
+            "page_height",
+            "timestamp",
+            "created_at",
+        ],
+    ),
+    "funnel_events": (
+        funnel_event_rows,
+        [
+            "id",
+            "funnel_id",
+            "funnel_step_id",
+            "session_id",
+            "user_id",
+            "completed",
+            "dropped_off",
+            "timestamp",
+            "created_at",
+        ],
+    ),
+}
+
+
+async def _copy(conn, table: str, columns: Sequence[str], rows: Iterator[Tuple]) -> int:
+    """COPY rows into a table in CHUNK_ROWS batches"""
+    total = 0
+    batch: List[Tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK_ROWS:
+            await conn.copy_records_to_table(table, records=batch, columns=columns)
+            total += len(batch)
+            batch = []
+    if batch:
+        await conn.copy_records_to_table(table, records=batch, columns=columns)
+        total += len(batch)
+    return total
+
+
+def _load_range(dsn: str, plan: SeedPlan, table: str, start: int, stop: int) -> int:
+    """Worker entry point: load rows [start, stop) of one table"""
+    import asyncpg
+
+    async def load() -> int:
+        conn = await asyncpg.connect(dsn)
+        try:
+            generate, columns = EVENT_TABLES[table]
+            return await _copy(conn, table, columns, generate(plan, start, stop))
+        finally:
+            await conn.close()
+
+    return asyncio.run(load())
+
+
+async def seed_dimensions(dsn: str, plan: SeedPlan, base_url: str) -> None:
+    """Load users, pages, sessions, funnels and funnel steps"""
+    import asyncpg
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        now = datetime.utcnow()
+        await _copy(
+            conn,
+            "users",
+            [
+                "id",
+                "anonymous_id",
+                "first_visit_at",
+                "last_visit_at",
+                "total_sessions",
+                "created_at",
+                "updated_at",
+            ],
+            (
+                (make_id("user", u), f"seed-{u}", plan.start, now, 1, now, now)
+                for u in range(plan.users)
+            ),
+        )
+        await _copy(
+            conn,
+            "pages",
+            ["id", "url", "title", "domain", "created_at"],
+            (
+                (
+                    make_id("page", p),
+                    f"{base_url}/lp/{p}",
+                    f"Seed page {p}",
+                    base_url.split("://", 1)[-1],
+                    now,
+                )
+                for p in range(plan.pages)
+            ),
+        )
+        await _copy(
+            conn,
+            "sessions",
+            [
+                "id",
+                "user_id",
+                "page_id",
+                "session_start",
+                "device_type",
+                "browser",
+                "screen_width",
+                "screen_height",
+                "created_at",
+            ],
+            (
+                (
+                    make_id("session", s),
+                    make_id("user", s % plan.users),
+                    make_id("page", plan.session_page[s]),
+                    datetime.utcfromtimestamp(plan.session_start[s]),
+                    DEVICE_TYPES[plan.session_viewport[s]],
+                    BROWSERS[plan.session_viewport[s]],
+                    *VIEWPORTS[plan.session_viewport[s]],
+                    now,
+                )
+                for s in range(plan.sessions)
+            ),
+        )
+        await _copy(
+            conn,
+            "funnels",
+            ["id", "name", "description", "created_at", "updated_at"],
+            (
+                (make_id("funnel", f), f"Seed funnel {f}", None, now, now)
+                for f in range(plan.funnels)
+            ),
+        )
+        await _copy(
+            conn,
+            "funnel_steps",
+            ["id", "funnel_id", "step_order", "step_name", "page_url", "created_at"],
+            (
+                (
+                    make_id("step", f * plan.steps_per_funnel + k),
+                    make_id("funnel", f),
+                    k + 1,
+                    f"Step {k + 1}",
+                    f"{base_url}/lp/{k}",
+                    now,
+                )
+                for f in range(plan.funnels)
+                for k in range(plan.steps_per_funnel)
+            ),
+        )
+    finally:
+        await conn.close()
+
+
+async def analyze(dsn: str) -> None:
+    import asyncpg
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        for table in ["users", "pages", "sessions", "funnels", "funnel_steps", *EVENT_TABLES]:
+            await conn.execute(f"ANALYZE {table}")
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed large benchmark datasets with COPY")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL", ""))
+    parser.add_argument("--clicks", type=int, default=10_000_000)
+    parser.add_argument("--mouse-moves", type=int, default=10_000_000)
+    parser.add_argument("--scrolls", type=int, default=10_000_000)
+    parser.add_argument("--funnel-events", type=int, default=10_000_000)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--sessions", type=int, default=500_000)
+    parser.add_argument("--funnels", type=int, default=10)
+    parser.add_argument("--steps-per-funnel", type=int, default=4)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--zipf", type=float, default=1.2)
+    parser.add_argument("--base-url", default="https://seed.example.com")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("--database-url (or DATABASE_URL) is required")
+    dsn = asyncpg_dsn(args.database_url)
+
+    started = time.perf_counter()
+    plan = SeedPlan(args)
+    asyncio.run(seed_dimensions(dsn, plan, args.base_url))
+    print(f"Dimensions loaded in {time.perf_counter() - started:.1f}s")
+
+    targets = {
+        "click_events": args.clicks,
+        "mouse_move_events": args.mouse_moves,
+        "scroll_events": args.scrolls,
+        "funnel_events": args.funnel_events,
+    }
+    with multiprocessing.Pool(args.workers) as pool:
+        for table, rows in targets.items():
+            if rows <= 0:
+                continue
+            table_started = time.perf_counter()
+            step = max(math.ceil(rows / (args.workers * 4)), CHUNK_ROWS)
+            ranges = [
+                (dsn, plan, table, start, min(start + step, rows)) for start in range(0, rows, step)
+            ]
+            loaded = sum(pool.starmap(_load_range, ranges))
+            elapsed = time.perf_counter() - table_started
+            rate = loaded / elapsed
+            print(f"{table:<20} {loaded:>12,} rows in {elapsed:8.1f}s ({rate:,.0f} rows/s)")
+
+    asyncio.run(analyze(dsn))
+
+    manifest: Dict[str, Any] = {
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "range": {"start": plan.start.isoformat(), "end": plan.end.isoformat()},
+        "rows": targets,
+        "pages": {
+            "hot": f"{args.base_url}/lp/0",
+            "median": f"{args.base_url}/lp/{args.pages // 10}",
+            "tail": f"{args.base_url}/lp/{args.pages - 1}",
+        },
+        "funnels": [str(make_id("funnel", f)) for f in range(args.funnels)],
+    }
+    os.makedirs(os.path.dirname(args.manifest) or ".", exist_ok=True)
+    with open(args.manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Done in {time.perf_counter() - started:.1f}s, manifest: {args.manifest}")
+
+
+if __name__ == "__main__":
+    main()
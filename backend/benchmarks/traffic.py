@@ -0,0 +1,288 @@
+"""
+Synthetic traffic generator - Realistic tracking traces
+
+Models what the tracking script sends for one browsing session:
+
+- users/identify + sessions/start bootstrap
+- clicks arriving as a Poisson process, flushed in batches
+- mouse trajectories sampled every 100 ms (minimum-jerk moves between
+  targets separated by dwell pauses), flushed in batches of up to 100
+- scroll depth progressing down the page, flushed in batches
+- sessions/end
+
+Page popularity follows a Zipf distribution so a few pages are hot and
+most are long-tail.
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+MOUSE_SAMPLE_INTERVAL = 0.1  # seconds, matches mouseMoveTracker throttle
+MAX_EVENTS_PER_BATCH = 100
+
+DEVICE_PROFILES = [
+    # (type, browser, width, height, weight, has_mouse)
+    ("mobile", "Safari", 375, 812, 0.35, False),
+    ("mobile", "Chrome", 412, 915, 0.20, False),
+    ("tablet", "Safari", 768, 1024, 0.10, True),
+    ("desktop", "Chrome", 1920, 1080, 0.25, True),
+    ("desktop", "Firefox", 1440, 900, 0.10, True),
+]
+
+ELEMENT_TAGS = ["a", "button", "div", "img", "span", "input"]
+
+
+class TraceRequest:
+    """One API call in a session trace"""
+
+    def __init__(self, offset: float, endpoint: str, body: Dict[str, Any], event_count: int = 0):
+        self.offset = offset  # seconds since session start
+        self.endpoint = endpoint  # e.g. "events/clicks"
+        self.body = body
+        self.event_count = event_count
+
+
+class SyntheticSession:
+    """Trace of one browsing session"""
+
+    def __init__(
+        self,
+        anonymous_id: str,
+        page_url: str,
+        page_title: str,
+        device: Tuple,
+        started_at: datetime,
+        duration: float,
+    ):
+        self.anonymous_id = anonymous_id
+        self.page_url = page_url
+        self.page_title = page_title
+        self.device = device
+        self.started_at = started_at
+        self.duration = duration
+        self.requests: List[TraceRequest] = []
+        # Filled in by the runner from bootstrap responses
+        self.user_id: Optional[str] = None
+        self.session_id: Optional[str] = None
+
+
+class TraceGenerator:
+    """
+    Generates synthetic sessions
+
+    Args:
+        pages: Number of distinct page URLs
+        zipf_s: Zipf exponent for page popularity (higher = more skew)
+        clicks_per_minute: Mean click rate per session
+        flush_interval: Seconds between tracker flushes
+        seed: RNG seed for reproducible traces
+    """
+
+    def __init__(
+        self,
+        pages: int = 50,
+        zipf_s: float = 1.1,
+        clicks_per_minute: float = 4.0,
+        flush_interval: float = 5.0,
+        base_url: str = "https://bench.example.com",
+        seed: int = 42,
+    ):
+        self.rng = random.Random(seed)
+        self.clicks_per_minute = clicks_per_minute
+        self.flush_interval = flush_interval
+        self.page_urls = [f"{base_url}/lp/{i}" for i in range(pages)]
+        self.page_weights = [1.0 / (rank**zipf_s) for rank in range(1, pages + 1)]
+        self.page_heights = {url: self.rng.randint(2000, 20000) for url in self.page_urls}
+        # A few hotspots per page so clicks and moves cluster like real traffic
+        self.hotspots = {
+            url: [
+                (self.rng.uniform(0.1, 0.9), self.rng.uniform(0, self.page_heights[url]))
+                for _ in range(self.rng.randint(3, 8))
+            ]
+            for url in self.page_urls
+        }
+
+    def _hotspot_point(self, page_url: str, width: int) -> Tuple[int, int]:
+        """Random point clustered around one of the page's hotspots"""
+        hx, hy = self.rng.choice(self.hotspots[page_url])
+        x = self.rng.gauss(hx * width, width * 0.05)
+        y = self.rng.gauss(hy, 120)
+        return (
+            int(min(max(x, 0), width - 1)),
+            int(min(max(y, 0), self.page_heights[page_url] - 1)),
+        )
+
+    def session(self, started_at: datetime) -> SyntheticSession:
+        """Generate one session trace"""
+        rng = self.rng
+        page_url = rng.choices(self.page_urls, weights=self.page_weights)[0]
+        device = rng.choices(DEVICE_PROFILES, weights=[d[4] for d in DEVICE_PROFILES])[0]
+        # Log-normal dwell time, median ~60 s, capped at 10 min
+        duration = min(rng.lognormvariate(math.log(60), 0.8), 600.0)
+
+        session = SyntheticSession(
+            anonymous_id=str(uuid4()),
+            page_url=page_url,
+            page_title=f"Landing page {page_url.rsplit('/', 1)[-1]}",
+            device=device,
+            started_at=started_at,
+            duration=duration,
+        )
+
+        self._add_clicks(session)
+        if device[5]:
+            self._add_mouse_moves(session)
+        self._add_scrolls(session)
+        session.requests.sort(key=lambda r: r.offset)
+        return session
+
+    def _timestamp(self, session: SyntheticSession, offset: float) -> str:
+        return (session.started_at + timedelta(seconds=offset)).isoformat()
+
+    def _flush_offset(self, offset: float) -> float:
+        """Time at which the tracker flushes an event recorded at offset"""
+        return (math.floor(offset / self.flush_interval) + 1) * self.flush_interval
+
+    def _batched(
+        self,
+        session: SyntheticSession,
+        endpoint: str,
+        timed_events: List[Tuple[float, Dict[str, Any]]],
+    ) -> None:
+        """Group events into flushes and append them as requests"""
+        batch: List[Dict[str, Any]] = []
+        batch_flush = 0.0
+
+        def emit(at: float) -> None:
+            session.requests.append(TraceRequest(at, endpoint, {"events": batch}, len(batch)))
+
+        for offset, event in timed_events:
+            flush = min(self._flush_offset(offset), session.duration)
+            if batch and flush != batch_flush:
+                emit(batch_flush)
+                batch = []
+            batch.append(event)
+            batch_flush = flush
+            # A full batch is sent immediately
+            if len(batch) >= MAX_EVENTS_PER_BATCH:
+                emit(offset)
+                batch = []
+        if batch:
+            emit(batch_flush)
+
+    def _add_clicks(self, session: SyntheticSession) -> None:
+        """Poisson click arrivals"""
+        _, _, width, height, _, _ = session.device
+        rate = self.clicks_per_minute / 60.0
+        events = []
+        offset = self.rng.expovariate(rate)
+        while offset < session.duration:
+            x, y = self._hotspot_point(session.page_url, width)
+            tag = self.rng.choice(ELEMENT_TAGS)
+            events.append(
+                (
+                    offset,
+                    {
+                        "x": x,
+                        "y": y,
+                        "viewport_width": width,
+                        "viewport_height": height,
+                        "element": {
+                            "tag": tag,
+                            "id": f"{tag}-{self.rng.randint(0, 20)}",
+                            "class": f"cta cta-{self.rng.randint(0, 5)}",
+                            "text": "Sign up",
+                        },
+                        "timestamp": self._timestamp(session, offset),
+                    },
+                )
+            )
+            offset += self.rng.expovariate(rate)
+        self._batched(session, "events/clicks", events)
+
+    def _add_mouse_moves(self, session: SyntheticSession) -> None:
+        """100 ms-sampled minimum-jerk trajectories between hotspots"""
+        _, _, width, height, _, _ = session.device
+        events = []
+        offset = 0.0
+        x, y = self._hotspot_point(session.page_url, width)
+        while offset < session.duration:
+            tx, ty = self._hotspot_point(session.page_url, width)
+            move_time = self.rng.uniform(0.3, 1.5)
+            steps = max(int(move_time / MOUSE_SAMPLE_INTERVAL), 1)
+            for step in range(1, steps + 1):
+                t = step / steps
+                s = 10 * t**3 - 15 * t**4 + 6 * t**5  # minimum-jerk profile
+                sample_offset = offset + step * MOUSE_SAMPLE_INTERVAL
+                if sample_offset >= session.duration:
+                    break
+                events.append(
+                    (
+                        sample_offset,
+                        {
+                            "x": int(x + (tx - x) * s),
+                            "y": int(y + (ty - y) * s),
+                            "viewport_width": width,
+                            "viewport_height": height,
+                            "timestamp": self._timestamp(session, sample_offset),
+                        },
+                    )
+                )
+            x, y = tx, ty
+            # Dwell: mousemove doesn't fire while the pointer rests
+            offset += steps * MOUSE_SAMPLE_INTERVAL + self.rng.uniform(0.5, 3.0)
+        self._batched(session, "events/mouse-moves", events)
+
+    def _add_scrolls(self, session: SyntheticSession) -> None:
+        """Scroll depth that mostly increases over the session"""
+        _, _, _, height, _, _ = session.device
+        page_height = self.page_heights[session.page_url]
+        max_scroll = max(page_height - height, 0)
+        # Most visitors stop well before the bottom
+        final_depth = min(self.rng.betavariate(1.5, 2.0) * 110, 100)
+        events = []
+        offset = self.rng.uniform(1.0, 5.0)
+        depth = 0.0
+        while offset < session.duration and depth < final_depth:
+            depth = min(depth + self.rng.uniform(5, 20), final_depth)
+            events.append(
+                (
+                    offset,
+                    {
+                        "depth_percent": int(depth),
+                        "max_scroll_y": int(max_scroll * depth / 100),
+                        "page_height": page_height,
+                        "timestamp": self._timestamp(session, offset),
+                    },
+                )
+            )
+            offset += self.rng.uniform(1.0, 8.0)
+        self._batched(session, "events/scrolls", events)
+
+    def sessions(
+        self,
+        count: int,
+        arrival_rate: float,
+        start: Optional[datetime] = None,
+    ) -> List[Tuple[float, SyntheticSession]]:
+        """
+        Generate sessions with Poisson arrivals
+
+        Args:
+            count: Number of sessions
+            arrival_rate: Mean new sessions per second
+            start: Wall-clock time of the first arrival (default: now)
+
+        Returns:
+            (arrival offset in seconds, session) pairs
+        """
+        start = start or datetime.utcnow()
+        result = []
+        arrival = 0.0
+        for _ in range(count):
+            result.append((arrival, self.session(start + timedelta(seconds=arrival))))
+            arrival += self.rng.expovariate(arrival_rate)
+        return result
@@ -0,0 +1,135 @@
+"""
+Tests for admission control: slots, the bounded wait queue and its 503s,
+and slots kept by streamed bodies
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.admission import AdmissionGate, admitted_stream
+
+
+def gate(max_concurrency: int = 1, max_queue: int = 1, queue_timeout: float = 1.0):
+    return AdmissionGate("test", max_concurrency, max_queue, queue_timeout)
+
+
+async def chunks(*values: bytes):
+    for value in values:
+        yield value
+
+
+class TestAdmissionGate:
+    async def test_slots_are_counted_and_released(self):
+        test_gate = gate(max_concurrency=2)
+        async with test_gate.slot():
+            async with test_gate.slot():
+                assert test_gate.running == 2
+            assert test_gate.running == 1
+        assert test_gate.running == 0
+
+    async def test_waiter_gets_the_released_slot(self):
+        test_gate = gate()
+        slot = await test_gate.acquire()
+        waiter = asyncio.create_task(test_gate.acquire())
+        await asyncio.sleep(0)
+        assert test_gate.waiting == 1 and not waiter.done()
+
+        slot.release()
+        slot.release()  # Releasing twice frees one slot only
+        second = await waiter
+        assert test_gate.running == 1 and test_gate.waiting == 0
+        second.release()
+        assert test_gate.running == 0
+
+    async def test_full_queue_is_rejected_at_once(self):
+        test_gate = gate(max_queue=1, queue_timeout=2.5)
+        slot = await test_gate.acquire()
+        waiter = asyncio.create_task(test_gate.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as rejected:
+            await test_gate.acquire()
+        assert rejected.value.status_code == 503
+        assert rejected.value.headers["Retry-After"] == "3"
+        assert rejected.value.detail["error"]["code"] == "OVERLOADED"
+
+        slot.release()
+        (await waiter).release()
+        assert test_gate.running == 0 and test_gate.waiting == 0
+
+    async def test_queue_timeout_is_rejected(self):
+        test_gate = gate(queue_timeout=0.05)
+        async with test_gate.slot():
+            with pytest.raises(HTTPException) as rejected:
+                await test_gate.acquire()
+            assert rejected.value.status_code == 503
+            assert test_gate.waiting == 0
+        assert test_gate.running == 0
+        async with test_gate.slot():  # The timed out waiter left no slot behind
+            assert test_gate.running == 1
+
+    async def test_try_acquire_never_waits(self):
+        test_gate = gate()
+        slot = await test_gate.try_acquire()
+        assert slot is not None
+        assert await test_gate.try_acquire() is None
+        assert test_gate.waiting == 0
+        slot.release()
+        assert test_gate.running == 0
+
+    async def test_kept_slot_outlives_its_block(self):
+        test_gate = gate()
+        async with test_gate.slot() as slot:
+            slot.keep()
+        assert test_gate.running == 1
+        slot.release()
+        assert test_gate.running == 0
+
+
+class TestAdmittedStream:
+    async def test_slot_is_held_until_the_stream_ends(self):
+        test_gate = gate()
+        async with test_gate.slot() as slot:
+            stream = await admitted_stream(slot, chunks(b"a", b"b"))
+        assert test_gate.running == 1
+        assert [chunk async for chunk in stream] == [b"a", b"b"]
+        assert test_gate.running == 0
+
+    async def test_slot_is_released_when_the_stream_fails(self):
+        async def failing():
+            yield b"a"
+            raise RuntimeError("query failed")
+
+        test_gate = gate()
+        async with test_gate.slot() as slot:
+            stream = await admitted_stream(slot, failing())
+        with pytest.raises(RuntimeError):
+            async for _ in stream:
+                pass
+        assert test_gate.running == 0
+
+    async def test_slot_is_released_when_the_stream_is_abandoned(self):
+        closed = []
+
+        async def endless():
+            try:
+                while True:
+                    yield b"x"
+            finally:
+                closed.append(True)
+
+        test_gate = gate()
+        async with test_gate.slot() as slot:
+            stream = await admitted_stream(slot, endless())
+        assert await stream.__anext__() == b"x"
+        await stream.aclose()
+        assert closed == [True] and test_gate.running == 0
+
+    async def test_slot_is_released_when_closed_before_the_first_chunk(self):
+        test_gate = gate()
+        async with test_gate.slot() as slot:
+            stream = await admitted_stream(slot, chunks(b"a"))
+        await stream.aclose()
+        assert test_gate.running == 0
@@ -0,0 +1,132 @@
+"""
+Tests for the heatmap batch endpoint: request order, per-item errors,
+admission slot accounting and item validation
+"""
+
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.exc import OperationalError
+from starlette.requests import Request
+
+from app.routes import heatmaps
+from app.schemas.heatmap import HeatmapBatchItem, HeatmapBatchRequest
+from app.services.admission import AdmissionGate
+
+FOUND = ["https://example.com/a", "https://example.com/b", "https://example.com/c"]
+
+
+class FakeDb:
+    """Just enough of a session for the page lookup"""
+
+    def __init__(self, urls):
+        self.pages = [SimpleNamespace(id=uuid.uuid4(), url=url, title=None) for url in urls]
+
+    async def scalars(self, query):
+        return self.pages
+
+    async def commit(self):
+        pass
+
+
+def failure(url: str) -> Exception:
+    if url.endswith("/timeout"):
+        return OperationalError("SELECT", {}, Exception("statement timeout"))
+    if url.endswith("/invalid"):
+        return HTTPException(
+            status_code=422,
+            detail={"error": {"code": "VALIDATION_ERROR", "message": "bad range"}},
+        )
+    return RuntimeError("boom")
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    test_gate = AdmissionGate("test", max_concurrency=4, max_queue=0, queue_timeout=1.0)
+    monkeypatch.setattr(heatmaps, "analytics_gate", test_gate)
+    return test_gate
+
+
+@pytest.fixture(autouse=True)
+def computed(monkeypatch):
+    """Items compute to {"url": ...} after a delay, so they finish out of order"""
+    monkeypatch.setattr(heatmaps, "batch_item_query", lambda item, page: (page.url, None))
+
+    async def cached_body(key, compute, bypass=False):
+        if "/failing" in key:
+            raise failure(key)
+        await asyncio.sleep(0.01 * (FOUND.index(key) % 3 if key in FOUND else 0))
+        return orjson.dumps({"url": key})
+
+    monkeypatch.setattr(heatmaps, "cached_body", cached_body)
+
+
+async def batch(urls, db_urls):
+    """Results of a batch of click heatmaps, run on a held request slot"""
+    request = Request({"type": "http", "headers": []})
+    body = HeatmapBatchRequest(items=[{"page_url": url, "kind": "clicks"} for url in urls])
+    async with heatmaps.analytics_gate.slot():
+        response = await heatmaps.get_heatmap_batch(request, body, FakeDb(db_urls))
+    return orjson.loads(response.body)["results"]
+
+
+class TestBatch:
+    async def test_results_in_request_order(self, gate):
+        urls = list(reversed(FOUND)) + FOUND
+        results = await batch(urls, FOUND)
+        assert [result["page_url"] for result in results] == urls
+        assert [result["data"]["url"] for result in results] == urls
+        assert {result["status"] for result in results} == {200}
+
+    async def test_unknown_page_among_found_ones(self, gate):
+        urls = [FOUND[0], "https://example.com/missing", FOUND[1]]
+        results = await batch(urls, FOUND)
+        assert [result["status"] for result in results] == [200, 404, 200]
+        assert results[1]["error"]["code"] == "NOT_FOUND"
+        assert "data" not in results[1]
+
+    async def test_failing_items_do_not_fail_the_batch(self, gate):
+        failing = [
+            "https://example.com/failing/timeout",
+            "https://example.com/failing/invalid",
+            "https://example.com/failing/bug",
+        ]
+        results = await batch([FOUND[0], *failing, FOUND[1]], FOUND + failing)
+        assert [result["status"] for result in results] == [200, 503, 422, 500, 200]
+        assert [result.get("error", {}).get("code") for result in results] == [
+            None,
+            "SERVER_ERROR",
+            "VALIDATION_ERROR",
+            "SERVER_ERROR",
+            None,
+        ]
+
+    async def test_slots_are_returned_when_an_item_raises(self, gate):
+        failing = "https://example.com/failing/bug"
+        free = gate.max_concurrency - gate.running
+        results = await batch([*FOUND, failing, *FOUND], FOUND + [failing])
+        assert results[3]["status"] == 500
+        assert gate.max_concurrency - gate.running == free
+        assert gate.running == 0 and gate.waiting == 0
+
+
+class TestBatchItem:
+    def test_scrolls_take_no_grid_size(self):
+        with pytest.raises(ValidationError):
+            HeatmapBatchItem(page_url="https://example.com/", kind="scrolls", grid_size=10)
+
+    def test_grid_size_bounds_depend_on_kind(self):
+        HeatmapBatchItem(page_url="https://example.com/", kind="clicks", grid_size=100)
+        with pytest.raises(ValidationError):
+            HeatmapBatchItem(page_url="https://example.com/", kind="mouse-moves", grid_size=100)
+
+    def test_top_n(self):
+        item = HeatmapBatchItem(page_url="https://example.com/", kind="clicks", grid_size=10)
+        assert item.top_n == 20
+        with pytest.raises(ValidationError):
+            HeatmapBatchItem(page_url="https://example.com/", kind="clicks", top_n=-1)
@@ -0,0 +1,202 @@
+"""
+Tests for the heatmap response cache: LRU byte accounting, ETags and
+revalidation, and watermark-based invalidation
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from starlette.requests import Request
+
+from app.config import settings
+from app.services import heatmap_cache as cache_module
+from app.services.heatmap_cache import (
+    PAST_VERSION,
+    HeatmapCache,
+    IngestWatermarks,
+    cache_key,
+    cache_version,
+    cached_response,
+    etag_matches,
+    make_etag,
+    version_watermark,
+)
+
+PAGE = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(cache_module, "ingest_watermarks", IngestWatermarks())
+    cache_module.heatmap_cache.clear()
+    yield
+    cache_module.heatmap_cache.clear()
+
+
+def request(**headers: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [
+                (name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()
+            ],
+        }
+    )
+
+
+def key(endpoint: str = "clicks", end=None):
+    return cache_key(endpoint, PAGE, None, end)
+
+
+class TestHeatmapCache:
+    def test_tracks_bytes_on_put_replace_and_eviction(self):
+        cache = HeatmapCache(max_bytes=10, max_entries=10)
+        cache.put(key("a"), "v1", b"12345")
+        cache.put(key("b"), "v1", b"123")
+        assert cache.size_bytes == 8
+
+        cache.put(key("a"), "v2", b"1")  # Replacing frees the old body
+        assert cache.size_bytes == 4 and len(cache) == 2
+
+        cache.put(key("c"), "v1", b"1234567")  # 11 bytes: evicts the oldest (b)
+        assert cache.get(key("b"), "v1") is None
+        assert cache.size_bytes == 8 and len(cache) == 2
+
+    def test_evicts_least_recently_used_by_count(self):
+        cache = HeatmapCache(max_bytes=100, max_entries=2)
+        cache.put(key("a"), "v", b"a")
+        cache.put(key("b"), "v", b"b")
+        assert cache.get(key("a"), "v") == b"a"  # a is now most recent
+        cache.put(key("c"), "v", b"c")
+        assert cache.get(key("b"), "v") is None
+        assert cache.get(key("a"), "v") == b"a"
+        assert cache.size_bytes == 2
+
+    def test_oversized_bodies_are_not_stored(self):
+        cache = HeatmapCache(max_bytes=4, max_entries=10)
+        cache.put(key(), "v", b"12345")
+        assert len(cache) == 0 and cache.size_bytes == 0
+
+    def test_version_mismatch_drops_the_entry(self):
+        cache = HeatmapCache(max_bytes=100, max_entries=10)
+        cache.put(key(), "v1", b"body")
+        assert cache.get(key(), "v2") is None
+        assert len(cache) == 0 and cache.size_bytes == 0
+
+
+class TestEtags:
+    def test_matching(self):
+        etag = make_etag(key(), "v1")
+        assert etag.startswith('W/"')
+        assert etag_matches(etag, etag)
+        assert etag_matches(etag[2:], etag)  # Weak comparison
+        assert etag_matches(f'"other", {etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches(None, etag)
+        assert not etag_matches(make_etag(key(), "v2"), etag)
+
+    def test_etag_depends_on_key_and_version(self):
+        assert make_etag(key("clicks"), "v") != make_etag(key("scrolls"), "v")
+        assert make_etag(key(), "v1") != make_etag(key(), "v2")
+
+
+class TestVersions:
+    def test_bump_changes_live_version(self):
+        before = cache_version(key())
+        cache_module.ingest_watermarks.bump(PAGE)
+        assert cache_version(key()) != before
+
+    def test_past_ranges_ignore_bumps(self):
+        past = key(
+            end=datetime.utcnow() - timedelta(seconds=settings.HEATMAP_CACHE_SETTLE_SECONDS + 60)
+        )
+        assert cache_version(past) == PAST_VERSION
+        cache_module.ingest_watermarks.bump(PAGE)
+        assert cache_version(past) == PAST_VERSION
+
+    def test_live_version_expires_with_its_window(self, monkeypatch):
+        monkeypatch.setattr(settings, "HEATMAP_CACHE_LIVE_MAX_AGE_SECONDS", 60)
+        monkeypatch.setattr(cache_module.time, "time", lambda: 6000.0)
+        first = cache_version(key())
+        monkeypatch.setattr(cache_module.time, "time", lambda: 6059.0)
+        assert cache_version(key()) == first
+        monkeypatch.setattr(cache_module.time, "time", lambda: 6060.0)
+        assert cache_version(key()) != first
+
+    def test_version_watermark(self):
+        watermark = cache_module.ingest_watermarks.bump(PAGE)
+        assert version_watermark(cache_version(key())) == pytest.approx(watermark, abs=1e-6)
+        assert version_watermark(PAST_VERSION) is None
+
+    def test_group_follows_its_members(self):
+        group, member = uuid.uuid4(), uuid.uuid4()
+        watermarks = cache_module.ingest_watermarks
+        watermarks.set_members(group, [member])
+        before = watermarks.get(group)
+        assert watermarks.bump(member) > before
+        assert watermarks.get(group) == watermarks.get(member)
+
+    def test_observe_and_resync_only_advance(self):
+        watermarks = cache_module.ingest_watermarks
+        bumped = watermarks.bump(PAGE)
+        watermarks.observe(str(PAGE), bumped - 10)
+        assert watermarks.get(PAGE) == bumped
+        watermarks.resync()
+        assert watermarks.get(PAGE) >= bumped
+        assert watermarks.get(uuid.uuid4()) >= bumped
+
+
+class TestCachedResponse:
+    async def test_computes_once_then_serves_cached_and_304(self):
+        calls = []
+
+        async def compute(session):
+            calls.append(session)
+            return b'{"ok":true}'
+
+        first = await cached_response(request(), key(), compute)
+        assert first.status_code == 200 and first.body == b'{"ok":true}'
+        assert first.headers["cache-control"] == "private, no-cache"
+
+        second = await cached_response(request(), key(), compute)
+        assert second.body == first.body and len(calls) == 1
+
+        revalidated = await cached_response(
+            request(if_none_match=first.headers["etag"]), key(), compute
+        )
+        assert revalidated.status_code == 304 and len(calls) == 1
+
+    async def test_bump_invalidates(self):
+        calls = []
+
+        async def compute(session):
+            calls.append(session)
+            return b"%d" % len(calls)
+
+        first = await cached_response(request(), key(), compute)
+        cache_module.ingest_watermarks.bump(PAGE)
+        second = await cached_response(request(if_none_match=first.headers["etag"]), key(), compute)
+        assert second.status_code == 200 and second.body == b"2"
+        assert second.headers["etag"] != first.headers["etag"]
+
+    async def test_no_cache_request_recomputes(self):
+        calls = []
+
+        async def compute(session):
+            calls.append(session)
+            return b"x"
+
+        await cached_response(request(), key(), compute)
+        await cached_response(request(cache_control="no-cache"), key(), compute)
+        assert len(calls) == 2
+
+    async def test_past_ranges_are_immutable(self):
+        async def compute(session):
+            return b"x"
+
+        past = key(end=datetime.utcnow() - timedelta(days=30))
+        response = await cached_response(request(), past, compute)
+        assert "immutable" in response.headers["cache-control"]
@@ -0,0 +1,103 @@
+"""
+Tests for heatmap diffs: share changes per cell, their ordering and
+truncation, and the encoded response
+"""
+
+import uuid
+from datetime import datetime
+
+import numpy as np
+import orjson
+import pytest
+
+from app.config import settings
+from app.routes import heatmaps
+from app.routes.heatmaps import build_heatmap_diff, diff_cells
+from app.schemas.heatmap import HeatmapDiffResponse
+from app.services.page_groups import PageScope
+from app.services.segments import NO_FILTERS
+
+PAGE_ID = uuid.uuid4()
+PAGE = PageScope(PAGE_ID, "https://example.com/", None, (PAGE_ID,))
+SIDE_A = (datetime(2024, 5, 1), datetime(2024, 5, 2), NO_FILTERS)
+SIDE_B = (datetime(2024, 5, 8), datetime(2024, 5, 9), NO_FILTERS)
+
+
+def counts(*rows):
+    """Rows of (x, y, A count, B count)"""
+    return np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+
+class TestDiffCells:
+    def test_shares_and_deltas(self):
+        columns, total_a, total_b, truncated = diff_cells(counts((0, 0, 3, 1), (20, 0, 1, 3)), 10)
+        assert (total_a, total_b, truncated) == (4, 4, False)
+        assert columns["delta"].tolist() == [-2, 2]
+        assert columns["change"].tolist() == [-0.5, 0.5]
+
+    def test_ordered_by_absolute_change(self):
+        rows = counts((0, 0, 5, 5), (20, 0, 0, 4), (40, 0, 4, 0), (60, 0, 1, 1))
+        columns, _, _, _ = diff_cells(rows, 10)
+        changes = columns["change"].tolist()
+        assert [abs(change) for change in changes] == sorted(map(abs, changes), reverse=True)
+        # Ties keep their row order
+        assert list(zip(columns["x"].tolist(), changes))[:2] == [(20, 0.4), (40, -0.4)]
+
+    def test_zero_total_side(self):
+        columns, total_a, total_b, _ = diff_cells(counts((0, 0, 0, 2), (20, 0, 0, 6)), 10)
+        assert (total_a, total_b) == (0, 8)
+        assert columns["change"].tolist() == [0.75, 0.25]
+        assert columns["delta"].tolist() == [6, 2]
+
+    def test_truncated_to_the_most_changed(self):
+        rows = counts((0, 0, 1, 0), (20, 0, 0, 5), (40, 0, 2, 2))
+        columns, total_a, total_b, truncated = diff_cells(rows, 1)
+        assert truncated
+        assert columns["x"].tolist() == [20]
+        assert (total_a, total_b) == (3, 7)  # Totals count every cell
+
+    def test_no_cells(self):
+        columns, total_a, total_b, truncated = diff_cells(counts(), 10)
+        assert (total_a, total_b, truncated) == (0, 0, False)
+        assert all(len(column) == 0 for column in columns.values())
+
+
+class TestBuildHeatmapDiff:
+    @pytest.fixture
+    def fetched(self, monkeypatch):
+        rows = {"value": counts()}
+
+        async def fetch_heatmap_diff(db, model, page, grid_size, side_a, side_b):
+            return rows["value"]
+
+        monkeypatch.setattr(heatmaps, "fetch_heatmap_diff", fetch_heatmap_diff)
+        return rows
+
+    async def build(self):
+        body = await build_heatmap_diff(None, "clicks", PAGE, 20, SIDE_A, SIDE_B, "json")
+        return HeatmapDiffResponse.model_validate(orjson.loads(body))
+
+    async def test_json_response(self, fetched):
+        fetched["value"] = counts((0, 0, 3, 1), (20, 40, 1, 3), (40, 0, 0, 0))
+        diff = await self.build()
+        assert (diff.a.total, diff.b.total) == (4, 4)
+        assert diff.max_abs_change == 0.5
+        assert [(cell.x, cell.y, cell.delta) for cell in diff.cells] == [
+            (0, 0, -2),
+            (20, 40, 2),
+            (40, 0, 0),
+        ]
+        assert not diff.truncated
+
+    async def test_empty_diff(self, fetched):
+        diff = await self.build()
+        assert diff.max_abs_change == 0.0
+        assert diff.cells == [] and not diff.truncated
+
+    async def test_truncation_keeps_the_overall_maximum(self, fetched, monkeypatch):
+        monkeypatch.setattr(settings, "HEATMAP_DIFF_MAX_CELLS", 2)
+        fetched["value"] = counts((0, 0, 1, 0), (20, 0, 0, 5), (40, 0, 2, 2), (60, 0, 1, 1))
+        diff = await self.build()
+        assert diff.truncated and len(diff.cells) == 2
+        assert diff.max_abs_change == pytest.approx(abs(diff.cells[0].change))
+        assert diff.cells[0].x == 20
@@ -0,0 +1,115 @@
+"""
+Tests for the columnar heatmap encodings: binary and Arrow round trips,
+columnar JSON and format negotiation
+"""
+
+import json
+import struct
+from decimal import Decimal
+
+import numpy as np
+import pyarrow as pa
+import pytest
+from starlette.requests import Request
+
+from app.services.heatmap_formats import (
+    BINARY_MAGIC,
+    encode_columns,
+    int_column,
+    negotiate_format,
+)
+
+META = {"page": {"url": "https://example.com/"}, "max_count": 9}
+
+
+def columns():
+    return {
+        "x": int_column([10, 20, 30]),
+        "y": int_column([1, 2, 3]),
+        "count": np.array([9, 1, 4], dtype="<i8"),
+        "element_tag": ["a", None, "a"],
+    }
+
+
+def decode_binary(body: bytes):
+    """Reference decoder following the layout in encode_binary"""
+    assert body[:4] == BINARY_MAGIC
+    (header_length,) = struct.unpack_from("<I", body, 4)
+    header = json.loads(body[8 : 8 + header_length])
+    data_start = 8 + header_length + (-(8 + header_length) % 8)
+    decoded = {}
+    for spec in header.pop("columns"):
+        offset = data_start + spec["offset"]
+        assert offset % 8 == 0
+        array = np.frombuffer(body, dtype=spec["dtype"], count=spec["length"], offset=offset)
+        if "dictionary" in spec:
+            decoded[spec["name"]] = [
+                None if code < 0 else spec["dictionary"][code] for code in array
+            ]
+        else:
+            decoded[spec["name"]] = array.tolist()
+    return header, decoded
+
+
+def request(accept: str) -> Request:
+    return Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+
+
+class TestEncodings:
+    def test_binary_round_trip(self):
+        header, decoded = decode_binary(encode_columns("binary", META, columns()))
+        assert header == META
+        assert decoded == {
+            "x": [10, 20, 30],
+            "y": [1, 2, 3],
+            "count": [9, 1, 4],
+            "element_tag": ["a", None, "a"],
+        }
+
+    def test_binary_empty_columns(self):
+        empty = {"x": int_column([]), "element_tag": []}
+        header, decoded = decode_binary(encode_columns("binary", META, empty))
+        assert decoded == {"x": [], "element_tag": []}
+
+    def test_arrow_round_trip(self):
+        body = encode_columns("arrow", META, columns())
+        table = pa.ipc.open_stream(body).read_all()
+        assert json.loads(table.schema.metadata[b"heatmap"]) == META
+        assert table.column("x").type == pa.int32()
+        assert table.column("count").to_pylist() == [9, 1, 4]
+        assert pa.types.is_dictionary(table.column("element_tag").type)
+        assert table.column("element_tag").to_pylist() == ["a", None, "a"]
+
+    def test_columnar_json(self):
+        body = json.loads(encode_columns("columnar", META, columns()))
+        assert body["length"] == 3 and body["max_count"] == 9
+        assert body["data"]["y"] == [1, 2, 3]
+        assert body["data"]["element_tag"] == ["a", None, "a"]
+
+    def test_int_column_accepts_decimals_and_floats(self):
+        column = int_column([Decimal("3"), 4.0, 5])
+        assert column.dtype == np.dtype("<i4") and column.tolist() == [3, 4, 5]
+
+
+class TestNegotiateFormat:
+    @pytest.mark.parametrize(
+        "accept, expected",
+        [
+            ("", "json"),
+            ("*/*", "json"),
+            ("application/vnd.apache.arrow.stream", "arrow"),
+            ("application/json;q=0.5, application/vnd.heatmap.binary", "binary"),
+            ("application/vnd.heatmap.binary;q=0, application/json", "json"),
+            ("application/vnd.heatmap.columnar+json;q=0.9, application/json;q=0.9", "columnar"),
+            ("application/x-ndjson", "json"),  # Not among the default formats
+        ],
+    )
+    def test_accept_header(self, accept, expected):
+        assert negotiate_format(request(accept), None) == expected
+
+    def test_explicit_format_wins(self):
+        assert negotiate_format(request("application/vnd.heatmap.binary"), "arrow") == "arrow"
+
+    def test_extra_formats(self):
+        formats = ("json", "ndjson")
+        assert negotiate_format(request("application/x-ndjson"), None, formats) == "ndjson"
@@ -0,0 +1,120 @@
+"""
+Tests for heatmap frames: the frame range of a request and the split of
+the per-bucket cell counts into frames
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import orjson
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.routes import heatmaps
+from app.routes.heatmaps import build_heatmap_frames, frame_range
+from app.schemas.heatmap import HeatmapFramesResponse
+from app.services.page_groups import PageScope
+from app.services.segments import NO_FILTERS
+
+PAGE_ID = uuid.uuid4()
+PAGE = PageScope(PAGE_ID, "https://example.com/", None, (PAGE_ID,))
+START = datetime(2024, 5, 1)
+
+
+class TestFrameRange:
+    def test_partial_last_bucket_is_a_frame(self):
+        assert frame_range(START, START + timedelta(hours=2), "1h")[2] == 2
+        assert frame_range(START, START + timedelta(hours=2, minutes=1), "1h")[2] == 3
+        assert frame_range(START, START + timedelta(minutes=1), "1d")[2] == 1
+
+    def test_closed_range_keeps_its_end(self):
+        end = START + timedelta(minutes=95)
+        assert frame_range(START, end, "15m") == (START, end, 7)
+
+    def test_aware_dates_become_naive_utc(self):
+        offset = timezone(timedelta(hours=2))
+        start, end = datetime(2024, 5, 1, 2, tzinfo=offset), datetime(2024, 5, 1, 3, tzinfo=offset)
+        assert frame_range(start, end, "1h") == (START, START + timedelta(hours=1), 1)
+
+    def test_open_range_ends_with_the_current_bucket(self):
+        start = datetime.utcnow() - timedelta(minutes=90)
+        first = frame_range(start, None, "1h")
+        assert first == (start, start + timedelta(hours=2), 2)
+        # Requests later in the same bucket get the same range, so one key
+        assert frame_range(start, None, "1h") == first
+
+    @pytest.mark.parametrize(
+        "end",
+        [
+            START,
+            START - timedelta(hours=1),
+            START + timedelta(hours=settings.HEATMAP_MAX_FRAMES, minutes=1),
+        ],
+    )
+    def test_empty_or_too_long_ranges_are_rejected(self, end):
+        with pytest.raises(HTTPException) as rejected:
+            frame_range(START, end, "1h")
+        assert rejected.value.status_code == 422
+        assert rejected.value.detail["error"]["code"] == "VALIDATION_ERROR"
+
+    def test_longest_range(self):
+        end = START + timedelta(hours=settings.HEATMAP_MAX_FRAMES)
+        assert frame_range(START, end, "1h")[2] == settings.HEATMAP_MAX_FRAMES
+
+
+class TestBuildHeatmapFrames:
+    @pytest.fixture
+    def fetched(self, monkeypatch):
+        rows = {"value": np.zeros((0, 4), dtype=np.int64)}
+
+        async def fetch_heatmap_frames(db, model, page, start, end, length, grid_size, filters):
+            return rows["value"]
+
+        monkeypatch.setattr(heatmaps, "fetch_heatmap_frames", fetch_heatmap_frames)
+        return rows
+
+    async def build(self, frame_count: int, output_format: str = "json") -> dict:
+        end = START + timedelta(hours=frame_count)
+        body = await build_heatmap_frames(
+            None, "clicks", PAGE, START, end, "1h", frame_count, 20, NO_FILTERS, output_format
+        )
+        return orjson.loads(body)
+
+    async def test_cells_split_into_frames_with_empty_ones(self, fetched):
+        # Frame index, x, y, count; ordered by frame, frames 1 and 3 empty
+        fetched["value"] = np.array(
+            [[0, 0, 0, 2], [0, 20, 0, 1], [2, 40, 20, 5], [4, 0, 20, 1]], dtype=np.int64
+        )
+        response = HeatmapFramesResponse.model_validate(await self.build(5))
+        assert [frame.start for frame in response.frames] == [
+            START + timedelta(hours=i) for i in range(5)
+        ]
+        assert [frame.total for frame in response.frames] == [3, 0, 5, 0, 1]
+        assert [frame.cells for frame in response.frames] == [
+            [[0, 0, 2], [20, 0, 1]],
+            [],
+            [[40, 20, 5]],
+            [],
+            [[0, 20, 1]],
+        ]
+        assert response.max_count == 5 and response.bucket_seconds == 3600
+
+    async def test_trailing_empty_frames(self, fetched):
+        fetched["value"] = np.array([[0, 0, 0, 4]], dtype=np.int64)
+        frames = (await self.build(3))["frames"]
+        assert [frame["total"] for frame in frames] == [4, 0, 0]
+
+    async def test_no_rows(self, fetched):
+        response = HeatmapFramesResponse.model_validate(await self.build(3))
+        assert len(response.frames) == 3
+        assert all(frame.total == 0 and frame.cells == [] for frame in response.frames)
+        assert response.max_count == 0
+
+    async def test_columnar_frames(self, fetched):
+        fetched["value"] = np.array([[0, 0, 0, 2], [2, 40, 20, 5]], dtype=np.int64)
+        body = await self.build(3, "columnar")
+        assert len(body["frame_starts"]) == 3
+        assert body["data"]["frame"] == [0, 2]
+        assert body["data"]["count"] == [2, 5]
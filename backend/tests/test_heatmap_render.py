@@ -0,0 +1,141 @@
+"""
+Tests for heatmap rendering: binning, the Gaussian kernel, output shapes
+and colormap bounds
+"""
+
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from app.services.heatmap_render import (
+    COLORMAPS,
+    bin_points,
+    colormap_lut,
+    gaussian_blur,
+    gaussian_kernel,
+    render_density,
+)
+
+EXTENT = (1000.0, 500.0)
+SHAPE = (50, 100)  # (height, width): 10 page pixels per cell
+
+
+def points(*xy_weight):
+    xs, ys, weights = zip(*xy_weight) if xy_weight else ((), (), ())
+    return np.array(xs, float), np.array(ys, float), np.array(weights, float)
+
+
+def decode_png(body: bytes):
+    """Width, height and RGBA pixels of an unfiltered RGBA PNG"""
+    assert body[:8] == b"\x89PNG\r\n\x1a\n"
+    width, height = struct.unpack(">II", body[16:24])
+    position, data = 8, b""
+    while position < len(body):
+        (length,) = struct.unpack(">I", body[position : position + 4])
+        tag = body[position + 4 : position + 8]
+        if tag == b"IDAT":
+            data += body[position + 8 : position + 8 + length]
+        position += 12 + length
+    rows = np.frombuffer(zlib.decompress(data), np.uint8).reshape(height, width * 4 + 1)
+    assert not rows[:, 0].any()  # Filter type None on every scanline
+    return width, height, rows[:, 1:].reshape(height, width, 4)
+
+
+class TestBinning:
+    def test_points_land_in_their_cells(self):
+        grid = bin_points(*points((5, 5, 1), (15, 5, 2), (15, 8, 3), (999, 499, 4)), EXTENT, SHAPE)
+        assert grid.shape == SHAPE
+        assert grid[0, 0] == 1 and grid[0, 1] == 5 and grid[49, 99] == 4
+        assert grid.sum() == 10
+
+    def test_points_outside_the_extent_are_dropped(self):
+        grid = bin_points(*points((-1, 5, 1), (1000, 5, 1), (5, 500, 1), (5, 5, 1)), EXTENT, SHAPE)
+        assert grid.sum() == 1
+
+    def test_no_points(self):
+        assert not bin_points(*points(), EXTENT, SHAPE).any()
+
+
+class TestKernel:
+    @pytest.mark.parametrize("sigma", [0.3, 1.0, 2.5, 8.0])
+    def test_normalized_symmetric_and_truncated_at_three_sigma(self, sigma):
+        kernel = gaussian_kernel(sigma)
+        assert kernel.sum() == pytest.approx(1.0)
+        assert np.allclose(kernel, kernel[::-1])
+        assert len(kernel) == 2 * max(1, int(np.ceil(3 * sigma))) + 1
+        assert kernel.argmax() == len(kernel) // 2
+
+    def test_blur_keeps_mass_away_from_edges(self):
+        grid = np.zeros(SHAPE)
+        grid[25, 50] = 7.0
+        blurred = gaussian_blur(grid, 2.0)
+        assert blurred.shape == SHAPE
+        assert blurred.sum() == pytest.approx(7.0)
+        assert blurred[25, 50] == blurred.max() < 7.0
+        assert blurred[25, 48] == pytest.approx(blurred[25, 52])
+        assert blurred[23, 50] == pytest.approx(blurred[25, 48])
+
+    def test_zero_sigma_is_identity(self):
+        grid = np.arange(6.0).reshape(2, 3)
+        assert gaussian_blur(grid, 0) is grid
+
+
+class TestRender:
+    def args(self, output_format, **overrides):
+        xs, ys, weights = points((100, 100, 3), (105, 102, 1), (800, 400, 1))
+        return dict(
+            xs=xs,
+            ys=ys,
+            weights=weights,
+            extent=EXTENT,
+            shape=SHAPE,
+            sigma=1.5,
+            output_format=output_format,
+            **overrides,
+        )
+
+    def test_float32_densities(self):
+        body = render_density(**self.args("float32"))
+        density = np.frombuffer(body, "<f4").reshape(SHAPE)
+        assert density.sum() == pytest.approx(5.0, rel=1e-4)
+        assert (density >= 0).all()
+
+    def test_uint8_peaks_at_255(self):
+        intensity = np.frombuffer(render_density(**self.args("uint8")), np.uint8)
+        assert len(intensity) == SHAPE[0] * SHAPE[1]
+        assert intensity.max() == 255 and intensity.min() == 0
+
+    def test_empty_renders_transparent(self):
+        args = self.args("png")
+        args.update(zip(("xs", "ys", "weights"), points()))
+        width, height, rgba = decode_png(render_density(**args))
+        assert (width, height) == (SHAPE[1], SHAPE[0])
+        assert not rgba.any()
+
+    @pytest.mark.parametrize("colormap", sorted(COLORMAPS))
+    def test_png_colors_stay_within_the_colormap(self, colormap):
+        width, height, rgba = decode_png(render_density(**self.args("png", colormap=colormap)))
+        assert (width, height) == (SHAPE[1], SHAPE[0])
+        lut = colormap_lut(colormap)
+        colors = {tuple(color) for color in lut}
+        assert {tuple(pixel) for pixel in rgba.reshape(-1, 4)} <= colors
+        peak = rgba.reshape(-1, 4)[np.argmax(rgba[..., 3])]
+        assert tuple(peak) == tuple(lut[255])
+
+
+class TestColormaps:
+    @pytest.mark.parametrize("name", sorted(COLORMAPS))
+    def test_lut_bounds(self, name):
+        lut = colormap_lut(name)
+        assert lut.shape == (256, 4) and lut.dtype == np.uint8
+        assert not lut[0].any()  # Empty pixels are fully transparent
+        anchors = COLORMAPS[name]
+        assert tuple(lut[255]) == anchors[-1][1]
+        if anchors[0][1][3]:
+            assert tuple(lut[1]) != (0, 0, 0, 0)
+
+    def test_unknown_colormap(self):
+        with pytest.raises(KeyError):
+            colormap_lut("rainbow")
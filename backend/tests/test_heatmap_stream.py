@@ -0,0 +1,107 @@
+"""
+Tests for the streamed click heatmap: its chunks concatenate to the
+ClickHeatmapResponse shape (json) or to one point per line (ndjson)
+"""
+
+import math
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+import orjson
+import pytest
+
+from app.config import settings
+from app.database import ReadTarget
+from app.routes import heatmaps
+from app.routes.heatmaps import stream_click_heatmap
+from app.schemas.heatmap import ClickHeatmapResponse
+from app.services.page_groups import PageScope
+
+PAGE_ID = uuid.uuid4()
+PAGE = PageScope(PAGE_ID, "https://example.com/", "Home", (PAGE_ID,))
+START, END = datetime(2024, 5, 1), datetime(2024, 5, 2)
+
+Point = namedtuple("Point", ["x", "y", "click_count", "element_tag", "element_text"])
+
+PARTITIONS = {
+    "no rows": [],
+    "one partition": [[Point(10, 20, 3, "a", "Buy"), Point(15, 20, 1, None, None)]],
+    "several partitions": [
+        [Point(10, 20, 3, "a", "Buy")],
+        [Point(15, 20, 1, None, None), Point(0, 0, 7, "button", 'Say "hi"')],
+        [Point(99, 5, 2, "div", None)],
+    ],
+}
+
+
+class FakeResult:
+    def __init__(self, partitions):
+        self._partitions = partitions
+
+    async def partitions(self):
+        for rows in self._partitions:
+            yield rows
+
+
+class FakeSession:
+    def __init__(self, partitions, streamed):
+        self._partitions = partitions
+        self._streamed = streamed
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def stream(self, query):
+        self._streamed.append(query)
+        return FakeResult(self._partitions)
+
+
+@pytest.fixture
+def stub_stream(monkeypatch):
+    """Streams the given partitions; returns the streamed queries"""
+    streamed = []
+
+    def stub(partitions):
+        async def read_target():
+            return ReadTarget(lambda: FakeSession(partitions, streamed), math.inf)
+
+        monkeypatch.setattr(heatmaps, "read_target", read_target)
+        return streamed
+
+    return stub
+
+
+async def body(output_format: str) -> bytes:
+    chunks = [chunk async for chunk in stream_click_heatmap(PAGE, START, END, output_format)]
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    return b"".join(chunks)
+
+
+def points(partitions) -> list:
+    return [point._asdict() for rows in partitions for point in rows]
+
+
+@pytest.mark.parametrize("case", sorted(PARTITIONS))
+class TestStreamClickHeatmap:
+    async def test_json_is_a_click_heatmap_response(self, stub_stream, case):
+        streamed = stub_stream(PARTITIONS[case])
+        decoded = orjson.loads(await body("json"))
+        response = ClickHeatmapResponse.model_validate(decoded)
+        expected = points(PARTITIONS[case])
+        assert decoded["heatmap_data"] == expected
+        assert response.page.total_clicks == sum(point["click_count"] for point in expected)
+        assert response.page.url == PAGE.url and response.page.title == PAGE.title
+        assert (response.date_range.start, response.date_range.end) == (START, END)
+        assert response.grid_size is None and response.top_elements is None
+        assert not response.truncated and response.sampling_rate == 1.0
+        (query,) = streamed
+        assert query.get_execution_options()["yield_per"] == settings.HEATMAP_STREAM_CHUNK_ROWS
+
+    async def test_ndjson_is_one_point_per_line(self, stub_stream, case):
+        stub_stream(PARTITIONS[case])
+        lines = (await body("ndjson")).splitlines()
+        assert [orjson.loads(line) for line in lines] == points(PARTITIONS[case])
@@ -0,0 +1,76 @@
+"""
+Tests for the HyperLogLog sketches: estimate error bounds, merging and
+serialization
+"""
+
+import uuid
+
+import numpy as np
+import pytest
+
+from app.services import hll
+
+PRECISION = 12
+
+
+def uuids(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [uuid.UUID(bytes=rng.bytes(16)) for _ in range(count)]
+
+
+def sketch_of(values) -> np.ndarray:
+    registers = hll.empty(PRECISION)
+    hll.add_hashes(registers, hll.hash_uuids(values))
+    return registers
+
+
+class TestEstimate:
+    def test_empty_sketch_is_zero(self):
+        assert hll.estimate(hll.empty(PRECISION)) == 0
+
+    def test_small_cardinalities_are_near_exact(self):
+        for count in (1, 10, 100):
+            assert abs(hll.estimate(sketch_of(uuids(count))) - count) <= max(1, count * 0.01)
+
+    @pytest.mark.parametrize("count", [5_000, 50_000])
+    def test_within_error_bound(self, count):
+        estimate = hll.estimate(sketch_of(uuids(count, seed=count)))
+        # Four standard errors: a false failure is about 1 in 16,000
+        assert abs(estimate - count) <= 4 * hll.relative_error(PRECISION) * count
+
+    def test_duplicates_change_nothing(self):
+        values = uuids(1000)
+        once = sketch_of(values)
+        twice = sketch_of(values + values)
+        assert np.array_equal(once, twice)
+
+    def test_scalar_and_vectorized_add_agree(self):
+        values = uuids(500)
+        registers = hll.empty(PRECISION)
+        for value in values:
+            hll.add(registers, value)
+        assert np.array_equal(registers, sketch_of(values))
+
+
+class TestMerge:
+    def test_merge_is_the_union(self):
+        left, right = uuids(3000, seed=1), uuids(3000, seed=2)
+        overlap = left[:1000]
+        merged = hll.merge([sketch_of(left), sketch_of(right + overlap)])
+        assert np.array_equal(merged, sketch_of(left + right))
+        assert abs(hll.estimate(merged) - 6000) <= 4 * hll.relative_error(PRECISION) * 6000
+
+    def test_merge_of_one_is_a_copy(self):
+        registers = sketch_of(uuids(10))
+        merged = hll.merge([registers])
+        merged[:] = 0
+        assert registers.any()
+
+    def test_round_trip_bytes(self):
+        registers = sketch_of(uuids(100))
+        data = hll.to_bytes(registers)
+        assert len(data) == 1 << PRECISION
+        restored = hll.from_bytes(data)
+        assert np.array_equal(restored, registers)
+        assert hll.precision_of(restored) == PRECISION
+        restored[0] = 63  # Writable, unlike a plain frombuffer view
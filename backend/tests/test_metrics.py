@@ -0,0 +1,149 @@
+"""
+Tests for the metrics registry: exposition format, label escaping and
+histogram buckets, and webhook delivery metrics
+"""
+
+import httpx
+import pytest
+
+from app.services import connected_one_service
+from app.services.connected_one_service import ConnectedOneService
+from app.services.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    webhook_deliveries,
+    webhook_delivery_duration,
+)
+
+
+def sample_lines(metric) -> list:
+    return list(metric.samples())
+
+
+class TestExposition:
+    def test_label_values_are_escaped(self):
+        counter = Counter("test_total", "Test", ("path",))
+        counter.inc('a"b\\c\nd')
+        assert sample_lines(counter) == ['test_total{path="a\\"b\\\\c\\nd"} 1']
+
+    def test_values(self):
+        gauge = Gauge(
+            "test_gauge",
+            "Test",
+            ("kind",),
+            collect=lambda: [(("int",), 3.0), (("float",), 0.25), (("inf",), float("inf"))],
+        )
+        assert sample_lines(gauge) == [
+            'test_gauge{kind="int"} 3',
+            'test_gauge{kind="float"} 0.25',
+            'test_gauge{kind="inf"} +Inf',
+        ]
+
+    def test_unlabelled_counter(self):
+        counter = Counter("test_total", "Test")
+        counter.inc(amount=2.5)
+        counter.inc()
+        assert counter.value() == 3.5
+        assert sample_lines(counter) == ["test_total 3.5"]
+
+    def test_registry_renders_help_and_type(self):
+        registry = MetricsRegistry()
+        registry.register(Counter("a_total", "Things counted", ("x",))).inc("1")
+        registry.register(Gauge("b", "Uncollected"))
+        assert registry.render() == (
+            "# HELP a_total Things counted\n"
+            "# TYPE a_total counter\n"
+            'a_total{x="1"} 1\n'
+            "# HELP b Uncollected\n"
+            "# TYPE b gauge\n"
+        )
+
+    def test_names_are_unique(self):
+        registry = MetricsRegistry()
+        registry.register(Counter("a_total", "A"))
+        with pytest.raises(ValueError):
+            registry.register(Counter("a_total", "A again"))
+
+
+class TestHistogram:
+    def test_cumulative_buckets_sum_and_count(self):
+        histogram = Histogram("latency_seconds", "Test", ("route",), buckets=(1.0, 0.1, 0.5))
+        for value in (0.05, 0.1, 0.3, 2.0):
+            histogram.observe(value, "/x")
+        assert sample_lines(histogram) == [
+            'latency_seconds_bucket{route="/x",le="0.1"} 2',
+            'latency_seconds_bucket{route="/x",le="0.5"} 3',
+            'latency_seconds_bucket{route="/x",le="1"} 3',
+            'latency_seconds_bucket{route="/x",le="+Inf"} 4',
+            'latency_seconds_sum{route="/x"} 2.45',
+            'latency_seconds_count{route="/x"} 4',
+        ]
+
+    def test_bounds_are_inclusive(self):
+        histogram = Histogram("h", "Test", buckets=(1.0, 2.0))
+        histogram.observe(1.0)
+        histogram.observe(2.0)
+        assert sample_lines(histogram)[:3] == [
+            'h_bucket{le="1"} 1',
+            'h_bucket{le="2"} 2',
+            'h_bucket{le="+Inf"} 2',
+        ]
+
+    def test_series_are_separate(self):
+        histogram = Histogram("h", "Test", ("route",), buckets=(1.0,))
+        histogram.observe(0.5, "/a")
+        histogram.observe(5.0, "/b")
+        lines = sample_lines(histogram)
+        assert 'h_count{route="/a"} 1' in lines and 'h_count{route="/b"} 1' in lines
+        assert 'h_bucket{route="/b",le="1"} 0' in lines
+
+
+def refuse(request: httpx.Request) -> httpx.Response:
+    raise httpx.ConnectError("refused", request=request)
+
+
+class TestConnectedOneDeliveries:
+    @pytest.fixture
+    def respond(self, monkeypatch):
+        """Route the service's HTTP client to a handler"""
+
+        client = httpx.AsyncClient
+
+        def install(handler):
+            transport = httpx.MockTransport(handler)
+            monkeypatch.setattr(
+                connected_one_service.httpx,
+                "AsyncClient",
+                lambda **kwargs: client(transport=transport, **kwargs),
+            )
+
+        return install
+
+    def delivered(self) -> int:
+        count = [
+            line
+            for line in webhook_delivery_duration.samples()
+            if line.startswith('heatmap_webhook_delivery_seconds_count{target="connected_one"}')
+        ]
+        return int(count[0].rsplit(" ", 1)[1]) if count else 0
+
+    @pytest.mark.parametrize(
+        "handler, outcome",
+        [
+            (lambda request: httpx.Response(200, json={"ok": True}), "success"),
+            (lambda request: httpx.Response(502), "http_error"),
+            (refuse, "error"),
+        ],
+    )
+    async def test_outcome_and_latency_are_recorded(self, respond, handler, outcome):
+        respond(handler)
+        before = webhook_deliveries.value("connected_one", outcome), self.delivered()
+        service = ConnectedOneService(api_key="test", base_url="https://c1.example.com")
+        try:
+            await service.send_heatmap_event("project", {"event": "click"})
+        except httpx.HTTPError:
+            assert outcome != "success"
+        after = webhook_deliveries.value("connected_one", outcome), self.delivered()
+        assert after == (before[0] + 1, before[1] + 1)
@@ -0,0 +1,159 @@
+"""
+Tests for the page stats counters: the delta buffer, its batched flush and
+the scroll session marker of the scroll ingest path
+"""
+
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from app.routes import events
+from app.schemas.event import ScrollEventBatch
+from app.services import page_stats
+from app.services.page_stats import COUNTERS, PageStatsBuffer
+
+NOW = datetime(2024, 5, 1, 12)
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    test_buffer = PageStatsBuffer()
+    monkeypatch.setattr(page_stats, "page_stats_buffer", test_buffer)
+    return test_buffer
+
+
+class FakeEngine:
+    """Records the executemany of each begin(); fails it when asked to"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.executed = []
+
+    @asynccontextmanager
+    async def begin(self):
+        yield self
+
+    async def execute(self, statement, rows):
+        if self.fail:
+            raise ConnectionError("connection lost")
+        self.executed.append(rows)
+
+
+class TestBuffer:
+    def test_counts_add_up_and_keep_the_latest_activity(self, buffer):
+        page_id = uuid.uuid4()
+        buffer.add(page_id, NOW, clicks=3)
+        buffer.add(page_id, NOW - timedelta(hours=1), clicks=2, scrolls=1)
+        (delta,) = buffer.take().values()
+        assert (delta.clicks, delta.scrolls, delta.sessions) == (5, 1, 0)
+        assert delta.last_event_at == NOW
+        assert len(buffer) == 0
+
+    def test_future_activity_is_clamped(self, buffer):
+        buffer.add(uuid.uuid4(), datetime.utcnow() + timedelta(days=1), sessions=1)
+        (delta,) = buffer.take().values()
+        assert delta.last_event_at <= datetime.utcnow()
+
+    def test_restore_merges_into_newer_deltas(self, buffer):
+        page_id = uuid.uuid4()
+        buffer.add(page_id, NOW - timedelta(hours=1), clicks=2)
+        failed = buffer.take()
+        buffer.add(page_id, NOW, clicks=1, scroll_sessions=1)
+        buffer.restore(failed)
+        (delta,) = buffer.take().values()
+        assert (delta.clicks, delta.scroll_sessions) == (3, 1)
+        assert delta.last_event_at == NOW
+
+
+class TestFlush:
+    async def test_one_batched_update_in_key_order(self, buffer, monkeypatch):
+        engine = FakeEngine()
+        monkeypatch.setattr(page_stats, "admin_engine", engine)
+        page_ids = [uuid.uuid4() for _ in range(3)]
+        for page_id in page_ids:
+            buffer.add(page_id, NOW, clicks=1)
+        buffer.add(page_ids[0], NOW, clicks=1, scroll_sessions=1)
+
+        assert await page_stats.flush_page_stats() == 3
+        (rows,) = engine.executed
+        assert [row["b_page_id"] for row in rows] == sorted(page_ids)
+        first = next(row for row in rows if row["b_page_id"] == page_ids[0])
+        assert first["b_clicks"] == 2 and first["b_scroll_sessions"] == 1
+        assert set(first) == {"b_page_id", "b_last_event_at", *(f"b_{c}" for c in COUNTERS)}
+        assert len(buffer) == 0
+
+    async def test_nothing_buffered(self, buffer, monkeypatch):
+        engine = FakeEngine()
+        monkeypatch.setattr(page_stats, "admin_engine", engine)
+        assert await page_stats.flush_page_stats() == 0
+        assert engine.executed == []
+
+    async def test_failed_flush_keeps_the_deltas(self, buffer, monkeypatch):
+        monkeypatch.setattr(page_stats, "admin_engine", FakeEngine(fail=True))
+        page_id = uuid.uuid4()
+        buffer.add(page_id, NOW, clicks=4)
+        with pytest.raises(ConnectionError):
+            await page_stats.flush_page_stats()
+        assert buffer.take()[page_id].clicks == 4
+
+
+class ScrollDb:
+    """Session whose marker insert returns a row only for the first batch"""
+
+    def __init__(self):
+        self.markers = set()
+
+    async def scalar(self, statement):
+        params = statement.compile().params
+        marker = (params["page_id"], params["session_id"])
+        if marker in self.markers:
+            return None  # ON CONFLICT DO NOTHING: nothing returned
+        self.markers.add(marker)
+        return marker[0]
+
+    def add_all(self, rows):
+        pass
+
+    async def commit(self):
+        pass
+
+
+class TestScrollSessions:
+    @pytest.fixture
+    def page(self, monkeypatch):
+        page = SimpleNamespace(id=uuid.uuid4())
+
+        async def get_page_by_url(db, url):
+            return page
+
+        async def session_segment(db, session_id):
+            return SimpleNamespace(user_id=uuid.uuid4())
+
+        monkeypatch.setattr(events, "get_page_by_url", get_page_by_url)
+        monkeypatch.setattr(events, "session_segment", session_segment)
+        monkeypatch.setattr(events, "record_scroll_events", lambda *args: None)
+        monkeypatch.setattr(events, "ingest_watermarks", SimpleNamespace(bump=lambda scope: None))
+        return page
+
+    def batch(self, session_id, count: int = 2) -> ScrollEventBatch:
+        event = {"depth_percent": 40, "max_scroll_y": 400, "page_height": 1000}
+        return ScrollEventBatch(
+            session_id=session_id,
+            page_url="https://example.com/",
+            events=[{**event, "timestamp": NOW} for _ in range(count)],
+        )
+
+    async def test_a_session_is_counted_by_its_first_batch_only(self, buffer, page):
+        db = ScrollDb()
+        first, second = uuid.uuid4(), uuid.uuid4()
+        for session_id in (first, first, second, first):
+            response = await events.create_scroll_events(self.batch(session_id), db)
+            assert orjson.loads(response.body)["inserted"] == 2
+
+        delta = buffer.take()[page.id]
+        assert delta.scrolls == 8
+        assert delta.scroll_sessions == 2
@@ -0,0 +1,43 @@
+"""
+Tests for session sampling: sample keys and thresholds
+"""
+
+import uuid
+
+import pytest
+
+from app.services.sampling import SAMPLE_KEYS, sample_key, sample_threshold
+
+
+class TestSampling:
+    # Computed by Postgres with SAMPLE_KEY_SQL, which backfills must agree with
+    @pytest.mark.parametrize(
+        "session_id, key",
+        [
+            ("00000000-0000-0000-0000-000000000001", 4862),
+            ("ffffffff-ffff-ffff-ffff-ffffffffffff", 4477),
+            ("9b2e3f4a-1c5d-4e6f-8a7b-0c1d2e3f4a5b", 9541),
+        ],
+    )
+    def test_sample_key_matches_postgres(self, session_id, key):
+        assert sample_key(uuid.UUID(session_id)) == key
+
+    def test_sample_keys_are_uniform(self):
+        keys = [sample_key(uuid.UUID(int=i)) for i in range(20000)]
+        assert all(0 <= key < SAMPLE_KEYS for key in keys)
+        below = sum(key < SAMPLE_KEYS // 10 for key in keys)
+        assert 1700 < below < 2300  # 10% of 20,000, within 5 standard deviations
+
+    @pytest.mark.parametrize(
+        "accuracy, threshold",
+        [
+            (None, None),
+            (1.0, None),
+            (0.5, 5000),
+            (0.01, 100),
+            (0.000001, 1),  # At least one key
+            (0.99999, SAMPLE_KEYS - 1),  # Below 1 always samples
+        ],
+    )
+    def test_sample_threshold(self, accuracy, threshold):
+        assert sample_threshold(accuracy) == threshold
@@ -0,0 +1,93 @@
+"""
+Tests for audience segments: filter parsing and conditions, and the
+session segment LRU
+"""
+
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+
+from app.models.click_event import ClickEvent
+from app.services.segments import (
+    NO_FILTERS,
+    EventFilters,
+    SessionSegment,
+    SessionSegmentCache,
+    event_filters,
+    normalize,
+)
+
+
+def compiled(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+def segment(device_type: str = "mobile") -> SessionSegment:
+    return SessionSegment(uuid.uuid4(), device_type, "firefox", False)
+
+
+class TestSessionSegmentCache:
+    def test_evicts_least_recently_used(self):
+        cache = SessionSegmentCache(max_entries=2)
+        a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        cache.put(a, segment("a"))
+        cache.put(b, segment("b"))
+        assert cache.get(a).device_type == "a"  # a is now most recent
+        cache.put(c, segment("c"))
+        assert cache.get(b) is None
+        assert cache.get(a) is not None and cache.get(c) is not None
+        assert len(cache) == 2
+
+    def test_clear(self):
+        cache = SessionSegmentCache(max_entries=2)
+        cache.put(uuid.uuid4(), segment())
+        cache.clear()
+        assert len(cache) == 0
+
+
+class TestEventFilters:
+    def test_normalize(self):
+        assert normalize("  Mobile ") == "mobile"
+        assert normalize("   ") is None
+        assert normalize(None) is None
+
+    def test_dependency_normalizes_and_samples(self):
+        filters = event_filters("tablet", " Desktop", "Chrome", True, 0.25)
+        assert filters == EventFilters("tablet", "desktop", "chrome", True, 2500)
+        assert filters.sampling_rate == 0.25
+
+    def test_unknown_breakpoint_is_rejected(self):
+        with pytest.raises(HTTPException) as rejected:
+            event_filters("watch", None, None, None, 1.0)
+        assert rejected.value.status_code == 422
+
+    def test_no_filters(self):
+        assert event_filters(None, None, None, None, 1.0) == NO_FILTERS
+        assert NO_FILTERS.conditions(ClickEvent) == []
+        assert NO_FILTERS.cache_params() == {}
+        assert NO_FILTERS.sampling_rate == 1.0
+        query = select(func.count()).select_from(ClickEvent)
+        assert NO_FILTERS.apply(query, ClickEvent) is query
+
+    def test_conditions_and_cache_params(self):
+        filters = EventFilters(device_type="mobile", returning=False, sample_below=100)
+        sql = [compiled(condition) for condition in filters.conditions(ClickEvent)]
+        assert sql == [
+            "click_events.device_type = %(device_type_1)s",
+            "click_events.is_returning = false",
+            "click_events.sample_key < %(sample_key_1)s",
+        ]
+        assert filters.cache_params() == {
+            "device_type": "mobile",
+            "returning": False,
+            "sample_below": 100,
+        }
+
+    def test_scaled_counts(self):
+        count = func.count()
+        assert NO_FILTERS.scaled(count) is count
+        scaled = EventFilters(sample_below=2500).scaled(count)
+        assert "count(*) * %(count_1)s + %(param_1)s" in compiled(scaled)
@@ -0,0 +1,260 @@
+"""
+Tests for the shared result cache: entry encoding, the RESP client and its
+recovery from timeouts, and resubscription after a dropped connection
+"""
+
+import asyncio
+import zlib
+from typing import Dict, List, Optional
+
+import pytest
+
+from app.services.shared_cache import (
+    RedisBackend,
+    RespError,
+    SharedCache,
+    _RespConnection,
+    decode_entry,
+    decode_invalidations,
+    encode_entry,
+    encode_invalidations,
+)
+
+
+class FakeRespServer:
+    """Redis-protocol server on localhost with per-key reply delays"""
+
+    def __init__(self):
+        self.store: Dict[bytes, bytes] = {}
+        self.delays: Dict[bytes, float] = {}
+        self.subscribers: List[asyncio.StreamWriter] = []
+        self.connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: List[asyncio.Task] = []
+
+    async def __aenter__(self) -> "FakeRespServer":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._server.close()
+        for handler in self._handlers:
+            handler.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"redis://{host}:{port}/0"
+
+    def drop_subscribers(self) -> None:
+        for writer in self.subscribers:
+            writer.close()
+        self.subscribers.clear()
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> List[bytes]:
+        count = int((await reader.readuntil(b"\r\n"))[1:-2])
+        args = []
+        for _ in range(count):
+            length = int((await reader.readuntil(b"\r\n"))[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self._handlers.append(asyncio.current_task())
+        try:
+            while True:
+                command, *args = await self._read_command(reader)
+                await asyncio.sleep(self.delays.get(args[0] if args else b"", 0))
+                if command == b"GET":
+                    value = self.store.get(args[0])
+                    reply = b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+                elif command == b"SET":
+                    self.store[args[0]] = args[1]
+                    reply = b"+OK\r\n"
+                elif command == b"SUBSCRIBE":
+                    self.subscribers.append(writer)
+                    reply = b"*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:1\r\n" % (
+                        len(args[0]),
+                        args[0],
+                    )
+                else:
+                    reply = b"-ERR unknown command\r\n"
+                writer.write(reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def reader_with(data: bytes) -> _RespConnection:
+    conn = _RespConnection("redis://localhost:6379/0")
+    conn._reader = asyncio.StreamReader()
+    conn._reader.feed_data(data)
+    conn._reader.feed_eof()
+    return conn
+
+
+def listening_cache(backend, timeout: float = 0.05) -> SharedCache:
+    backend.listening = True  # Reads only; no subscriber task
+    return SharedCache(backend, compress_min_bytes=64, timeout=timeout, notify_interval=1.0)
+
+
+class TestEntries:
+    def test_round_trip_raw(self):
+        value = encode_entry("123.000001", b'{"a":1}', compress_min_bytes=1024)
+        assert value[:1] == b"0"
+        assert decode_entry(value) == ("123.000001", b'{"a":1}')
+
+    def test_round_trip_compressed(self):
+        body = b'{"points":[' + b"[1,2,3]," * 500 + b"]}"
+        value = encode_entry("past", body, compress_min_bytes=1024)
+        assert value[:1] == b"1"
+        assert len(value) < len(body)
+        assert decode_entry(value) == ("past", body)
+
+    def test_body_may_contain_newlines(self):
+        assert decode_entry(encode_entry("v", b"a\nb\n", 1024)) == ("v", b"a\nb\n")
+
+    def test_corrupt_compressed_body_raises(self):
+        with pytest.raises(zlib.error):
+            decode_entry(b"1v\nnot zlib")
+
+    def test_invalidations_round_trip_and_split(self):
+        pending = {f"scope-{i:04d}": 1000.0 + i for i in range(1000)}
+        messages = encode_invalidations(pending)
+        assert len(messages) > 1
+        assert all(len(message) <= 7000 for message in messages)
+        decoded = [pair for message in messages for pair in decode_invalidations(message)]
+        assert dict(decoded) == pytest.approx(pending)
+
+    def test_malformed_invalidations_are_skipped(self):
+        assert decode_invalidations("a=1.5,b=oops,c=2") == [("a", 1.5), ("c", 2.0)]
+
+
+class TestRespParsing:
+    async def test_scalar_replies(self):
+        conn = reader_with(b"+OK\r\n:42\r\n$5\r\nhello\r\n$-1\r\n*-1\r\n")
+        assert await conn.read_reply() == "OK"
+        assert await conn.read_reply() == 42
+        assert await conn.read_reply() == b"hello"
+        assert await conn.read_reply() is None
+        assert await conn.read_reply() is None
+
+    async def test_binary_bulk_with_crlf(self):
+        conn = reader_with(b"$4\r\na\r\nb\r\n")
+        assert await conn.read_reply() == b"a\r\nb"
+
+    async def test_nested_arrays(self):
+        conn = reader_with(b"*2\r\n$7\r\nmessage\r\n*2\r\n:1\r\n$0\r\n\r\n")
+        assert await conn.read_reply() == [b"message", [1, b""]]
+
+    async def test_error_reply(self):
+        with pytest.raises(RespError, match="ERR wrong type"):
+            await reader_with(b"-ERR wrong type\r\n").read_reply()
+
+    async def test_unknown_reply_type(self):
+        with pytest.raises(RespError):
+            await reader_with(b"%1\r\n").read_reply()
+
+    async def test_truncated_reply(self):
+        with pytest.raises(asyncio.IncompleteReadError):
+            await reader_with(b"$10\r\nshort").read_reply()
+
+
+class TestRedisBackend:
+    async def test_get_and_set(self):
+        async with FakeRespServer() as server:
+            backend = RedisBackend(server.url, "channel")
+            await backend.set("k", b"value", 60)
+            assert await backend.get("k") == b"value"
+            assert await backend.get("missing") is None
+            await backend.stop()
+
+    async def test_timed_out_get_does_not_answer_the_next_command(self):
+        async with FakeRespServer() as server:
+            server.store[b"result_cache:pageA"] = encode_entry("past", b'{"page":"A"}', 1024)
+            server.store[b"result_cache:pageB"] = encode_entry("past", b'{"page":"B"}', 1024)
+            server.delays[b"result_cache:pageB"] = 0.2
+            backend = RedisBackend(server.url, "channel")
+            cache = listening_cache(backend)
+
+            assert await cache.get("pageB") is None  # Timed out
+            await asyncio.sleep(0.3)  # The late reply arrives on the abandoned connection
+            assert await cache.get("pageC") is None
+            assert await cache.get("pageA") == ("past", b'{"page":"A"}')
+            assert server.connections == 2
+            await backend.stop()
+
+    async def test_timed_out_set_does_not_break_the_next_get(self):
+        async with FakeRespServer() as server:
+            server.delays[b"result_cache:slow"] = 0.2
+            backend = RedisBackend(server.url, "channel")
+            cache = listening_cache(backend)
+
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(backend.set("slow", b"x", 60), 0.05)
+            await asyncio.sleep(0.3)  # +OK arrives on the abandoned connection
+            assert await cache.get("other") is None
+            await backend.stop()
+
+    async def test_non_bulk_reply_is_a_miss(self):
+        conn = reader_with(b":1\r\n")
+        backend = RedisBackend("redis://localhost:6379/0", "channel")
+        backend._conn = conn
+        conn._writer = _NullWriter()
+        assert await listening_cache(backend).get("k") is None
+
+    async def test_undecodable_entry_is_a_miss(self):
+        async with FakeRespServer() as server:
+            server.store[b"result_cache:bad"] = b"1v\nnot zlib"
+            backend = RedisBackend(server.url, "channel")
+            assert await listening_cache(backend).get("bad") is None
+            await backend.stop()
+
+    async def test_reads_are_skipped_while_not_subscribed(self):
+        async with FakeRespServer() as server:
+            server.store[b"result_cache:k"] = encode_entry("past", b"{}", 1024)
+            backend = RedisBackend(server.url, "channel")
+            cache = listening_cache(backend)
+            backend.listening = False
+            assert await cache.get("k") is None
+            assert server.connections == 0
+            await backend.stop()
+
+    async def test_resubscribe_after_disconnect_resyncs(self):
+        async with FakeRespServer() as server:
+            backend = RedisBackend(server.url, "channel")
+            resyncs = []
+            await backend.start(lambda message: None, lambda: resyncs.append(True))
+            await _until(lambda: backend.listening)
+            assert resyncs == []
+
+            server.drop_subscribers()
+            await _until(lambda: not backend.listening)
+            await _until(lambda: backend.listening, timeout=3.0)
+            assert resyncs == [True]
+            await backend.stop()
+            assert not backend.listening
+
+
+class _NullWriter:
+    def write(self, data: bytes) -> None:
+        pass
+
+    async def drain(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+async def _until(condition, timeout: float = 1.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            raise AssertionError("condition not reached")
+        await asyncio.sleep(0.01)
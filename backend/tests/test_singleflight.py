@@ -0,0 +1,107 @@
+"""
+Tests for singleflight: coalescing, shared errors and cancellation
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+class Computation:
+    """Coroutine factory counting its runs, finishing when released"""
+
+    def __init__(self, result=None, error: Exception = None):
+        self.result = result
+        self.error = error
+        self.runs = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.runs += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def settle() -> None:
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+class TestSingleFlight:
+    async def test_concurrent_callers_share_one_run(self):
+        flights = SingleFlight("test")
+        compute = Computation(result=42)
+        callers = [asyncio.create_task(flights.do("k", compute)) for _ in range(5)]
+        await settle()
+        assert len(flights) == 1
+
+        compute.release.set()
+        assert await asyncio.gather(*callers) == [42] * 5
+        assert compute.runs == 1 and len(flights) == 0
+
+    async def test_distinct_keys_run_separately(self):
+        flights = SingleFlight("test")
+        first, second = Computation(result=1), Computation(result=2)
+        first.release.set()
+        second.release.set()
+        assert await asyncio.gather(flights.do("a", first), flights.do("b", second)) == [1, 2]
+
+    async def test_finished_key_runs_again(self):
+        flights = SingleFlight("test")
+        compute = Computation(result="x")
+        compute.release.set()
+        await flights.do("k", compute)
+        await flights.do("k", compute)
+        assert compute.runs == 2
+
+    async def test_errors_reach_every_caller_and_are_not_kept(self):
+        flights = SingleFlight("test")
+        compute = Computation(error=ValueError("boom"))
+        callers = [asyncio.create_task(flights.do("k", compute)) for _ in range(3)]
+        await settle()
+        compute.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert compute.runs == 1 and len(flights) == 0
+
+    async def test_cancelled_caller_leaves_the_run_to_the_others(self):
+        flights = SingleFlight("test")
+        compute = Computation(result="ok")
+        leaving = asyncio.create_task(flights.do("k", compute))
+        staying = asyncio.create_task(flights.do("k", compute))
+        await settle()
+
+        leaving.cancel()
+        await settle()
+        assert compute.cancelled == 0
+        compute.release.set()
+        assert await staying == "ok"
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        assert compute.runs == 1
+
+    async def test_run_is_cancelled_when_every_caller_leaves(self):
+        flights = SingleFlight("test")
+        compute = Computation(result="late")
+        callers = [asyncio.create_task(flights.do("k", compute)) for _ in range(2)]
+        await settle()
+
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await settle()
+        assert compute.cancelled == 1 and len(flights) == 0
+
+        # A new caller starts afresh rather than joining the cancelled run
+        compute.release.set()
+        assert await flights.do("k", compute) == "late"
+        assert compute.runs == 2
@@ -0,0 +1,96 @@
+"""
+Tests for page URL normalization and page group patterns
+"""
+
+import re
+
+import pytest
+
+from app.services.page_groups import normalize_pattern, pattern_regex
+from app.services.urls import is_tracking_param, normalize_url
+
+
+class TestNormalizeUrl:
+    @pytest.mark.parametrize(
+        "url, expected",
+        [
+            ("HTTPS://Example.COM/Path", "https://example.com/Path"),
+            ("https://example.com:443/a", "https://example.com/a"),
+            ("http://example.com:80/a", "http://example.com/a"),
+            ("https://example.com:8443/a", "https://example.com:8443/a"),
+            ("https://example.com", "https://example.com/"),
+            ("https://example.com/a#section", "https://example.com/a"),
+            ("  https://example.com/a  ", "https://example.com/a"),
+            ("https://user:pw@Example.com/a", "https://user:pw@example.com/a"),
+            ("http://[::1]:8080/a", "http://[::1]:8080/a"),
+        ],
+    )
+    def test_scheme_host_port_and_fragment(self, url, expected):
+        assert normalize_url(url) == expected
+
+    def test_strips_tracking_parameters_only(self):
+        url = "https://example.com/p?id=7&utm_source=news&UTM_Medium=mail&gclid=x&q=a+b"
+        assert normalize_url(url) == "https://example.com/p?id=7&q=a%20b"
+
+    def test_keeps_query_untouched_without_tracking_parameters(self):
+        url = "https://example.com/p?b=2&a=1&empty="
+        assert normalize_url(url) == url
+
+    def test_drops_query_of_only_tracking_parameters(self):
+        assert normalize_url("https://example.com/p?fbclid=abc") == "https://example.com/p"
+
+    @pytest.mark.parametrize("url", ["not a url", "/relative/path", "https://example.com:bad/"])
+    def test_unparseable_urls_are_kept(self, url):
+        assert normalize_url(url) == url
+
+    def test_idempotent(self):
+        url = normalize_url("HTTP://Example.com:80/a?utm_id=1&x=%2F#top")
+        assert normalize_url(url) == url
+
+    def test_tracking_param_patterns(self):
+        assert is_tracking_param("utm_campaign")
+        assert is_tracking_param("MSCLKID")
+        assert not is_tracking_param("utm")
+        assert not is_tracking_param("gclid_extra")
+
+
+class TestPagePatterns:
+    def matches(self, pattern: str, url: str) -> bool:
+        return re.match(pattern_regex(pattern), url) is not None
+
+    def test_single_star_stays_within_a_segment(self):
+        pattern = "https://shop.example.com/product/*"
+        assert self.matches(pattern, "https://shop.example.com/product/42")
+        assert self.matches(pattern, "https://shop.example.com/product/")
+        assert not self.matches(pattern, "https://shop.example.com/product/42/reviews")
+
+    def test_double_star_crosses_segments(self):
+        pattern = "https://shop.example.com/blog/**"
+        assert self.matches(pattern, "https://shop.example.com/blog/2024/05/post")
+        assert not self.matches(pattern, "https://shop.example.com/shop/blog/x")
+
+    def test_star_inside_a_segment(self):
+        pattern = "https://example.com/docs/v*/intro"
+        assert self.matches(pattern, "https://example.com/docs/v2/intro")
+        assert not self.matches(pattern, "https://example.com/docs/v2/x/intro")
+
+    def test_query_ignored_unless_the_pattern_has_one(self):
+        assert self.matches("https://example.com/p/*", "https://example.com/p/1?ref=home")
+        pattern = "https://example.com/search?q=*"
+        assert self.matches(pattern, "https://example.com/search?q=shoes")
+        assert not self.matches(pattern, "https://example.com/search?page=2")
+
+    def test_literal_characters_are_escaped(self):
+        pattern = "https://example.com/a.b+c(1)/*"
+        assert self.matches(pattern, "https://example.com/a.b+c(1)/x")
+        assert not self.matches(pattern, "https://example.com/aXb+c(1)/x")
+
+    def test_anchored(self):
+        assert not self.matches("https://example.com/a", "https://example.com/a/b")
+        assert not self.matches("https://example.com/a", "xhttps://example.com/a")
+
+    def test_normalize_pattern_lowercases_scheme_and_host_only(self):
+        assert normalize_pattern(" HTTPS://Shop.Example.com/Product/* ") == (
+            "https://shop.example.com/Product/*"
+        )
+        assert normalize_pattern("/relative/*") == "/relative/*"
@@ -0,0 +1,110 @@
+"""
+Tests for approximate unique users: ranges without built sketches and
+their raw-event fallback
+"""
+
+import uuid
+from datetime import date, datetime
+
+import numpy as np
+from sqlalchemy.dialects import postgresql
+
+from app.config import settings
+from app.services import hll
+from app.services.user_sketches import (
+    SCROLL_DEPTHS,
+    scroll_metric,
+    unique_users,
+    unsketched_ranges,
+)
+
+PAGE = uuid.uuid4()
+METRICS = [scroll_metric(depth) for depth in SCROLL_DEPTHS]
+
+
+def uuids(count: int, seed: int):
+    rng = np.random.default_rng(seed)
+    return [uuid.UUID(bytes=rng.bytes(16)) for _ in range(count)]
+
+
+def day(number: int) -> date:
+    return date(2024, 5, number)
+
+
+def midnight(number: int) -> datetime:
+    return datetime(2024, 5, number)
+
+
+class TestUnsketchedRanges:
+    def test_fully_built(self):
+        assert unsketched_ranges([day(1), day(2)], day(1), day(2)) == []
+
+    def test_days_before_and_between_built_ones(self):
+        assert unsketched_ranges([day(3), day(5)], day(1), day(5)) == [
+            (midnight(1), midnight(3)),
+            (midnight(4), midnight(5)),
+        ]
+
+    def test_open_ends(self):
+        assert unsketched_ranges([day(3)], None, None) == [(None, midnight(3)), (midnight(4), None)]
+
+    def test_nothing_built(self):
+        assert unsketched_ranges([], day(1), day(1)) == [(midnight(1), midnight(2))]
+        assert unsketched_ranges([], None, None) == [(None, None)]
+
+
+class Rows(list):
+    def all(self):
+        return self
+
+
+class FakeDb:
+    """
+    Sketches stored for the built days and raw scroll rows for the others;
+    the queries' conditions are recorded rather than applied
+    """
+
+    def __init__(self, sketched_users, raw_users, built):
+        registers = hll.empty(settings.USER_SKETCH_PRECISION)
+        for user_id in sketched_users:
+            hll.add(registers, user_id)
+        self.sketches = Rows(
+            (PAGE, metric, hll.to_bytes(registers)) for metric in METRICS if sketched_users
+        )
+        self.raw = [(PAGE, user_id, 100) for user_id in raw_users]
+        self.built = built
+        self.streamed = []
+
+    async def execute(self, query):
+        return self.sketches
+
+    async def scalars(self, query):
+        return self.built
+
+    async def stream(self, query):
+        self.streamed.append(str(query.compile(dialect=postgresql.dialect())))
+
+        async def rows():
+            for row in self.raw:
+                yield row
+
+        return rows()
+
+
+class TestUniqueUsers:
+    async def test_partly_sketched_range_counts_the_older_days(self):
+        recent, older = uuids(30, seed=1), uuids(20, seed=2)
+        db = FakeDb(recent, older + recent[:5], built=[day(10), day(11)])
+        estimates = await unique_users(db, [PAGE], METRICS, midnight(1), datetime(2024, 5, 11, 12))
+        # Sketches alone would give about 30
+        assert abs(estimates[(PAGE, scroll_metric(0))] - 50) <= 1
+        assert estimates[(PAGE, scroll_metric(100))] == estimates[(PAGE, scroll_metric(0))]
+        assert len(db.streamed) == 1  # Scroll metrics only: no funnel scan
+        assert "scroll_events.timestamp >=" in db.streamed[0]
+        assert "scroll_events.timestamp <" in db.streamed[0]
+
+    async def test_fully_sketched_range_reads_no_raw_events(self):
+        db = FakeDb(uuids(30, seed=1), [], built=[day(10), day(11)])
+        estimates = await unique_users(db, [PAGE], METRICS, midnight(10), midnight(11))
+        assert abs(estimates[(PAGE, scroll_metric(0))] - 30) <= 1
+        assert db.streamed == []